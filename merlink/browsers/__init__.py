@@ -6,6 +6,7 @@ from .pages.mr import mr_get_ssids
 from .pages.ms import ms_get_management_vlan
 from .pages.ms import ms_get_rstp_enabled
 
+from .pages.mx import mx_get_client_vpn_settings
 from .pages.mx import mx_get_client_vpn_subnet
 from .pages.mx import mx_get_client_vpn_dns_mode
 from .pages.mx import mx_get_client_vpn_nameservers
@@ -15,10 +16,15 @@ from .pages.mx import mx_get_client_auth_type
 from .pages.mx import mx_get_sentry_vpn_enabled
 from .pages.mx import mx_get_active_directory_enabled
 from .pages.mx import mx_get_primary_uplink
+from .pages.mx import mx_get_security_filtering_settings
 from .pages.mx import mx_get_amp_enabled
 from .pages.mx import mx_get_ids_mode
 from .pages.mx import mx_get_ids_ruleset
 
+from .pages.tables import get_client_table
+from .pages.tables import get_inventory_table
+from .pages.tables import get_switchport_table
+
 
 def add_functions_as_methods(functions):
     """docstring."""
@@ -37,6 +43,7 @@ page_scrapers = [
     ms_get_management_vlan,
     ms_get_rstp_enabled,
 
+    mx_get_client_vpn_settings,
     mx_get_client_vpn_subnet,
     mx_get_client_vpn_dns_mode,
     mx_get_client_vpn_nameservers,
@@ -46,7 +53,16 @@ page_scrapers = [
     mx_get_sentry_vpn_enabled,
     mx_get_active_directory_enabled,
     mx_get_primary_uplink,
+    mx_get_security_filtering_settings,
     mx_get_amp_enabled,
     mx_get_ids_mode,
     mx_get_ids_ruleset,
 ]
+
+# Org-wide exports that iterate over networks themselves. Only
+# DashboardBrowser has them; they are not per-network page scrapers.
+table_exporters = [
+    get_client_table,
+    get_inventory_table,
+    get_switchport_table,
+]
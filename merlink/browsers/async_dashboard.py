@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""asyncio variant of DashboardBrowser that fetches routes concurrently.
+
+DashboardBrowser keeps one "current page" and navigates to every route it
+reads, so only one request can be in flight at a time. Here every call
+takes its org/network explicitly and returns an awaitable, so many routes
+and networks can be fetched at once:
+
+    browser = AsyncDashboardBrowser(max_concurrency=16)
+    await browser.login(username, password, tfa_code)
+    await browser.set_org_id(org_id)
+    subnets = await asyncio.gather(*[
+        browser.mx_get_client_vpn_subnet(org_id, network_id)
+        for network_id in browser.orgs_dict[org_id]['node_groups']])
+
+Requests are made with the blocking transport in a thread pool, so no new
+dependencies are needed and cookies are shared with the login session.
+"""
+import asyncio
+import getpass
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bs4
+import mechanicalsoup
+
+from . import add_functions_as_methods, page_scrapers
+from .dashboard import DashboardBrowser
+from .pages import page_utils
+from .pages.page_hunters import SideNavigation
+from .route_urls import get_route_key
+from .transport import DashboardTransport
+
+
+def fetch_context_url(browser, url, redirect_ok=False):
+    """Blocking GET of a url using the browser's transport.
+
+    Args:
+        browser (DashboardBrowser): Logged in browser with the cookies.
+        url (string): URL to request.
+        redirect_ok (bool): See DashboardBrowser.open_route.
+    Returns:
+        (requests.Response): The response.
+
+    """
+    response = browser.transport.get(url)
+    if response.status_code == 404:
+        print('Attempting to open', url, 'and failed.')
+        raise mechanicalsoup.utils.LinkNotFoundError
+    # It's ok if dashboard adds URL junk at the end.
+    if url not in response.url and not redirect_ok:
+        browser.handle_redirects(url, response.url)
+    return response
+
+
+def parse_context_page(browser, url, response):
+    """Parse a fetched page, recording the parse time in the metrics."""
+    started_at = time.perf_counter()
+    page = bs4.BeautifulSoup(response.content, 'lxml')
+    browser.transport.metrics.observe_parse(
+        url, time.perf_counter() - started_at)
+    return page
+
+
+@add_functions_as_methods(page_scrapers)
+class ScraperContext:
+    """Stand-in for DashboardBrowser bound to one org/network.
+
+    Page scrapers (pages/mx.py, ...) expect self.open_route and
+    self.get_page. This provides them for a fixed org/network so that each
+    scraper call can run in its own thread without sharing a current page.
+
+    Attributes:
+        browser (DashboardBrowser): Logged in browser to get URLs/cookies.
+        org_id (int): Org that routes are opened in.
+        network_id (string): Network that routes are opened in.
+        responses (dict): {url: requests.Response} of pages opened by this
+            context.
+        pages (dict): {url: BeautifulSoup} of the pages parsed so far.
+        snapshots (dict): {(url, snapshot type): snapshot} read so far.
+        texts (dict): {url: string} of the bodies decoded so far.
+        current_url (string): URL of the page get_page returns.
+
+    """
+
+    def __init__(self, browser, org_id, network_id):
+        """Bind the context to an org/network."""
+        self.browser = browser
+        self.org_id = org_id
+        self.network_id = network_id
+        self.responses = {}
+        self.pages = {}
+        self.snapshots = {}
+        self.texts = {}
+        self.current_url = ''
+
+    def open_route(self, route, is_combined_network=None, redirect_ok=False,
+                   parse=True, **_):
+        """Open a route in this context's network (or its org).
+
+        Args:
+            route (string): Text following '/manage' in the url.
+            is_combined_network (string): Side nav category to take the
+                route's URL from (i.e. 'Security appliance').
+            redirect_ok (bool): See DashboardBrowser.open_route.
+            parse (bool): See DashboardBrowser.open_route.
+
+        """
+        if is_combined_network:
+            target_url = self.combined_network_redirect(route,
+                                                        is_combined_network)
+            if not target_url:
+                raise LookupError
+        else:
+            target_url = self.browser.get_context_route_url(
+                route, self.org_id, self.network_id)
+        if target_url not in self.responses:
+            self.responses[target_url] = fetch_context_url(
+                self.browser, target_url, redirect_ok)
+        self.current_url = target_url
+        if parse:
+            self.get_page()
+
+    def combined_network_redirect(self, route, category):
+        """Find the route's URL under a side nav category of this network.
+
+        The network's side nav is shared with (and cached by) the browser,
+        so /configure/general is only fetched for the first route of each
+        network.
+        """
+        general_url = self.browser.get_context_route_url(
+            '/configure/general', self.org_id, self.network_id)
+        network_key = get_route_key(general_url)[:2]
+        if network_key not in self.browser.side_navs:
+            if general_url not in self.responses:
+                self.responses[general_url] = fetch_context_url(self.browser,
+                                                                general_url)
+            self.browser.side_navs[network_key] = SideNavigation(
+                self.responses[general_url].text)
+        return self.browser.side_navs[network_key].get_url(route, category)
+
+    def get_page(self):
+        """Return the soup of the last opened route, parsing it if need be."""
+        if self.current_url not in self.pages:
+            self.pages[self.current_url] = parse_context_page(
+                self.browser, self.current_url,
+                self.responses[self.current_url])
+        return self.pages[self.current_url]
+
+    def get_pagetext(self):
+        """Return the decoded body of the last opened route (memoized)."""
+        if self.current_url not in self.texts:
+            self.texts[self.current_url] = \
+                self.responses[self.current_url].text
+        return self.texts[self.current_url]
+
+    def get_page_elements(self, *element_ids):
+        """Return a soup of only these elements of the last opened route.
+
+        See DashboardBrowser.get_page_elements.
+        """
+        if self.current_url in self.pages:
+            return self.pages[self.current_url]
+        response = self.responses[self.current_url]
+        started_at = time.perf_counter()
+        soup = page_utils.get_partial_page(
+            response.content, element_ids,
+            page_utils.get_declared_encoding(response))
+        self.browser.transport.metrics.observe_parse(
+            self.current_url, time.perf_counter() - started_at)
+        return soup
+
+    def get_route_snapshot(self, snapshot_type):
+        """Return a snapshot record of the last opened route.
+
+        See DashboardBrowser.get_route_snapshot.
+        """
+        key = (self.current_url, snapshot_type)
+        if key not in self.snapshots:
+            self.snapshots[key] = snapshot_type.from_page(
+                self.get_page_elements(*snapshot_type.element_ids))
+        return self.snapshots[key]
+
+    def get_url(self):
+        """Return the URL of the last opened route."""
+        return self.current_url
+
+
+def make_scraper_coroutine(scraper):
+    """Wrap a page scraper so it takes an org/network and is awaitable."""
+    async def scraper_coroutine(self, org_id, network_id):
+        """Run the page scraper in the given org/network."""
+        return await self.run_scraper(scraper, org_id, network_id)
+    scraper_coroutine.__name__ = scraper.__name__
+    scraper_coroutine.__doc__ = scraper.__doc__
+    return scraper_coroutine
+
+
+@add_functions_as_methods(
+    [make_scraper_coroutine(scraper) for scraper in page_scrapers])
+class AsyncDashboardBrowser:
+    """asyncio sibling of DashboardBrowser with concurrent route fetching.
+
+    Login/TFA happen once on a wrapped DashboardBrowser. Everything after
+    that takes an explicit org_id/network_id and never touches the wrapped
+    browser's current page, so calls can be gathered freely.
+
+    Attributes:
+        browser (DashboardBrowser): Wrapped browser that holds the cookies
+            and orgs_dict.
+        max_concurrency (int): Max requests in flight at once. Also the size
+            of the thread pool and of each host's connection pool.
+        executor (ThreadPoolExecutor): Threads blocking requests run in.
+        semaphore (asyncio.Semaphore): Bounds requests in flight. Created
+            on first use so that it belongs to the running loop.
+
+    """
+
+    def __init__(self, max_concurrency=8, browser=None):
+        """Initialize the wrapped browser and the thread pool.
+
+        Args:
+            max_concurrency (int): Max requests in flight at once.
+            browser (DashboardBrowser): Browser to wrap (i.e. one that is
+                already logged in). A new one is created if None.
+
+        """
+        super(AsyncDashboardBrowser, self).__init__()
+        if browser is None:
+            browser = DashboardBrowser(
+                transport=DashboardTransport(pool_maxsize=max_concurrency))
+        self.browser = browser
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.semaphore = None
+
+    @property
+    def orgs_dict(self):
+        """Return the wrapped browser's orgs_dict."""
+        return self.browser.orgs_dict
+
+    async def run_blocking(self, func, *args):
+        """Run a blocking function in the pool, bounded by max_concurrency."""
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_event_loop()
+        async with self.semaphore:
+            return await loop.run_in_executor(self.executor, func, *args)
+
+    # Fns that log in/out
+    ###########################################################################
+    async def login(self, username, password, tfa_code=None):
+        """Log in. See DashboardBrowser.login."""
+        return await self.run_blocking(
+            self.browser.login, username, password, tfa_code)
+
+    async def tfa_submit_info(self, tfa_code):
+        """Submit a TFA code. See DashboardBrowser.tfa_submit_info."""
+        tfa_success = await self.run_blocking(
+            self.browser.tfa_submit_info, tfa_code)
+        if tfa_success and not self.orgs_dict:
+            await self.run_blocking(self.browser.org_data_setup)
+        return tfa_success
+
+    async def logout(self):
+        """Log out of Dashboard and stop the thread pool."""
+        await self.run_blocking(self.browser.logout)
+        self.executor.shutdown(wait=False)
+
+    # Fns that get/set org info
+    ###########################################################################
+    async def set_org_id(self, org_id):
+        """Make sure an org's networks are known.
+
+        Nothing "active" is changed; this only fetches the org's node_groups
+        if they have not been retrieved yet (occurs once/org, see
+        OrgLoader). Other orgs' entries are kept.
+
+        Args:
+            org_id (int): Key of the org in orgs_dict.
+        Returns:
+            (dict): The org's entry in orgs_dict.
+
+        """
+        if org_id not in self.orgs_dict:
+            print("\nERROR:", org_id, "is not one of your org ids!")
+            raise LookupError
+        if self.browser.org_loader.needs_load(self.orgs_dict, org_id):
+            self.browser.org_loader.merge(
+                self.orgs_dict, await self.scrape_json(
+                    '/organization/administered_orgs', org_id), org_id)
+        return self.orgs_dict[org_id]
+
+    async def set_network_id(self, org_id, network_id):
+        """Make sure a network exists and that it is reachable.
+
+        /configure/general is a route available to all network types.
+
+        Args:
+            org_id (int): Key of the org in orgs_dict.
+            network_id (string): Key of the network in the org's node_groups.
+        Returns:
+            (dict): The network's entry in the org's node_groups.
+
+        """
+        org = await self.set_org_id(org_id)
+        await self.get_page('/configure/general', org_id, network_id)
+        return org['node_groups'][network_id]
+
+    # Fns that open dashboard pages and get content from them.
+    ###########################################################################
+    async def scrape_json(self, route, org_id, network_id=None,
+                          redirect_ok=False):
+        """Return the JSON found at a route in an org/network.
+
+        Args:
+            route (string): Route of a JSON page. See json_url_routes.py.
+            org_id (int): Key of the org in orgs_dict.
+            network_id (string): Network to use. If None, use the org URL.
+            redirect_ok (bool): See DashboardBrowser.open_route.
+        Returns:
+            (dict|list): The decoded JSON.
+
+        """
+        url = self.browser.get_context_route_url(route, org_id, network_id)
+        response = await self.run_blocking(
+            fetch_context_url, self.browser, url, redirect_ok)
+        started_at = time.perf_counter()
+        json_data = response.json()
+        self.browser.transport.metrics.observe_parse(
+            url, time.perf_counter() - started_at)
+        return json_data
+
+    async def get_pagetext(self, route, org_id, network_id=None,
+                           redirect_ok=False):
+        """Return the decoded body of a route in an org/network.
+
+        For pages whose Mkiconf JSON is read without parsing the HTML.
+
+        Args:
+            route (string): Text following '/manage' in the url.
+            org_id (int): Key of the org in orgs_dict.
+            network_id (string): Network to use. If None, use the org URL.
+            redirect_ok (bool): See DashboardBrowser.open_route.
+        Returns:
+            (string): The page's text.
+
+        """
+        url = self.browser.get_context_route_url(route, org_id, network_id)
+        response = await self.run_blocking(
+            fetch_context_url, self.browser, url, redirect_ok)
+        return response.text
+
+    async def get_page(self, route, org_id, network_id=None,
+                       redirect_ok=False):
+        """Return the soup of a route in an org/network.
+
+        Args:
+            route (string): Text following '/manage' in the url.
+            org_id (int): Key of the org in orgs_dict.
+            network_id (string): Network to use. If None, use the org URL.
+            redirect_ok (bool): See DashboardBrowser.open_route.
+        Returns:
+            (BeautifulSoup): The parsed page.
+
+        """
+        url = self.browser.get_context_route_url(route, org_id, network_id)
+        response = await self.run_blocking(
+            fetch_context_url, self.browser, url, redirect_ok)
+        return await self.run_blocking(
+            parse_context_page, self.browser, url, response)
+
+    async def run_scraper(self, scraper, org_id, network_id):
+        """Run a page scraper (i.e. pages.mx functions) in an org/network.
+
+        Args:
+            scraper (function): Function that takes a browser-like object.
+            org_id (int): Key of the org in orgs_dict.
+            network_id (string): Key of the network in the org's node_groups.
+        Returns:
+            The scraper's return value.
+
+        """
+        context = ScraperContext(self.browser, org_id, network_id)
+        return await self.run_blocking(scraper, context)
+
+
+def login_from_args(browser, args):
+    """Log a browser in with the docopt args of a command line tool.
+
+    The password is asked with getpass if --password was not given, and a
+    TFA code with input if dashboard asks for one. Exits if login fails.
+
+    Args:
+        browser (AsyncDashboardBrowser): Browser that has not logged in.
+        args (dict): docopt args with --username and --password.
+
+    """
+    username = args['--username']
+    password = args['--password'] or getpass.getpass()
+    loop = asyncio.get_event_loop()
+    auth_result = loop.run_until_complete(browser.login(username, password))
+    if auth_result == 'sms_auth':
+        tfa_code = input("TFA code required for " + username + ": ")
+        if not loop.run_until_complete(
+                browser.tfa_submit_info(tfa_code.strip())):
+            auth_result = 'auth_error'
+    if auth_result not in ('auth_success', 'sms_auth'):
+        print('ERROR: Unable to login (' + auth_result + '). Exiting...')
+        sys.exit(1)
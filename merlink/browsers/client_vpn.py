@@ -14,19 +14,29 @@
 # limitations under the License.
 """API to interact with the Meraki Dashboard using the requests module."""
 import re
-import sys
-import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
+import mechanicalsoup
+import requests
+
+from .async_dashboard import fetch_context_url
 from .dashboard import DashboardBrowser
-from .pages.page_hunters import get_pagetext_json_value
+from .pages.page_hunters import PageJsonIndex
+from ..vpn.ike_probe import run_probes
+
+PORT_FORWARDING_IPSEC_PATTERN = re.compile(r'"udp","public_port":"[4]?500"')
+NATTING_IPSEC_PATTERN = re.compile(
+    r'"dst_port":\[[0-9",]*"[4]?500"[0-9",]*\]')
 
 
 class ClientVpnBrowser(DashboardBrowser):
     """Client VPN class."""
 
-    def __init__(self):
+    def __init__(self, transport=None):
         """Initialize Client VPN object."""
-        super(ClientVpnBrowser, self).__init__()
+        super(ClientVpnBrowser, self).__init__(transport)
         self.vpn_vars = ''
 
     def get_client_vpn_psk(self):
@@ -44,16 +54,8 @@ class ClientVpnBrowser(DashboardBrowser):
         It's gone in new view, so let's put this on hold.
         """
         self.open_route('/nodes/new_wired_status',
-                        network_eid=self.active_network_id)
-        pagetext = self.get_page().text
-        using_ddns = (get_pagetext_json_value('dynamic_dns_enabled',
-                                              pagetext) == 'true')
-        if using_ddns:
-            address = get_pagetext_json_value('dynamic_dns_name', pagetext)
-        else:
-            address = get_pagetext_json_value('{"public_ip', pagetext)
-
-        return address
+                        network_eid=self.active_network_id, parse=False)
+        return get_contact_address(self.get_page_json)
 
     def get_client_vpn_data(self):
         """Return client VPN variables."""
@@ -102,19 +104,79 @@ class ClientVpnBrowser(DashboardBrowser):
                 4. Is 500 + 4500 traffic being forwarded?
                 5. Is 500 + 4500 traffic being natted?
             check_firewall_connectivity
-                6. Can the client ping the firewall?
+                6. Does the firewall answer on udp 500 or 4500?
+        They run concurrently (see run_client_vpn_checks).
         """
         # If the user is behind their firewall, they will not be able to
         # connect (and a VPN connection would be pointless.)
-        errors = ''
-        errors += self.check_firewall_page_errors()
-        errors += self.check_nat_rules()
-        errors += self.check_firewall_connectivity()
-
+        errors = ''.join('\n' + error for result in
+                         self.run_client_vpn_checks()
+                         for error in result.errors)
         if errors:
             return errors
         return "No common misconfigurations found."
 
+    def run_client_vpn_checks(self, org_id=None, network_id=None,
+                              probe=None):
+        """Run the troubleshooting checks concurrently.
+
+        Appliance status and firewall pages are fetched at the same time,
+        each once. As soon as the status page arrives, the address it has
+        is probed while the firewall page is still downloading. A check
+        that can't run (i.e. its page did not load) fails with the reason.
+
+        Args:
+            org_id (int): Org of the network. The active org if None.
+            network_id (string): Network to check. The active network if
+                None.
+            probe (function): Called with the firewall's address and
+                returns (errors, details). probe_address if None.
+        Returns:
+            (list): CheckResults of 'firewall_status', 'nat_rules' and
+                'connectivity', in that order.
+
+        """
+        if probe is None:
+            probe = probe_address
+        started_at = time.perf_counter()
+        status_url, firewall_url = self.get_check_urls(org_id, network_id)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            status_future = executor.submit(
+                self.fetch_check_page, status_url)
+            firewall_future = executor.submit(
+                self.fetch_check_page, firewall_url)
+            status_result, address = get_status_check_result(
+                started_at, *status_future.result())
+            probe_future = None if address is None else \
+                executor.submit(probe, address)
+            nat_result = get_nat_check_result(
+                started_at, *firewall_future.result())
+            connectivity_result = get_connectivity_check_result(
+                started_at, address, probe_future)
+        return [status_result, nat_result, connectivity_result]
+
+    def get_check_urls(self, org_id, network_id):
+        """Return the status and firewall page URLs of a network.
+
+        The active org/network is used for each that is None.
+        """
+        if org_id is None:
+            org_id = self.active_org_id
+        if network_id is None:
+            network_id = self.active_network_id
+        return [self.get_context_route_url(route, org_id, network_id)
+                for route in ('/nodes/new_wired_status',
+                              '/configure/firewall')]
+
+    def fetch_check_page(self, url):
+        """Return (text, None) of a page, or (None, error) if it fails."""
+        try:
+            return fetch_context_url(self, url).text, None
+        except (mechanicalsoup.utils.LinkNotFoundError,
+                requests.exceptions.RequestException) as error:
+            return None, "ERROR: Could not open " + url + " (" + \
+                type(error).__name__ + ")"
+
     def check_firewall_page_errors(self):
         """Check 3 things using info from Appliance Status page.
 
@@ -122,67 +184,192 @@ class ClientVpnBrowser(DashboardBrowser):
         2. Is there a firewall in the network?
         3. Is the firewall online?
         """
-        errors = ''
-        self.open_route('/nodes/new_wired_status')
-        pagetext = self.get_page().text
-        client_public_ip = get_pagetext_json_value('request_ip', pagetext)
-        firewall_public_ip = get_pagetext_json_value('{"public_ip', pagetext)
-        if client_public_ip == firewall_public_ip:
-            errors += "\nERROR: You cannot connect to your firewall if " \
-                      "you are behind it!"
-        # 0 = online, 2 = temporarily offline, 3 = offline for a week+
-        firewall_status_code = get_pagetext_json_value("status#", pagetext)
-        if firewall_status_code == -1:
-            errors += "\nERROR: There is no firewall in this network!"
-        elif firewall_status_code == '0':
-            errors += "\nERROR: Your firewall is offline!"
-        return errors
+        self.open_route('/nodes/new_wired_status', parse=False)
+        return ''.join('\n' + error for error in
+                       get_firewall_status_errors(self.get_page_json))
 
     def check_nat_rules(self):
         """Check whether a nat or port forwarding rule is causing vpn failure.
 
-        An IPSEC connection uses UDP port 500, and UDP port 4500 if NAT.
-
-        Sample JSON example of bad firewall ports:
-        "port_forwarding_settings":[{"ip":"10.0.0.1","allowed_ips":["any"],
-            "name":"break client vpn","proto":"tcp","public_port":"500",
-            "local_port":"500","inet":"Both"}],
-        "one_to_one_nat_settings":[{"name":"alpha","lanip":"10.0.0.1",
-            "uplink":"1","allowed_inbound":[{"proto":"udp","dst_port":["500",
-            "4500"],"allowed_ips":["any"]}],"wanip":"4.0.0.1"}]
+        See get_nat_rule_errors.
         """
-        errors = ''
-        self.open_route('/configure/firewall')
-        pagetext = self.get_page().text
-        port_forwarding_ipsec_ports = re.search(
-            r'"udp","public_port":"[4]?500"', pagetext)
-        if port_forwarding_ipsec_ports:
-            errors += "\nERROR: You are port forwarding " \
-                      "IPSEC udp ports 500 and 4500!"
-        natting_ipsec_ports = re.search(
-            r'"dst_port":\[[0-9",]*"[4]?500"[0-9",]*\]', pagetext)
-        if natting_ipsec_ports:
-            errors += "\nERROR: You are natting " \
-                      "IPSEC udp ports 500 and 4500!"
-        return errors
+        self.open_route('/configure/firewall', parse=False)
+        return ''.join('\n' + error for error in
+                       get_nat_rule_errors(self.get_pagetext()))
 
     def check_firewall_connectivity(self):
-        """Check whether the user can ping the firewall.
+        """Check whether the firewall answers IKE probes from the user.
 
         Connectivity between sites is not necessarily transitive.
         """
-        # Verify whether firewall is reachable by pinging 4 times
-        # If at least one ping that made it, mark this test as successful.
-        address = self.get_client_vpn_address()
-        if sys.platform == 'win32':  # Identifies any form of Windows
-            # ping 4 times every 1000ms
-            ping_string = "ping " + address
-        else:  # *nix of some kind
-            # ping 4 times every 200ms
-            ping_string = "ping -c 5 -i 0.2 " + address
-        ping_response = os.system(ping_string)
-        # Non-0 ping responses mean failure. Error codes are OS-dependent.
-        if ping_response != 0:
-            # Failure error dialog and then return
-            return "\nERROR: Cannot ping device!"
-        return ""
+        errors, _ = probe_address(self.get_client_vpn_address())
+        return ''.join('\n' + error for error in errors)
+
+
+class CheckResult(namedtuple('CheckResult',
+                             ['name', 'errors', 'details', 'seconds'])):
+    """Outcome of one client vpn troubleshooting check.
+
+    Attributes:
+        name (string): Which check this is.
+        errors (list): Error messages. Empty if the check passed.
+        details (dict): What the check found (i.e. the firewall's IP).
+        seconds (float): Time from the start of the checks until this one
+            had its result.
+
+    """
+    __slots__ = ()
+
+    @property
+    def passed(self):
+        """Return whether the check found no errors."""
+        return not self.errors
+
+
+def get_check_result(name, started_at, errors, **details):
+    """Return a CheckResult timed from started_at (time.perf_counter())."""
+    return CheckResult(name, errors, details,
+                       time.perf_counter() - started_at)
+
+
+def get_status_check_result(started_at, status_text, status_error):
+    """Return (firewall_status CheckResult, address to probe).
+
+    The address is None if the status page could not be fetched.
+    """
+    if status_error:
+        return get_check_result('firewall_status', started_at,
+                                [status_error]), None
+    status_json = PageJsonIndex(status_text).get
+    result = get_check_result(
+        'firewall_status', started_at,
+        get_firewall_status_errors(status_json),
+        client_ip=status_json('request_ip'),
+        firewall_ip=status_json('{"public_ip'),
+        status_code=status_json('status#'))
+    return result, get_contact_address(status_json)
+
+
+def get_nat_check_result(started_at, firewall_text, firewall_error):
+    """Return the nat_rules CheckResult of the firewall page."""
+    if firewall_error:
+        return get_check_result('nat_rules', started_at, [firewall_error])
+    return get_check_result('nat_rules', started_at,
+                            get_nat_rule_errors(firewall_text))
+
+
+def get_connectivity_check_result(started_at, address, probe_future):
+    """Return the connectivity CheckResult of a probe (None if not run)."""
+    if probe_future is None:
+        return get_check_result(
+            'connectivity', started_at,
+            ["ERROR: Cannot find the firewall's address!"])
+    errors, details = probe_future.result()
+    return get_check_result('connectivity', started_at, errors,
+                            address=address, probes=details)
+
+
+def get_contact_address(get_json):
+    """Return the DDNS name if DDNS is enabled, otherwise the public IP.
+
+    Args:
+        get_json (function): Looks up a key of the appliance status page
+            (i.e. DashboardBrowser.get_page_json).
+
+    """
+    if get_json('dynamic_dns_enabled') in (True, 'true'):
+        return get_json('dynamic_dns_name')
+    return get_json('{"public_ip')
+
+
+def get_firewall_status_errors(get_json, check_client_ip=True):
+    """Return errors found on the appliance status page.
+
+    1. Is the user behind the firewall?
+    2. Is there a firewall in the network?
+    3. Is the firewall online?
+
+    Args:
+        get_json (function): Looks up a key of the appliance status page.
+        check_client_ip (bool): Whether to check 1. (It's only meaningful
+            when the user is the one who will connect.)
+
+    """
+    errors = []
+    if check_client_ip and \
+            get_json('request_ip') == get_json('{"public_ip'):
+        errors.append("ERROR: You cannot connect to your firewall if "
+                      "you are behind it!")
+    # 0 = online, 2 = temporarily offline, 3 = offline for a week+
+    firewall_status_code = get_json('status#')
+    if firewall_status_code == -1:
+        errors.append("ERROR: There is no firewall in this network!")
+    elif str(firewall_status_code) in ('2', '3'):
+        errors.append("ERROR: Your firewall is offline!")
+    return errors
+
+
+def get_nat_rule_errors(pagetext):
+    """Return errors for port forwarding/NAT rules of the ipsec ports.
+
+    An IPSEC connection uses UDP port 500, and UDP port 4500 if NAT.
+
+    Sample JSON example of bad firewall ports:
+    "port_forwarding_settings":[{"ip":"10.0.0.1","allowed_ips":["any"],
+        "name":"break client vpn","proto":"tcp","public_port":"500",
+        "local_port":"500","inet":"Both"}],
+    "one_to_one_nat_settings":[{"name":"alpha","lanip":"10.0.0.1",
+        "uplink":"1","allowed_inbound":[{"proto":"udp","dst_port":["500",
+        "4500"],"allowed_ips":["any"]}],"wanip":"4.0.0.1"}]
+
+    Args:
+        pagetext (string): Text of the /configure/firewall page.
+
+    """
+    errors = []
+    if PORT_FORWARDING_IPSEC_PATTERN.search(pagetext):
+        errors.append("ERROR: You are port forwarding "
+                      "IPSEC udp ports 500 and 4500!")
+    if NATTING_IPSEC_PATTERN.search(pagetext):
+        errors.append("ERROR: You are natting "
+                      "IPSEC udp ports 500 and 4500!")
+    return errors
+
+
+def probe_address(address):
+    """Probe a firewall's IPSEC ports and return (errors, details).
+
+    See get_probe_errors.
+    """
+    if address in (None, -1, ''):
+        return ["ERROR: Cannot find the firewall's address!"], {}
+    return get_probe_errors(address, run_probes([address]))
+
+
+def get_probe_errors(address, results):
+    """Return (errors, details) of the probes of a firewall's ports.
+
+    The check passes if either udp port 500 (probed with IKEv1, which MX
+    client VPN speaks) or 4500 answered. Ports that answered with ICMP port
+    unreachable are reported apart from ones that did not answer at all.
+    details has the probe statistics of each port (see
+    ProbeResult.to_dict).
+
+    Args:
+        address (string): Address that was probed.
+        results (list): Its ProbeResults.
+
+    """
+    details = {result.port: result.to_dict() for result in results}
+    if any(result.received for result in results):
+        return [], details
+    if results and results[0].error:
+        return ["ERROR: Cannot probe " + address + " (" + results[0].error +
+                ")!"], details
+    refused_ports = [str(result.port) for result in results
+                     if result.refused]
+    if refused_ports:
+        return ["ERROR: Firewall refuses IPSEC udp port " +
+                ' and '.join(refused_ports) + "!"], details
+    return ["ERROR: Firewall does not answer IKE on IPSEC udp ports 500 "
+            "or 4500!"], details
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Typed columnar tables of client, inventory and switchport rows.
+
+Routes like client_list_json, inventory_data and ports_json return one dict
+per row. A ColumnTable keeps each field in one typed column instead: ints
+and floats in arrays, strings dictionary-encoded (each distinct string is
+stored once and the column holds its int code). Counting a million rows
+by network, model or VLAN is then one C-level pass over a code array
+instead of a Python loop over dicts:
+
+    table = ColumnTable(CLIENT_COLUMNS)
+    table.extend(rows, network_id='N_1')   # i.e. from iter_json
+    clients_per_network(table)             # {'N_1': 812, ...}
+"""
+import array
+import collections
+import itertools
+import math
+
+STRING = 'string'
+INT = 'int'
+FLOAT = 'float'
+BOOL = 'bool'
+# Stored for ints/bools that are missing or not numbers (floats use NaN).
+MISSING_INT = -2 ** 63
+MISSING_BOOL = -1
+# Rows of a stream that are held as dicts at once (see extend_stream).
+BATCH_ROWS = 10000
+
+# (column name, type, key in the route's rows). network_id is filled in
+# for every row of a network by the scraper that fetched them.
+CLIENT_COLUMNS = (
+    ('network_id', STRING, 'network_id'),
+    ('mac', STRING, 'mac'),
+    ('ip', STRING, 'ip'),
+    ('description', STRING, 'description'),
+    ('vlan', INT, 'vlan'),
+    ('os', STRING, 'os'),
+    ('manufacturer', STRING, 'manufacturer'),
+    ('sent_kb', FLOAT, 'sent'),
+    ('received_kb', FLOAT, 'recv'),
+)
+INVENTORY_COLUMNS = (
+    ('serial', STRING, 'serial'),
+    ('mac', STRING, 'mac'),
+    ('model', STRING, 'model'),
+    ('network_id', STRING, 'node_group_id'),
+    ('claimed_at', INT, 'claimed_at'),
+)
+PORT_COLUMNS = (
+    ('network_id', STRING, 'network_id'),
+    ('serial', STRING, 'serial'),
+    ('port', STRING, 'num'),
+    ('enabled', BOOL, 'enabled'),
+    ('type', STRING, 'type'),
+    ('vlan', INT, 'vlan'),
+    ('allowed_vlans', STRING, 'allowed_vlans'),
+)
+
+
+class DictionaryColumn:
+    """Dictionary-encoded strings.
+
+    Attributes:
+        codes (array): Code of each row's value (-1 if missing).
+        values (list): Distinct values; codes index into it.
+        value_codes (dict): {value: code}, including None (-1) and
+            non-strings (the code of their str()).
+
+    """
+
+    def __init__(self):
+        """Start an empty column."""
+        self.codes = array.array('l')
+        self.values = []
+        self.value_codes = {None: -1}
+
+    def __len__(self):
+        """Return the number of rows."""
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        """Return a row's value (None if missing)."""
+        code = self.codes[index]
+        return None if code == -1 else self.values[code]
+
+    def get_code(self, value):
+        """Return the code of a value, adding it if it is new.
+
+        Non-strings (other than None) are stored as their str().
+        """
+        try:
+            code = self.value_codes.get(value)
+        except TypeError:  # Unhashable (i.e. a list)
+            return self.get_code(str(value))
+        if code is None:
+            if isinstance(value, str):
+                code = len(self.values)
+                self.values.append(value)
+            else:
+                code = self.get_code(str(value))
+            self.value_codes[value] = code
+        return code
+
+    def append(self, value):
+        """Append a value."""
+        self.codes.append(self.get_code(value))
+
+    def extend(self, values):
+        """Append a list of values.
+
+        Only new distinct values are handled in Python; the codes of every
+        row are looked up by map (a C loop).
+        """
+        value_codes = self.value_codes
+        try:
+            # In order of first appearance, so codes don't depend on hashes.
+            new_values = [value for value in dict.fromkeys(values)
+                          if value not in value_codes]
+        except TypeError:  # Unhashable (i.e. a list)
+            for value in values:
+                self.append(value)
+            return
+        self.add_values(new_values)
+        self.codes.extend(map(value_codes.__getitem__, values))
+
+    def add_values(self, new_values):
+        """Give codes to distinct values that have none yet.
+
+        Strings are added in one pass; other values go through get_code.
+        """
+        new_strings = [value for value in new_values
+                       if isinstance(value, str)]
+        first_code = len(self.values)
+        self.values.extend(new_strings)
+        self.value_codes.update(zip(new_strings, range(
+            first_code, first_code + len(new_strings))))
+        if len(new_strings) < len(new_values):
+            for value in new_values:
+                self.get_code(value)
+
+    def extend_constant(self, value, num_rows):
+        """Append num_rows of the same value."""
+        self.codes.extend(itertools.repeat(self.get_code(value), num_rows))
+
+    def get_stored(self):
+        """Return the array of codes."""
+        return self.codes
+
+    def decode(self, code):
+        """Return the value of a code (None for missing)."""
+        return None if code == -1 else self.values[code]
+
+
+class NumericColumn:
+    """Ints, floats or bools in an array.
+
+    Attributes:
+        values (array): Each row's value, missing stored as missing.
+        convert (function): Converts a JSON value to the array's type.
+        missing: Value stored for missing/unconvertible values.
+
+    """
+
+    def __init__(self, column_type):
+        """Start an empty column of INT, FLOAT or BOOL."""
+        if column_type == INT:
+            self.values = array.array('q')
+            self.convert = int
+            self.missing = MISSING_INT
+        elif column_type == FLOAT:
+            self.values = array.array('d')
+            self.convert = float
+            self.missing = math.nan
+        elif column_type == BOOL:
+            self.values = array.array('b')
+            self.convert = get_bool_code
+            self.missing = MISSING_BOOL
+        else:
+            raise ValueError('Unknown column type ' + str(column_type))
+
+    def __len__(self):
+        """Return the number of rows."""
+        return len(self.values)
+
+    def __getitem__(self, index):
+        """Return a row's value (None if missing)."""
+        return self.decode(self.values[index])
+
+    def append(self, value):
+        """Append a value, storing missing if it can't be converted."""
+        try:
+            self.values.append(self.convert(value))
+        except (TypeError, ValueError, OverflowError):
+            self.values.append(self.missing)
+
+    def extend(self, values):
+        """Append a list of values.
+
+        Values the array takes as they are (ints, floats, bools, None) are
+        copied in by C; a list with anything else (i.e. '10' or 'true') is
+        converted value by value.
+        """
+        if values.count(None):
+            missing = self.missing
+            values = [missing if value is None else value for value in values]
+        try:
+            converted = array.array(self.values.typecode, values)
+        except (TypeError, OverflowError):
+            for value in values:
+                self.append(value)
+        else:
+            self.values.extend(converted)
+
+    def extend_constant(self, value, num_rows):
+        """Append num_rows of the same value."""
+        self.append(value)
+        self.values.extend(itertools.repeat(self.values[-1], num_rows - 1))
+
+    def get_stored(self):
+        """Return the array of values."""
+        return self.values
+
+    def decode(self, value):
+        """Return a stored value as it was (None for missing)."""
+        if value == self.missing or value != value:  # NaN != NaN
+            return None
+        if self.missing == MISSING_BOOL:
+            return bool(value)
+        return value
+
+
+def get_bool_code(value):
+    """Return 1/0 for JSON true/false (or 'true'/'false' strings)."""
+    if value in (True, 'true'):
+        return 1
+    if value in (False, 'false'):
+        return 0
+    raise ValueError(value)
+
+
+class ColumnTable:
+    """Rows of one route stored column by column.
+
+    Attributes:
+        schema (tuple): (name, type, row key) of each column.
+        columns (OrderedDict): {name: DictionaryColumn|NumericColumn}.
+
+    """
+
+    def __init__(self, schema):
+        """Start an empty table (see CLIENT_COLUMNS for a schema)."""
+        self.schema = tuple(schema)
+        self.columns = collections.OrderedDict(
+            (name, DictionaryColumn() if column_type == STRING
+             else NumericColumn(column_type))
+            for name, column_type, _ in self.schema)
+
+    def __len__(self):
+        """Return the number of rows."""
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name):
+        """Return a column."""
+        return self.columns[name]
+
+    def extend(self, rows, **constants):
+        """Append rows (dicts as the route returns them).
+
+        Each column is filled from all rows at once, so most per-row work
+        is done by map and the arrays rather than Python loops.
+
+        Args:
+            rows (iterable): Row dicts. Keys not in the schema are ignored.
+            **constants: Values for columns that rows don't have (i.e. the
+                network_id of a network's clients). They win over rows.
+        Returns:
+            (int): Number of rows appended.
+
+        """
+        if not isinstance(rows, list):
+            rows = list(rows)
+        if not rows:
+            return 0
+        for name, _, key in self.schema:
+            if name in constants:
+                self.columns[name].extend_constant(constants[name],
+                                                   len(rows))
+            else:
+                self.columns[name].extend([row.get(key) for row in rows])
+        return len(rows)
+
+    def extend_stream(self, rows, batch_rows=BATCH_ROWS, **constants):
+        """Append rows from an iterator, batch_rows at a time.
+
+        Only one batch of row dicts is in memory at once, so a route
+        streamed with iter_json goes straight into the columns.
+        Returns:
+            (int): Number of rows appended.
+
+        """
+        rows = iter(rows)
+        num_rows = 0
+        while True:
+            batch = list(itertools.islice(rows, batch_rows))
+            if not batch:
+                return num_rows
+            num_rows += self.extend(batch, **constants)
+
+    def get_row(self, index):
+        """Return one row as a {column name: value} dict."""
+        return {name: column[index] for name, column in self.columns.items()}
+
+    def count_by(self, *names):
+        """Return {value: rows} of a column, or {(values): rows} of several.
+
+        Counts run over the stored codes/values with collections.Counter
+        (a C loop) and are decoded once per distinct value. Missing values
+        count under None.
+        """
+        columns = [self.columns[name] for name in names]
+        stored = [column.get_stored() for column in columns]
+        if len(columns) == 1:
+            counts = collections.Counter(stored[0])
+            decoded_counts = {}
+            for value, count in counts.items():
+                # Each NaN is its own key, so missing floats are summed.
+                value = columns[0].decode(value)
+                decoded_counts[value] = decoded_counts.get(value, 0) + count
+            return decoded_counts
+        counts = collections.Counter(zip(*stored))
+        decoded_counts = {}
+        for values, count in counts.items():
+            values = tuple(column.decode(value)
+                           for column, value in zip(columns, values))
+            decoded_counts[values] = decoded_counts.get(values, 0) + count
+        return decoded_counts
+
+
+def clients_per_network(client_table):
+    """Return {network id: clients} of a CLIENT_COLUMNS table."""
+    return client_table.count_by('network_id')
+
+
+def devices_per_model(inventory_table):
+    """Return {model: devices} of an INVENTORY_COLUMNS table."""
+    return inventory_table.count_by('model')
+
+
+def ports_per_vlan(port_table):
+    """Return {vlan: ports} of a PORT_COLUMNS table (None for trunks)."""
+    return port_table.count_by('vlan')
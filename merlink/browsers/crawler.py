@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This docstring is used for docopt and requires specific formatting.
+r"""MERLINK CRAWLER
+
+Fetch every applicable JSON route in json_url_routes.py for every matching
+network and stream the results as JSON lines.
+
+It uses relative imports, so run it as a module from the repository root:
+  python -m merlink.browsers.crawler --username <username> ...
+
+Usage:
+  merlink.browsers.crawler --username <username> [--password <password>]
+                           [--org-id <org_id>]...
+                           [--network-type <network_type>]...
+                           [--network-name <network_name>] [--group <group>]...
+                           [--output <file>] [--concurrency <concurrency>]
+                           [--rate <rate>] [--metrics <metrics_file>]
+  merlink.browsers.crawler (-h | --help)
+
+Options:
+  -h, --help            Show this screen.
+  -u <username>, --username <username>
+                        The Dashboard email account that you login with.
+  -p <password>, --password <password>
+                        Your Dashboard account password. Asked securely with
+                        getpass if not entered.
+  -o <org_id>, --org-id <org_id>
+                        Only crawl these orgs. Default is every org.
+  -t <network_type>, --network-type <network_type>
+                        Only crawl these network types (i.e. wired, switch).
+  -n <network_name>, --network-name <network_name>
+                        Only crawl networks whose name contains this text.
+  -g <group>, --group <group>
+                        Only crawl these route groups (i.e. mx, ms, org).
+  -f <file>, --output <file>
+                        JSONL file to write to. Default is stdout.
+  -c <concurrency>, --concurrency <concurrency>
+                        Max requests in flight at once. [default: 8]
+  -r <rate>, --rate <rate>
+                        Max requests per second to each dashboard shard.
+                        Raising --concurrency alone doesn't go past it.
+                        [default: 5]
+  -m <metrics_file>, --metrics <metrics_file>
+                        Write per-route request metrics here when done, as
+                        Prometheus text if it ends in .prom, else as JSON.
+
+Each line looks like:
+  {"org_id": ..., "network_id": ..., "route_key": "mx.dhcp_subnet",
+   "route": "/nodes/dhcp_subnet_json", "status": "ok", "elapsed": 0.21,
+   "data": {...}}
+"""
+import asyncio
+import json
+import sys
+import time
+
+import docopt
+
+from .async_dashboard import AsyncDashboardBrowser, login_from_args
+from .dashboard import DashboardBrowser
+from .pages.json_url_routes import routes
+from .scheduler import BACKGROUND, RequestScheduler
+from .transport import DashboardTransport
+
+# Network types that each route group applies to. None means all networks.
+# Org routes are fetched once per org rather than once per network.
+GROUP_NETWORK_TYPES = {
+    'netwide': None,
+    'node': None,
+    'mx': ['wired'],
+    'ms': ['switch'],
+    'mr': ['wireless'],
+}
+ORG_GROUPS = ['org']
+
+
+def get_route_jobs(orgs_dict, org_ids, network_types=None,
+                   network_name=None, groups=None):
+    """Yield every (org_id, network_id, route_key, route) to crawl.
+
+    This is a generator so that the job list is never held in memory.
+
+    Args:
+        orgs_dict (dict): orgs_dict of a browser whose orgs are loaded.
+        org_ids (list): Orgs to crawl.
+        network_types (list): Only crawl networks of these types.
+        network_name (string): Only crawl networks whose name contains this.
+        groups (list): Only crawl these route groups. Default is all.
+    Yields:
+        (tuple): (org_id, network_id, route_key, route). network_id is None
+            for org routes.
+
+    """
+    if not groups:
+        groups = list(GROUP_NETWORK_TYPES) + ORG_GROUPS
+    for org_id in org_ids:
+        yield from get_org_route_jobs(org_id, groups)
+        networks = orgs_dict[org_id]['node_groups']
+        for network_id in networks:
+            network = networks[network_id]
+            if is_crawled_network(network, network_types, network_name):
+                yield from get_network_route_jobs(
+                    org_id, network_id, network['network_type'], groups)
+
+
+def get_group_routes(group):
+    """Yield (route_key, route) of each route of a group in the catalog."""
+    for route_key, route in sorted(routes[group].items()):
+        # Incomplete entries in the catalog are not routes.
+        if route.startswith('/'):
+            yield group + '.' + route_key, route
+
+
+def get_org_route_jobs(org_id, groups):
+    """Yield the jobs of the org routes of groups (see get_route_jobs)."""
+    for group in groups:
+        if group in ORG_GROUPS:
+            for route_key, route in get_group_routes(group):
+                yield org_id, None, route_key, route
+
+
+def is_crawled_network(network, network_types, network_name):
+    """Return whether a network matches the filters of get_route_jobs."""
+    if network['is_config_template']:
+        return False
+    if network_types and network['network_type'] not in network_types:
+        return False
+    return not network_name or \
+        network_name.lower() in network['n'].lower()
+
+
+def get_network_route_jobs(org_id, network_id, network_type, groups):
+    """Yield the jobs of the routes of groups that apply to a network."""
+    for group in groups:
+        if group not in GROUP_NETWORK_TYPES:
+            continue
+        group_types = GROUP_NETWORK_TYPES[group]
+        if group_types and network_type not in group_types:
+            continue
+        for route_key, route in get_group_routes(group):
+            yield org_id, network_id, route_key, route
+
+
+async def crawl_job(browser, job):
+    """Fetch one route and return its JSONL record.
+
+    Args:
+        browser (AsyncDashboardBrowser): Logged in browser.
+        job (tuple): (org_id, network_id, route_key, route)
+    Returns:
+        (dict): Record with org_id, network_id, route_key, route, status,
+            elapsed and data (or error).
+
+    """
+    org_id, network_id, route_key, route = job
+    record = {
+        'org_id': org_id,
+        'network_id': network_id,
+        'route_key': route_key,
+        'route': route,
+    }
+    start_time = time.time()
+    try:
+        record['data'] = await browser.scrape_json(
+            route, org_id, network_id)
+        record['status'] = 'ok'
+    # Any failure is recorded so that one bad route doesn't stop the crawl.
+    except Exception as error:  # pylint: disable=broad-except
+        record['status'] = type(error).__name__
+        record['error'] = str(error)
+    record['elapsed'] = round(time.time() - start_time, 4)
+    return record
+
+
+async def crawl(browser, org_ids=None, output=None, network_types=None,
+                network_name=None, groups=None):
+    """Crawl every applicable route of every matching network.
+
+    Up to browser.max_concurrency workers pull jobs from a generator and
+    write each record as soon as it arrives, so memory stays flat no matter
+    how many networks are crawled.
+
+    Args:
+        browser (AsyncDashboardBrowser): Logged in browser.
+        org_ids (list): Orgs to crawl. Default is every org.
+        output (file): Text file to write JSON lines to. Default is stdout.
+        network_types (list): See get_route_jobs.
+        network_name (string): See get_route_jobs.
+        groups (list): See get_route_jobs.
+    Returns:
+        (dict): {status: count} over every record written.
+
+    """
+    if output is None:
+        output = sys.stdout
+    if not org_ids:
+        org_ids = list(browser.orgs_dict)
+    # Networks must be known before jobs can be generated.
+    await asyncio.gather(*[browser.set_org_id(org_id) for org_id in org_ids])
+    jobs = get_route_jobs(browser.orgs_dict, org_ids, network_types,
+                          network_name, groups)
+    status_counts = {}
+
+    async def worker():
+        """Fetch and write records until there are no jobs left."""
+        # next() never yields to the loop, so workers can share the generator.
+        for job in jobs:
+            record = await crawl_job(browser, job)
+            output.write(json.dumps(record) + '\n')
+            output.flush()
+            status = record['status']
+            status_counts[status] = status_counts.get(status, 0) + 1
+
+    await asyncio.gather(
+        *[worker() for _ in range(browser.max_concurrency)])
+    return status_counts
+
+
+def main():
+    """Log in with command line credentials and crawl to stdout/a file."""
+    args = docopt.docopt(__doc__)
+    concurrency = int(args['--concurrency'])
+    # Crawls yield to interactive requests sharing the same shards.
+    transport = DashboardTransport(
+        pool_maxsize=concurrency, priority=BACKGROUND,
+        scheduler=RequestScheduler(rate=float(args['--rate'])))
+    browser = AsyncDashboardBrowser(
+        max_concurrency=concurrency,
+        browser=DashboardBrowser(transport=transport))
+    login_from_args(browser, args)
+    loop = asyncio.get_event_loop()
+    output = open(args['--output'], 'w') if args['--output'] else sys.stdout
+    try:
+        status_counts = loop.run_until_complete(crawl(
+            browser, args['--org-id'], output, args['--network-type'],
+            args['--network-name'], args['--group']))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        loop.run_until_complete(browser.logout())
+    print('Crawl finished:', status_counts, file=sys.stderr)
+    if args['--metrics']:
+        with open(args['--metrics'], 'w') as metrics_file:
+            if args['--metrics'].endswith('.prom'):
+                metrics_file.write(transport.metrics.to_prometheus())
+            else:
+                json.dump(transport.metrics.get_snapshot(), metrics_file)
+
+
+if __name__ == '__main__':
+    main()
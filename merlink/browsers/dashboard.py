@@ -14,16 +14,23 @@
 # limitations under the License.
 """API to interact with the Meraki Dashboard using the requests module."""
 import re
-import json
+import time
 
 import requests
 import mechanicalsoup
 
-from . import add_functions_as_methods, page_scrapers
-from .pages.page_hunters import get_pagetext_links
+from . import add_functions_as_methods, page_scrapers, table_exporters
+from .json_stream import CHUNK_BYTES, iter_json_items
+from .org_index import OrgIndex
+from .org_loader import OrgLoader
+from .page_store import PageStore
+from .route_urls import get_route_key
+from .pages import page_utils
+from .pages.page_hunters import SideNavigation
+from .transport import DashboardTransport
 
 
-@add_functions_as_methods(page_scrapers)
+@add_functions_as_methods(page_scrapers + table_exporters)
 class DashboardBrowser:
     """API to interact with the Meraki Dashboard using the requests module.
 
@@ -32,6 +39,8 @@ class DashboardBrowser:
 
     Attributes:
         mechsoup (MechanicalSoup): Main browser object to send data to dashboard
+        transport (DashboardTransport): Pooled session that every request to
+            dashboard goes through (mechsoup uses it as its session).
 
         vpn_vars (dict): List of VPN variables (does the browser need access
         to this?)
@@ -63,12 +72,30 @@ class DashboardBrowser:
         active_org_id (int): id of active org.
         active_network_id (int): id of active network.
         is_network_admin (string): If admin has networks but no org access
+        pagetexts (PageStore): Raw bodies of visited pages, bounded in size.
+        unparsed_url (string): URL of the current page if it was opened
+            with parse=False and has not been parsed yet. Its body is in
+            pagetexts and mechsoup only holds an empty placeholder page.
+        side_navs (dict): {(host, eid): SideNavigation} of every network
+            whose side navigation has been read.
+        org_index (OrgIndex): Name/type indexes over orgs_dict. Use
+            get_org_index, which keeps it in step with orgs_dict.
 
     """
-    def __init__(self):
-        """Initialize the browser and other class-wide variables."""
+    def __init__(self, transport=None):
+        """Initialize the browser and other class-wide variables.
+
+        Args:
+            transport (DashboardTransport): Preconfigured transport to use
+                (i.e. with larger pools). A default one is created if None.
+
+        """
         super(DashboardBrowser, self).__init__()
+        if transport is None:
+            transport = DashboardTransport()
+        self.transport = transport
         self.mechsoup = mechanicalsoup.StatefulBrowser(
+            session=self.transport,
             soup_config={'features': 'lxml'},  # Use the lxml HTML parser
             raise_on_404=True,
             # User Agent String is for the Nintendo Switch because why not
@@ -84,8 +111,11 @@ class DashboardBrowser:
         self.org_qty = 1
         self.active_org_id = 0
         self.active_network_id = 0
-        self.pagetexts = {}
-        self.pagelinks = []
+        self.pagetexts = PageStore()
+        self.unparsed_url = None
+        self.side_navs = {}
+        self.org_index = None
+        self.org_loader = OrgLoader()
 
         # VPN VARS: Powershell Variables set to defaults
         # If it's set to '', then powershell will skip reading that parameter.
@@ -126,9 +156,11 @@ class DashboardBrowser:
 
         print(result_url)
         if result_url.find('/login/login') != -1:
-            result_string = 'auth_error'
+            return 'auth_error'
+        # Pages fetched from here on are cached for this account only.
+        self.set_cache_account(username, password)
         # Two-Factor redirect: https://account.meraki.com/login/sms_auth?go=%2F
-        elif result_url.find('sms_auth') != -1:
+        if result_url.find('sms_auth') != -1:
             if tfa_code:
                 if self.tfa_submit_info(tfa_code):
                     result_string = 'auth_success'
@@ -159,11 +191,10 @@ class DashboardBrowser:
         form = self.mechsoup.select_form()
         self.mechsoup['code'] = tfa_code
         form.choose_submit('commit')  # Click 'Verify' button
-        self.mechsoup.submit_selected()
+        response = self.mechsoup.submit_selected()
 
-        active_page = self.get_page().text
         # Will return -1 if it is not found
-        if active_page.find("Invalid verification code") == -1:
+        if response.text.find("Invalid verification code") == -1:
             print("TFA Success")
             return True
         print("TFA Failure")
@@ -191,8 +222,11 @@ class DashboardBrowser:
         if self.mechsoup.get_url().find('org_list') != -1:  # Admin orgs = 2+
             self.bypass_org_choose_page(page)
 
-        self.orgs_dict = self.scrape_json(
-            '/organization/administered_orgs')
+        # A new orgs_dict (and loader) so indexes of the old one are dropped.
+        self.orgs_dict = {}
+        self.org_loader = OrgLoader(self.org_loader.max_age)
+        self.org_loader.merge(self.orgs_dict, self.scrape_json(
+            '/organization/administered_orgs'))
         # Filter for wired as we only care about firewall networks
         for org_id in self.orgs_dict:
             # Find active_org_id by finding the name of the org we're in
@@ -227,8 +261,17 @@ class DashboardBrowser:
                         + org_href_lines[0]['href']
         self.mechsoup.open(bootstrap_url)
 
+    def set_cache_account(self, username, password):
+        """Scope the transport's response cache (if any) to an account."""
+        cache = getattr(self.transport, 'cache', None)
+        if cache is not None:
+            cache.set_account(username, password)
+
     def logout(self):
-        """Logout out of Dashboard."""
+        """Logout out of Dashboard and drop its cached pages."""
+        cache = getattr(self.transport, 'cache', None)
+        if cache is not None:
+            cache.forget_account()
         self.mechsoup.open('https://account.meraki.com/login/logout')
         if '/login/dashboard_login' in self.get_url():
             print("Logout successful!")
@@ -242,13 +285,105 @@ class DashboardBrowser:
         return self.mechsoup.get_url()
 
     def get_page(self):
-        """Return the current pagetext."""
+        """Return the current pagetext, parsing it if need be."""
+        url = self.get_url()
+        if self.unparsed_url is not None and self.unparsed_url == url:
+            self.unparsed_url = None
+            started_at = time.perf_counter()
+            self.mechsoup.open_fake_page(self.pagetexts.get_body(url),
+                                         url=url)
+            self.transport.metrics.observe_parse(
+                url, time.perf_counter() - started_at)
         return self.mechsoup.get_current_page()
 
+    def get_pagetext(self):
+        """Return the current page's HTML as a string for the page hunters.
+
+        The raw body kept in pagetexts is decoded once and memoized, so this
+        neither parses the page nor walks its soup. Pages that mechsoup
+        opened directly (i.e. login pages) are serialized from their soup.
+        """
+        url = self.get_url()
+        if url in self.pagetexts:
+            return self.pagetexts.get_text(url)
+        return str(self.get_page())
+
+    def get_page_elements(self, *element_ids):
+        """Return a soup of only these elements of the current page.
+
+        For scrapers that need a few elements by id. If the page has not
+        been parsed yet (see open_route's parse), only as much of it as is
+        needed to find the elements is parsed. Otherwise the full page soup
+        is returned.
+
+        Args:
+            *element_ids (string): ids of the elements (i.e. 'var-id').
+        Returns:
+            (BeautifulSoup): Soup with (at least) those elements.
+
+        """
+        url = self.get_url()
+        if self.unparsed_url is None or self.unparsed_url != url:
+            return self.get_page()
+        started_at = time.perf_counter()
+        soup = page_utils.get_partial_page(self.pagetexts.get_body(url),
+                                           element_ids,
+                                           self.pagetexts.get_encoding(url))
+        self.transport.metrics.observe_parse(
+            url, time.perf_counter() - started_at)
+        return soup
+
+    def get_route_snapshot(self, snapshot_type):
+        """Return a snapshot record of the current page.
+
+        Every field of the snapshot is read from one (partial) parse of the
+        page. Snapshots are kept with the stored page, so reading any field
+        again doesn't parse the page again.
+
+        Args:
+            snapshot_type (class): Record with element_ids and from_page
+                (i.e. pages.mx.ClientVpnSettings).
+        Returns:
+            An instance of snapshot_type.
+
+        """
+        url = self.get_url()
+        snapshot = self.pagetexts.get_snapshot(url, snapshot_type)
+        if snapshot is None:
+            snapshot = snapshot_type.from_page(
+                self.get_page_elements(*snapshot_type.element_ids))
+            self.pagetexts.add_snapshot(url, snapshot)
+        return snapshot
+
+    def get_page_json(self, key, default=-1):
+        """Return the value of a key in the JSON blobs of the current page.
+
+        The page's keys are indexed the first time this is called for it, so
+        looking up several keys of one page scans it once. The raw body is
+        used, so the page does not need to be parsed.
+
+        Args:
+            key (string): See page_hunters.PageJsonIndex.get.
+            default: Returned if the page does not have the key.
+
+        """
+        return self.pagetexts.get_json_index(self.get_url()).get(key, default)
+
+    def get_org_index(self):
+        """Return the OrgIndex of orgs_dict, rebuilding it if need be.
+
+        It is rebuilt when orgs_dict is replaced (i.e. by org_data_setup or
+        a restored session). An org's network index is rebuilt on its own
+        when that org's node_groups are replaced.
+        """
+        if self.org_index is None or not self.org_index.is_current(
+                self.orgs_dict):
+            self.org_index = OrgIndex(self.orgs_dict)
+        return self.org_index
+
     def get_org_names(self):
         """Get a list of org names."""
-        orgs = [self.orgs_dict[org_id]['name'] for org_id in self.orgs_dict]
-        return sorted(orgs)
+        return self.get_org_index().get_org_names()
 
     def get_active_org_name(self):
         """Return the active org name."""
@@ -256,19 +391,35 @@ class DashboardBrowser:
 
     def get_network_names(self, network_types=None):
         """Get the network name for every network in the active org."""
-        # If no network types are specified, provide all.
-        if not network_types:
-            network_types = ['wired', 'switch', 'wireless',
-                             'camera', 'systems_manager', 'phone']
-        networks = self.orgs_dict[self.active_org_id]['node_groups']
-        network_list = []
-        for net_id in networks:
-            is_desired_type = networks[net_id]['network_type'] in network_types
-            is_template = networks[net_id]['is_config_template']
-            if is_desired_type and not is_template:
-                ntwk_name = networks[net_id]['n'].replace(' - appliance', '')
-                network_list.append(ntwk_name)
-        return sorted(network_list)
+        # If no network types are specified, provide all (see OrgIndex).
+        return self.get_org_index().get_network_index(
+            self.active_org_id).get_network_names(network_types)
+
+    def search_org_names(self, query, limit=10):
+        """Return the org names that best match a query, best first.
+
+        Matches are ranked exact > prefix > word prefix > substring > fuzzy
+        (see NameSearchIndex), so typos still find an org.
+        """
+        return [result.name for result in
+                self.get_org_index().search_orgs(query, limit)]
+
+    def search_network_names(self, query, network_types=None, limit=10):
+        """Return the active org's network names that best match a query.
+
+        Ranked like search_org_names. Config templates are left out, as in
+        get_network_names.
+
+        Args:
+            query (string): Whole, partial or misspelled network name.
+            network_types (list): Types to include. All if None/empty.
+            limit (int): Most names to return. All matches if None.
+
+        """
+        return [result.name for result in
+                self.get_org_index().get_network_index(
+                    self.active_org_id).search_networks(
+                        query, network_types, limit)]
 
     def get_active_network_name(self):
         """Get the active network name."""
@@ -290,10 +441,12 @@ class DashboardBrowser:
             new_org_url = base + 'o/' + org_eid + '/manage/organization/'
             self.mechsoup.open(new_org_url)
             # If networks haven't been retrieved for this org (occurs once/org)
-            if not self.orgs_dict[self.active_org_id]['node_groups']:
-                new_org_dict = self.scrape_json(
-                    '/organization/administered_orgs')[self.active_org_id]
-                self.orgs_dict[self.active_org_id] = new_org_dict
+            if self.org_loader.needs_load(self.orgs_dict, org_id):
+                # Merged one org at a time as it is downloaded.
+                self.org_loader.merge(
+                    self.orgs_dict,
+                    self.iter_json('/organization/administered_orgs'),
+                    org_id)
             # Set active network id by choosing first network.
             self.active_network_id = \
                 list(self.orgs_dict[self.active_org_id]['node_groups'])[0]
@@ -328,14 +481,12 @@ class DashboardBrowser:
         choose the first one. Only the identifying part of the name needs to
         be entered (i.e. 'Organi' for 'Organiztion')
         """
-        try:
-            org_id = next(i for i in self.orgs_dict if org_name.lower()
-                          in self.orgs_dict[i]['name'].lower())
-            self.set_org_id(org_id)
-        except StopIteration:
+        org_id = self.get_org_index().find_org_id(org_name)
+        if org_id is None:
             print("\nERROR:", org_name, "was not found among your orgs!"
                   "\nExiting...\n")
             raise LookupError
+        self.set_org_id(org_id)
 
     def set_network_name(self, network_name, network_type=None):
         """Set the active network id by network name.
@@ -349,45 +500,176 @@ class DashboardBrowser:
             network_type (string): Network_type if there is ambiguity
                 due to a combined network. See below for valid types.
         """
-        # If network type is not passed in, specify all.
-        if not network_type:
-            network_type = ['wired', 'switch', 'wireless',
-                            'camera', 'systems_manager', 'phone']
-        org_id = self.active_org_id
-        chosen_network_id = ''
-        net_dict = self.orgs_dict[org_id]['node_groups']
-        for network_id in net_dict:
-            ntwk_name = net_dict[network_id]['n'].lower()
-            desired_network_type = \
-                (net_dict[network_id]['network_type'] in network_type)
-            if network_name.lower() in ntwk_name and desired_network_type:
-                chosen_network_id = network_id
-                print('chosen_network_id', chosen_network_id)
-                break
+        # If network type is not passed in, any type will do.
+        chosen_network_id = self.get_org_index().get_network_index(
+            self.active_org_id).find_network_id(network_name, network_type)
         # If chosen_network_id was not found.
-        if not chosen_network_id:
+        if chosen_network_id is None:
             print("\nERROR:", network_name, "was not found in this org!"
                   "\nExiting...\n")
             raise LookupError
+        print('chosen_network_id', chosen_network_id)
 
         self.set_network_id(chosen_network_id)
 
     # Fns that open dashboard pages and get content from them.
     ###########################################################################
-    def scrape_json(self, route):
-        """Return the JSON containing node-data(route:/configure/settings).
-        Valid targets:
+    def scrape_json(self, route, network_eid=None, org_eid=None,
+                    redirect_ok=False):
+        """Return the JSON found at a route (i.e. /configure/settings).
 
+        The URL is built the same way as open_route builds it, but the
+        route is requested once and decoded straight to JSON. The browser
+        does not navigate, so there is no second download or HTML parse.
+
+        Args:
+            route (string): Route of a JSON page. See json_url_routes.py.
+            network_eid (string): See open_route.
+            org_eid (string): See open_route.
+            redirect_ok (bool): See open_route.
+        Returns:
+            (dict|list): The decoded JSON.
 
         """
-        self.open_route(route)
+        target_url = self.get_route_url(route, network_eid=network_eid,
+                                        org_eid=org_eid)
+        print("Fetching", target_url, "...")
+        # Session already holds the cookies and a warm connection to the shard
+        response = self.transport.get(target_url)
+        if response.status_code == 404:
+            print('Attempting to fetch JSON from', target_url, 'and failed.')
+            raise mechanicalsoup.utils.LinkNotFoundError
+        # It's ok if dashboard adds URL junk at the end.
+        if target_url not in response.url and not redirect_ok:
+            self.handle_redirects(target_url, response.url)
+        started_at = time.perf_counter()
+        json_data = response.json()
+        self.transport.metrics.observe_parse(
+            target_url, time.perf_counter() - started_at)
+        return json_data
+
+    def iter_json(self, route, path=(), network_eid=None, org_eid=None,
+                  redirect_ok=False):
+        """Yield the items of a JSON route as they are downloaded.
+
+        Like scrape_json, but the body is streamed and decoded one item at
+        a time (see json_stream), so memory stays proportional to one item
+        (i.e. one org of administered_orgs or one client of
+        client_list_json) instead of the whole payload. Streamed bodies are
+        not cached.
+
+        Args:
+            route (string): Route of a JSON page. See json_url_routes.py.
+            path (tuple): Keys of the object/array to yield the items of.
+                The top level if empty.
+            network_eid (string): See open_route.
+            org_eid (string): See open_route.
+            redirect_ok (bool): See open_route.
+        Yields:
+            (key, value) of each item (index, value for arrays).
+
+        """
+        target_url = self.get_route_url(route, network_eid=network_eid,
+                                        org_eid=org_eid)
+        return self.iter_url_json(target_url, path, redirect_ok)
+
+    def iter_url_json(self, target_url, path=(), redirect_ok=False):
+        """Yield the items of the JSON at a URL as they are downloaded.
+
+        See iter_json. For URLs of an explicit org/network (see
+        get_context_route_url).
+        """
+        print("Streaming", target_url, "...")
+        response = self.transport.get(target_url, stream=True)
+        try:
+            if response.status_code == 404:
+                print('Attempting to fetch JSON from', target_url,
+                      'and failed.')
+                raise mechanicalsoup.utils.LinkNotFoundError
+            if target_url not in response.url and not redirect_ok:
+                self.handle_redirects(target_url, response.url)
+            for item in iter_json_items(
+                    response.iter_content(CHUNK_BYTES), path):
+                yield item
+        finally:
+            response.close()
+
+    def get_route_url(self, route, is_combined_network=None,
+                      network_eid=None, org_eid=None):
+        """Build the full URL for a route without opening it.
+
+        See open_route for a description of the arguments.
+
+        Returns:
+            (string): The URL that open_route/scrape_json would request.
+
+        """
+        if is_combined_network:
+            target_url = self.combined_network_redirect(route,
+                                                        is_combined_network)
+            if not target_url:
+                raise LookupError
+            return target_url
+        return self.get_url_partial(route, network_eid, org_eid) + \
+            '/manage' + route
+
+    def get_url_partial(self, route, network_eid=None, org_eid=None):
+        """Return the URL that a route's '/manage' + route is added to.
+
+        See open_route for a description of the arguments.
+        """
         current_url = self.mechsoup.get_url()
-        cookiejar = self.mechsoup.get_cookiejar()
-        json_text = requests.get(current_url, cookies=cookiejar).text
-        return json.loads(json_text)
+        url_base = current_url.split('.com/')[0]
+        if network_eid:
+            name = self.orgs_dict[self.active_org_id]['node_groups'][
+                self.active_network_id]['t']
+            url_partial = url_base + '.com/' + name + '/n/' + network_eid
+        elif org_eid:
+            url_partial = url_base + '.com/o/' + org_eid
+        # Requires orgs_dict to have content.
+        # Force an org redirect without enough info when the route needs it
+        elif self.orgs_dict and 'administered_orgs' not in route and \
+                ('organization' in route or 'license_info' in route
+                 or 'new_status' in route or 'app_analytics' in route):
+            active_org_eid = self.orgs_dict[self.active_org_id]['eid']
+            url_partial = url_base + '.com/o/' + active_org_eid
+        else:
+            # If there is no org/network change, then use current base url
+            url_partial, _ = current_url.split('/manage')
+        return url_partial
+
+    def get_context_route_url(self, route, org_id, network_id=None):
+        """Build the URL for a route in an explicit org/network.
+
+        Unlike get_route_url, this does not depend on the current page or
+        the active org/network, so it is safe to call from several threads.
+
+        Args:
+            route (string): Text following '/manage' in the url.
+            org_id (int): Key of the org in orgs_dict.
+            network_id (string): Key of the network in the org's node_groups.
+                If None, the org-level URL is built.
+        Returns:
+            (string): https://n<shard_id>.meraki.com/.../manage<route>
+
+        """
+        if org_id not in self.orgs_dict:
+            print("\nERROR:", org_id, "is not one of your org ids!")
+            raise LookupError
+        org = self.orgs_dict[org_id]
+        base = 'https://n' + str(org['shard_id']) + '.meraki.com/'
+        if network_id is None:
+            return base + 'o/' + org['eid'] + '/manage' + route
+        if network_id not in org['node_groups']:
+            print("\nERROR:", network_id, "is not a network id in org",
+                  org_id, "!")
+            raise LookupError
+        name = org['node_groups'][network_id]['t']
+        return base + name + '/n/' + network_id + '/manage' + route
 
     def open_route(self, route, is_combined_network=None,
-                   network_eid=None, org_eid=None, redirect_ok=False):
+                   network_eid=None, org_eid=None, redirect_ok=False,
+                   parse=True):
         """Redirect the browser to a page, given its route.
 
         Each page in dashboard has a route. If we're already at the page we
@@ -411,59 +693,77 @@ class DashboardBrowser:
             redirect_ok (bool): Allow redirects without complaining.
                 NOTE: AVOID IF POSSIBLE. Redirects are usually a sign that
                 you are doing something wrong.
+            parse (bool): Whether to parse the page now. Scrapers that only
+                read elements with get_page_elements pass False, so the
+                full page is only parsed if get_page is called.
         """
-        if is_combined_network:
-            target_url = self.combined_network_redirect(route,
-                                                        is_combined_network)
-            if not target_url:
-                raise LookupError
-        else:
-            current_url = self.mechsoup.get_url()
-            url_base = current_url.split('.com/')[0]
-            if network_eid:
-                name = self.orgs_dict[self.active_org_id]['node_groups'][
-                    self.active_network_id]['t']
-                url_partial = url_base + '.com/' + name + '/n/' + network_eid
-            elif org_eid:
-                url_partial = url_base + '.com/o/' + org_eid
-            # Requires orgs_dict to have content.
-            # Force an org redirect without enough info when the route needs it
-            elif self.orgs_dict and 'administered_orgs' not in route and \
-                    ('organization' in route or 'license_info' in route
-                     or 'new_status' in route or 'app_analytics' in route):
-                active_org_eid = self.orgs_dict[self.active_org_id]['eid']
-                url_partial = url_base + '.com/o/' + active_org_eid
-            else:
-                # If there is no org/network change, then use current base url
-                url_partial, _ = current_url.split('/manage')
-            target_url = url_partial + '/manage' + route
+        target_url = self.get_route_url(route, is_combined_network,
+                                        network_eid, org_eid)
 
         # Don't go to where we already are or have been!
-        has_pagetext = [i for i in self.pagetexts.keys() if target_url in i]
-        if self.get_url() != target_url and not has_pagetext:
+        target_key = get_route_key(target_url)
+        current_url = self.get_url()
+        is_current_page = bool(current_url) and \
+            get_route_key(current_url) == target_key
+        if not is_current_page and target_url not in self.pagetexts:
             try:
-                self.mechsoup.open(target_url)
+                if parse:
+                    started_at = time.perf_counter()
+                    response = self.mechsoup.open(target_url)
+                    # mechsoup parses the page as soon as it has the response
+                    self.transport.metrics.observe_parse(
+                        target_url, time.perf_counter() - started_at
+                        - response.request_seconds)
+                else:
+                    response = self.transport.get(target_url)
+                    if response.status_code == 404:
+                        raise mechanicalsoup.utils.LinkNotFoundError
+                    # Stored under target_url, so that's the current URL.
+                    self.mechsoup.open_fake_page('', url=target_url)
+                    self.unparsed_url = target_url
                 print("Opening", target_url, "...")
-                self.pagetexts[target_url] = self.get_page()
-                opened_url = self.mechsoup.get_url()
+                self.pagetexts.add(
+                    target_url, response.content,
+                    page_utils.get_declared_encoding(response))
+                opened_url = response.url
                 # It's ok if dashboard adds URL junk at the end.
-                has_been_redirected = target_url not in opened_url
+                has_been_redirected = get_route_key(opened_url) != target_key
                 if has_been_redirected and not redirect_ok:
                     self.handle_redirects(target_url, opened_url)
             except mechanicalsoup.utils.LinkNotFoundError:
                 print('Attempting to open', self.get_url(), 'with route',
                       route, 'and failed.')
                 raise mechanicalsoup.utils.LinkNotFoundError
-        else:
+        elif not is_current_page:
             print("Not opening route because we have pagetext for this page.")
+            # Make the stored page the current page again.
+            self.mechsoup.open_fake_page('', url=target_url)
+            self.unparsed_url = target_url
+            if parse:
+                self.get_page()
+
+    def get_side_nav(self):
+        """Return the side navigation of the current page's network.
+
+        It is read from the raw body of the first page of a network that
+        needs it and then cached, as every page of a network has the same
+        side nav.
+
+        Returns:
+            (SideNavigation): Links of the network's pages by category.
+        Raises:
+            LookupError: If the current page has no side navigation.
+
+        """
+        url = self.get_url()
+        network_key = get_route_key(url)[:2]
+        if network_key not in self.side_navs:
+            self.side_navs[network_key] = SideNavigation(self.get_pagetext())
+        return self.side_navs[network_key]
 
     def combined_network_redirect(self, route, category):
         """Redirect to a different network type in a combined network."""
-        pagelink_dict = get_pagetext_links(self.get_page().text)
-        for page in pagelink_dict[category]:
-            page_url = pagelink_dict[category][page]
-            if route in page_url:
-                return page_url
+        return self.get_side_nav().get_url(route, category)
 
     @staticmethod
     def handle_redirects(target_url, opened_url):
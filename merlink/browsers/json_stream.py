@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Decode the items of a large JSON document one at a time.
+
+response.json() keeps the whole body and the whole decoded object in memory
+together. For administered_orgs, client_list_json or inventory_data of a
+large org that is hundreds of MB. iter_json_items reads the body in chunks
+and yields each item of the object or array at a path as soon as it has
+been read, so only one item (plus a chunk) is held at a time:
+
+    chunks = response.iter_content(CHUNK_BYTES)
+    for org_id, org in iter_json_items(chunks):           # every org
+        ...
+    for network_id, network in iter_json_items(
+            chunks, (org_id, 'node_groups')):              # one org's
+        ...
+
+Each item is decoded by the json module's C decoder. Values that are not on
+the path are decoded and dropped one at a time as well.
+"""
+import codecs
+import json
+
+CHUNK_BYTES = 64 * 1024
+JSON_DECODER = json.JSONDecoder()
+WHITESPACE = ' \t\n\r'
+# What may follow a value in valid JSON.
+VALUE_ENDS = WHITESPACE + ',:]}'
+
+
+class JsonStream:
+    """Text of a JSON document read chunk by chunk.
+
+    Attributes:
+        chunks (iterator): Remaining bytes/str chunks.
+        decoder (codecs.IncrementalDecoder): UTF-8 decoder for bytes chunks.
+        buffer (string): Text read and not yet consumed (from pos).
+        pos (int): Position of the next unread char in buffer.
+        is_done (bool): Whether every chunk has been read.
+
+    """
+
+    def __init__(self, chunks):
+        """Read from an iterable of bytes or str chunks."""
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.is_done = False
+
+    def read_more(self, min_chars=1):
+        """Append chunks until min_chars more chars are read or it ends.
+
+        Consumed text is dropped first, so the buffer only ever holds the
+        item being decoded.
+        Returns:
+            (bool): Whether anything was read.
+
+        """
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        parts = []
+        num_chars = 0
+        while num_chars < min_chars and not self.is_done:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.is_done = True
+                chunk = self.decoder.decode(b'', final=True)
+            elif isinstance(chunk, bytes):
+                chunk = self.decoder.decode(chunk)
+            parts.append(chunk)
+            num_chars += len(chunk)
+        self.buffer += ''.join(parts)
+        return num_chars > 0
+
+    def peek(self):
+        """Return the next char that is not whitespace ('' at the end)."""
+        while True:
+            while self.pos < len(self.buffer) and \
+                    self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_more():
+                return ''
+
+    def expect(self, chars):
+        """Consume and return the next char, which must be one of chars.
+
+        Raises:
+            ValueError: If it isn't.
+
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError('Expected one of {!r} at {!r}'.format(
+                chars, self.buffer[self.pos:self.pos + 20]))
+        self.pos += 1
+        return char
+
+    def decode_value(self):
+        """Decode and consume the next JSON value.
+
+        A value may be cut short by the end of the buffer (i.e. 12 or 12. of
+        12.5), so it is only accepted once the char after it has been read
+        and can end a value. More text is read until the value decodes, at
+        least doubling what is buffered each time so a large value is
+        retried a logarithmic number of times.
+
+        Raises:
+            ValueError: If the document is not valid JSON.
+
+        """
+        self.peek()
+        while True:
+            decoded = self.try_decode()
+            if decoded is None:
+                continue
+            value, end = decoded
+            if self.is_value_end(end):
+                self.pos = end
+                return value
+            self.read_more()
+
+    def try_decode(self):
+        """Return (value, end) of the buffered value, or None if cut short.
+
+        Reads at least as much again as is buffered when it is cut short.
+        Raises:
+            ValueError: If it doesn't decode and the document has ended.
+
+        """
+        try:
+            return JSON_DECODER.raw_decode(self.buffer, self.pos)
+        except ValueError:
+            if not self.read_more(max(1, len(self.buffer) - self.pos)):
+                raise
+            return None
+
+    def is_value_end(self, end):
+        """Return whether a value decoded up to end can't be cut short."""
+        return self.is_done or (end < len(self.buffer) and
+                                self.buffer[end] in VALUE_ENDS)
+
+
+def iter_json_items(chunks, path=()):
+    """Yield the items of the object/array at path in a JSON document.
+
+    Args:
+        chunks (iterable): The document as bytes or str chunks (i.e.
+            response.iter_content(CHUNK_BYTES)).
+        path (tuple): Keys (strings for objects, ints for arrays) of the
+            container to yield from. The top level if empty.
+    Yields:
+        (key, value) of each item of an object, (index, value) of an array.
+    Raises:
+        KeyError: If the path is not in the document.
+        ValueError: If the document is not valid JSON or the path does not
+            end at an object/array.
+
+    """
+    stream = JsonStream(chunks)
+    for step in path:
+        for key in iter_keys(stream):
+            if key == step:
+                break
+            stream.decode_value()
+        else:
+            raise KeyError(step)
+    for key in iter_keys(stream):
+        yield key, stream.decode_value()
+
+
+def iter_keys(stream):
+    """Consume an object/array's opening, yielding before each value.
+
+    Yields the key (or index) of each item; the caller must consume the
+    item's value before the next one is yielded.
+    """
+    opening = stream.expect('{[')
+    closing = '}' if opening == '{' else ']'
+    index = 0
+    if stream.peek() == closing:
+        stream.pos += 1
+        return
+    while True:
+        if opening == '{':
+            key = stream.decode_value()
+            stream.expect(':')
+        else:
+            key = index
+        yield key
+        index += 1
+        if stream.expect(',' + closing) == closing:
+            return
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Per-route request metrics.
+
+DashboardTransport records every request it answers (live or cached) and
+the browsers record how long pages take to parse, all keyed by shard host
+and route (the canonical route without its query string). Metrics can be
+read from Python or exported:
+
+    metrics = browser.transport.metrics
+    metrics.get_route_stats('n1.meraki.com', '/configure/settings')
+    print(metrics.to_prometheus())
+    json.dump(metrics.get_snapshot(), open('metrics.json', 'w'))
+"""
+import threading
+import time
+
+from .route_urls import get_route_key
+
+# Upper bounds of the latency/parse time buckets in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0)
+CACHE_RESULTS = ('hit', 'revalidated', 'stale', 'miss', 'uncached')
+# (name, help, RouteMetrics attribute) of each exported metric
+HISTOGRAM_METRICS = (
+    ('merlink_request_seconds', 'Dashboard request latency.', 'latency'),
+    ('merlink_parse_seconds', 'Time to parse a response.', 'parse'))
+COUNTER_METRICS = (
+    ('merlink_response_bytes_total', 'Response body bytes.', 'bytes'),
+    ('merlink_redirects_total', 'Redirects followed.', 'redirects'),
+    ('merlink_request_errors_total', 'Requests that raised an error.',
+     'errors'))
+
+
+def get_route_labels(url):
+    """Return the (host, route) labels of a url, dropping the query."""
+    host, _, route = get_route_key(url)
+    return host, route.split('?')[0]
+
+
+def get_metric_header(name, help_text, metric_type):
+    """Return the HELP and TYPE lines of a Prometheus metric."""
+    return ['# HELP ' + name + ' ' + help_text,
+            '# TYPE ' + name + ' ' + metric_type]
+
+
+def get_sample(name, labels, value):
+    """Return a Prometheus sample line (repr keeps floats exact)."""
+    return name + labels + ' ' + (
+        repr(value) if isinstance(value, float) else str(value))
+
+
+def get_histogram_lines(name, host, route, histogram):
+    """Return the _bucket, _sum and _count lines of a route's Histogram."""
+    lines = []
+    for bound, count in histogram.get_cumulative_counts():
+        bucket_labels = get_labels(host, route, (
+            'le', '+Inf' if bound == float('inf') else repr(bound)))
+        lines.append(get_sample(name + '_bucket', bucket_labels, count))
+    labels = get_labels(host, route)
+    lines.append(get_sample(name + '_sum', labels, histogram.sum))
+    lines.append(get_sample(name + '_count', labels, histogram.count))
+    return lines
+
+
+def get_labels(host, route, *extra_labels):
+    """Return a Prometheus label set, i.e. {host="n1...",route="/usage"}.
+
+    Args:
+        host (string): Value of the host label.
+        route (string): Value of the route label.
+        *extra_labels (tuple): (name, value) of labels that go after route
+            (i.e. ('le', '0.5')).
+
+    """
+    escaped = []
+    for name, value in (('host', host), ('route', route)) + extra_labels:
+        value = str(value).replace('\\', '\\\\') \
+            .replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(name + '="' + value + '"')
+    return '{' + ','.join(escaped) + '}'
+
+
+class Histogram:
+    """Bucketed distribution of observations (not thread-safe).
+
+    Attributes:
+        bounds (tuple): Upper bound of each bucket. A last +Inf bucket is
+            implied.
+        counts (list): Observations per bucket (not cumulative), with the
+            +Inf bucket last.
+        sum (float): Sum of the observations.
+        count (int): Number of observations.
+        max (float): Largest observation.
+
+    """
+    __slots__ = ('bounds', 'counts', 'sum', 'count', 'max')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        """Start with no observations."""
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        """Add an observation."""
+        index = 0
+        while index < len(self.bounds) and value > self.bounds[index]:
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def get_cumulative_counts(self):
+        """Return [(upper bound, observations <= bound)], +Inf last."""
+        cumulative = []
+        total = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+    def get_quantile(self, quantile):
+        """Estimate a quantile (0-1) by interpolating within its bucket."""
+        if not self.count:
+            return 0.0
+        rank = quantile * self.count
+        lower_bound = 0.0
+        seen = 0
+        for bound, count in zip(self.bounds + (self.max,), self.counts):
+            if count and seen + count >= rank:
+                upper_bound = min(bound, self.max)
+                return lower_bound + (upper_bound - lower_bound) * \
+                    (rank - seen) / count
+            seen += count
+            lower_bound = bound
+        return self.max
+
+    def to_dict(self):
+        """Return a JSON-serializable summary."""
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'avg': self.sum / self.count if self.count else 0.0,
+            'p50': self.get_quantile(0.5),
+            'p95': self.get_quantile(0.95),
+            'p99': self.get_quantile(0.99),
+            'max': self.max,
+        }
+
+
+class RouteMetrics:
+    """Everything recorded for one (host, route)."""
+    __slots__ = ('latency', 'parse', 'bytes', 'redirects', 'errors',
+                 'cache_results')
+
+    def __init__(self, bounds):
+        """Start with no observations."""
+        self.latency = Histogram(bounds)
+        self.parse = Histogram(bounds)
+        self.bytes = 0
+        self.redirects = 0
+        self.errors = 0
+        self.cache_results = dict.fromkeys(CACHE_RESULTS, 0)
+
+    def to_dict(self):
+        """Return a JSON-serializable summary."""
+        return {
+            'latency': self.latency.to_dict(),
+            'parse': self.parse.to_dict(),
+            'bytes': self.bytes,
+            'redirects': self.redirects,
+            'errors': self.errors,
+            'cache': dict(self.cache_results),
+        }
+
+
+class RequestMetrics:
+    """Thread-safe per-route metrics of a transport.
+
+    Attributes:
+        bounds (tuple): Histogram bucket bounds in seconds.
+        routes (dict): {(host, route): RouteMetrics}.
+        started_at (float): Epoch time metrics were (re)started.
+
+    """
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        """Start with no routes."""
+        self.bounds = bounds
+        self.routes = {}
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+
+    def get_route_metrics(self, url):
+        """Return the RouteMetrics of a url (caller holds the lock)."""
+        labels = get_route_labels(url)
+        if labels not in self.routes:
+            self.routes[labels] = RouteMetrics(self.bounds)
+        return self.routes[labels]
+
+    def observe_request(self, url, seconds, num_bytes, num_redirects,
+                        cache_result):
+        """Record a completed request.
+
+        Args:
+            url (string): URL that was requested.
+            seconds (float): Time until the body was read, including time
+                spent waiting on the rate limiter and retries.
+            num_bytes (int): Response body size.
+            num_redirects (int): Redirects followed.
+            cache_result (string): One of CACHE_RESULTS. 'uncached' means
+                the request could not be cached (or there is no cache).
+
+        """
+        with self.lock:
+            route_metrics = self.get_route_metrics(url)
+            route_metrics.latency.observe(seconds)
+            route_metrics.bytes += num_bytes
+            route_metrics.redirects += num_redirects
+            route_metrics.cache_results[cache_result] += 1
+
+    def observe_error(self, url):
+        """Record a request that raised instead of returning a response."""
+        with self.lock:
+            self.get_route_metrics(url).errors += 1
+
+    def observe_parse(self, url, seconds):
+        """Record the time taken to parse (HTML or JSON) a url's body."""
+        with self.lock:
+            self.get_route_metrics(url).parse.observe(seconds)
+
+    def get_route_stats(self, host, route):
+        """Return the summary dict of one route (see RouteMetrics.to_dict).
+
+        Raises:
+            KeyError: If nothing was recorded for this host and route.
+
+        """
+        with self.lock:
+            return self.routes[(host.lower(), route)].to_dict()
+
+    def get_slowest_routes(self, limit=10, quantile=0.95):
+        """Return [(host, route, seconds)] with the slowest quantile first."""
+        with self.lock:
+            latencies = [(host, route, metrics.latency.get_quantile(quantile))
+                         for (host, route), metrics in self.routes.items()]
+        return sorted(latencies, key=lambda item: -item[2])[:limit]
+
+    def get_snapshot(self):
+        """Return every route's summary as a JSON-serializable dict."""
+        with self.lock:
+            routes = [dict(host=host, route=route, **metrics.to_dict())
+                      for (host, route), metrics
+                      in sorted(self.routes.items())]
+        return {'started_at': self.started_at, 'taken_at': time.time(),
+                'routes': routes}
+
+    def to_prometheus(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            items = sorted(self.routes.items())
+            for name, help_text, attribute in HISTOGRAM_METRICS:
+                lines += get_metric_header(name, help_text, 'histogram')
+                for (host, route), metrics in items:
+                    lines += get_histogram_lines(
+                        name, host, route, getattr(metrics, attribute))
+            for name, help_text, attribute in COUNTER_METRICS:
+                lines += get_metric_header(name, help_text, 'counter')
+                lines += [get_sample(name, get_labels(host, route),
+                                     getattr(metrics, attribute))
+                          for (host, route), metrics in items]
+            name = 'merlink_cache_requests_total'
+            lines += get_metric_header(
+                name, 'Requests by response cache result.', 'counter')
+            lines += [get_sample(name, get_labels(host, route,
+                                                  ('result', result)),
+                                 metrics.cache_results[result])
+                      for (host, route), metrics in items
+                      for result in CACHE_RESULTS]
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        with self.lock:
+            self.routes = {}
+            self.started_at = time.time()
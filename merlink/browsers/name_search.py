@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Ranked prefix/fuzzy search over org and network names.
+
+Names are indexed once by their trigrams and kept in sorted order, so a
+query only looks at names that share a trigram with it (or start with it)
+instead of every name. Matches are ranked:
+
+    exact name > name starts with query > a word starts with query
+    > name contains query > most of the query's trigrams are in the name
+
+so 'branch' finds 'Branch' before 'Branch Office', 'office' finds
+'Branch Office', and 'brnch offce' still finds it.
+"""
+import bisect
+import heapq
+import math
+from collections import namedtuple
+
+# Fraction of a query's trigrams a name needs to be a fuzzy match.
+MIN_FUZZY_SCORE = 0.5
+
+SearchResult = namedtuple('SearchResult', ['item_id', 'name', 'score'])
+
+
+def get_trigrams(text):
+    """Return the set of 3-char substrings of text."""
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+def get_match_score(query, name, shared_trigrams, query_trigrams):
+    """Return how well a lowercase name matches a lowercase query.
+
+    Args:
+        query (string): Lowercase query.
+        name (string): Lowercase name.
+        shared_trigrams (int): Trigrams of the query found in the name.
+        query_trigrams (int): Trigrams in the query.
+    Returns:
+        (float): 4 for an exact match, 3-4 for a prefix, 2-3 for a word
+            prefix, 1-2 for a substring (closer matches are higher), else
+            the fraction of the query's trigrams in the name (0-1).
+
+    """
+    if name == query:
+        return 4.0
+    position = name.find(query)
+    if position >= 0:
+        return get_substring_score(name, position, len(query) / len(name))
+    if not query_trigrams:
+        return 0.0
+    return shared_trigrams / query_trigrams
+
+
+def get_substring_score(name, position, closeness):
+    """Return the score of a name containing the query at position.
+
+    See get_match_score. closeness is the query's share of the name.
+    """
+    if position == 0:
+        return 3.0 + closeness
+    if not name[position - 1].isalnum():
+        return 2.0 + closeness
+    return 1.0 + closeness
+
+
+def get_kind_set(kinds):
+    """Return kinds (a kind or a list of them) as a set, or None for all."""
+    if isinstance(kinds, str):
+        kinds = [kinds]
+    return set(kinds) if kinds else None
+
+
+class NameSearchIndex:
+    """Trigram and prefix index over names with an optional kind per name.
+
+    Attributes:
+        item_ids (list): Id of each indexed name.
+        names (list): Indexed names.
+        lower_names (list): Lowercase names.
+        kinds (list): Kind of each name (i.e. its network_type) or None.
+        sorted_names (list): (lowercase name, position), sorted.
+        trigram_positions (dict): {trigram: [positions of names with it]}.
+
+    """
+
+    def __init__(self, items):
+        """Index names.
+
+        Args:
+            items (iterable): (item_id, name, kind) of every name.
+
+        """
+        self.item_ids = []
+        self.names = []
+        self.lower_names = []
+        self.kinds = []
+        self.trigram_positions = {}
+        for position, (item_id, name, kind) in enumerate(items):
+            lower_name = name.lower()
+            self.item_ids.append(item_id)
+            self.names.append(name)
+            self.lower_names.append(lower_name)
+            self.kinds.append(kind)
+            for trigram in get_trigrams(lower_name):
+                self.trigram_positions.setdefault(trigram, []).append(
+                    position)
+        self.sorted_names = sorted(
+            (lower_name, position)
+            for position, lower_name in enumerate(self.lower_names))
+
+    def __len__(self):
+        """Return the number of indexed names."""
+        return len(self.names)
+
+    def get_candidates(self, query, kinds, limit, min_score):
+        """Return {position: shared trigrams} of names that may match.
+
+        Prefix and substring matches always outrank fuzzy ones, so fuzzy
+        matches are only looked for if there are fewer than limit of them.
+        """
+        query_trigrams = self.get_rarest_first(get_trigrams(query))
+        positions = self.get_prefix_positions(query)
+        positions += self.get_substring_positions(query, query_trigrams)
+        candidates = self.filter_kinds(
+            ((position, len(query_trigrams)) for position in positions),
+            kinds)
+        # Too short for trigrams, so there are no fuzzy matches.
+        if not query_trigrams or \
+                (limit is not None and len(candidates) >= limit):
+            return candidates
+        candidates.update(self.filter_kinds(self.get_fuzzy_candidates(
+            query_trigrams, min_score, candidates), kinds))
+        return candidates
+
+    def filter_kinds(self, candidates, kinds):
+        """Return {position: shared trigrams} of candidates of the kinds."""
+        return {position: shared_trigrams
+                for position, shared_trigrams in candidates
+                if kinds is None or self.kinds[position] in kinds}
+
+    def get_rarest_first(self, trigrams):
+        """Return trigrams sorted by how few names have them."""
+        return sorted(trigrams, key=lambda trigram: len(
+            self.trigram_positions.get(trigram, ())))
+
+    def get_prefix_positions(self, query):
+        """Return the positions of names that start with query."""
+        positions = []
+        index = bisect.bisect_left(self.sorted_names, (query, -1))
+        while index < len(self.sorted_names) and \
+                self.sorted_names[index][0].startswith(query):
+            positions.append(self.sorted_names[index][1])
+            index += 1
+        return positions
+
+    def get_substring_positions(self, query, query_trigrams):
+        """Return the positions of names that contain query.
+
+        Args:
+            query (string): Lowercase query.
+            query_trigrams (list): Its trigrams, rarest first.
+
+        """
+        if query_trigrams:
+            # Names containing the query have every trigram, even the
+            # rarest.
+            positions = self.trigram_positions.get(query_trigrams[0], ())
+        else:
+            # Too short for trigrams, so look for it in every name.
+            positions = range(len(self.lower_names))
+        return [position for position in positions
+                if query in self.lower_names[position]]
+
+    def get_fuzzy_candidates(self, query_trigrams, min_score, seen):
+        """Yield (position, shared trigrams) of names with enough of them.
+
+        Args:
+            query_trigrams (list): Trigrams of the query, rarest first.
+            min_score (float): See search.
+            seen (iterable): Positions that are already candidates.
+
+        """
+        # A name with min_shared of the query's trigrams has at least one of
+        # its len - min_shared + 1 rarest ones, so only their names are
+        # counted (common trigrams like 'sto' would pull in every name).
+        min_shared = max(1, int(math.ceil(min_score * len(query_trigrams))))
+        seen = set(seen)
+        for trigram in query_trigrams[:len(query_trigrams) - min_shared + 1]:
+            for position in self.trigram_positions.get(trigram, ()):
+                if position in seen:
+                    continue
+                seen.add(position)
+                lower_name = self.lower_names[position]
+                shared_trigrams = sum(1 for other in query_trigrams
+                                      if other in lower_name)
+                if shared_trigrams >= min_shared:
+                    yield position, shared_trigrams
+
+    def search(self, query, kinds=None, limit=10, min_score=MIN_FUZZY_SCORE):
+        """Return the best matches of a query, best first.
+
+        Args:
+            query (string): Whole or partial name, possibly misspelled.
+            kinds (list): Only return names of these kinds. All if None.
+            limit (int): Most results to return. All matches if None.
+            min_score (float): Lowest fuzzy score (0-1) to return. Prefix
+                and substring matches are always returned.
+        Returns:
+            (list): SearchResults, ties broken by name.
+
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+        kinds = get_kind_set(kinds)
+        num_trigrams = len(get_trigrams(query))
+        results = []
+        for position, shared_trigrams in self.get_candidates(
+                query, kinds, limit, min_score).items():
+            score = get_match_score(query, self.lower_names[position],
+                                    shared_trigrams, num_trigrams)
+            if score >= min_score:
+                results.append((-score, self.lower_names[position],
+                                position))
+        if limit is None:
+            results.sort()
+        else:
+            results = heapq.nsmallest(limit, results)
+        return [SearchResult(self.item_ids[position], self.names[position],
+                             -negative_score)
+                for negative_score, _, position in results]
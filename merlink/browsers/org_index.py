@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Indexes over orgs_dict for fast name lookups.
+
+orgs_dict stays the source of truth (it is what administered_orgs returns
+and what the session store saves). OrgIndex is built from it once and
+answers the questions the GUI/CLI ask on every dropdown change without
+scanning or sorting every org/network:
+
+    index = OrgIndex(browser.orgs_dict)
+    index.get_org_names()                        # pre-sorted
+    index.find_org_id('Organi')                  # best ranked match
+    index.search_org_names('orgn')               # ranked, typo tolerant
+    networks = index.get_network_index(org_id)   # built on first use
+    networks.get_network_names(['wired'])        # merged sorted buckets
+
+Name searches use a NameSearchIndex built the first time one is needed.
+Each org's NetworkIndex is rebuilt on its own when that org's node_groups
+are replaced (i.e. set_org_id fetching them for the first time), so other
+orgs' indexes are kept.
+"""
+import heapq
+
+from .name_search import NameSearchIndex
+
+# Fuzzy matches find_*_id may choose. Stricter than what searches list, as
+# a wrong guess opens another org's/network's pages.
+MIN_FIND_SCORE = 0.7
+
+NETWORK_TYPES = ('wired', 'switch', 'wireless', 'camera', 'systems_manager',
+                 'phone')
+
+
+def get_display_name(network_name):
+    """Return a network's name as shown to the user (no ' - appliance')."""
+    return network_name.replace(' - appliance', '')
+
+
+class OrgRecord:
+    """One org of orgs_dict."""
+    __slots__ = ('id', 'name', 'eid', 'shard_id')
+
+    def __init__(self, org_id, org):
+        """Copy the fields lookups need from an orgs_dict entry."""
+        self.id = org_id
+        self.name = org['name']
+        self.eid = org.get('eid')
+        self.shard_id = org.get('shard_id')
+
+
+class NetworkRecord:
+    """One network (node group) of an org."""
+    __slots__ = ('id', 'name', 'display_name', 'network_type',
+                 'is_template')
+
+    def __init__(self, network_id, network):
+        """Copy the fields lookups need from a node_groups entry."""
+        self.id = network_id
+        self.name = network['n']
+        self.display_name = get_display_name(network['n'])
+        self.network_type = network.get('network_type')
+        self.is_template = bool(network.get('is_config_template'))
+
+
+class NetworkIndex:
+    """Indexes over one org's node_groups.
+
+    Attributes:
+        node_groups (dict): The node_groups this was built from.
+        size (int): len(node_groups) when this was built.
+        records (dict): {network id: NetworkRecord}.
+        ids_by_name (dict): {lowercase name: [network ids]}, in
+            node_groups order (names are not unique).
+        type_ids (dict): {network_type: [network ids]}.
+        template_ids (set): Ids of config templates.
+        type_names (dict): {network_type: sorted display names of the
+            type's networks that are not templates}.
+        merged_names (dict): {tuple of types: sorted display names} of the
+            combinations get_network_names has been asked for.
+        name_search (NameSearchIndex): Display names of every network
+            with their network_type, or None until first searched.
+
+    """
+
+    def __init__(self, node_groups):
+        """Index a node_groups dict."""
+        self.node_groups = node_groups
+        self.size = len(node_groups)
+        self.records = {}
+        self.ids_by_name = {}
+        self.type_ids = {}
+        self.template_ids = set()
+        self.type_names = {}
+        self.merged_names = {}
+        self.name_search = None
+        for network_id in node_groups:
+            record = NetworkRecord(network_id, node_groups[network_id])
+            self.records[network_id] = record
+            self.ids_by_name.setdefault(record.name.lower(), []).append(
+                network_id)
+            self.type_ids.setdefault(record.network_type, []).append(
+                network_id)
+            if record.is_template:
+                self.template_ids.add(network_id)
+            else:
+                self.type_names.setdefault(record.network_type, []).append(
+                    record.display_name)
+        for names in self.type_names.values():
+            names.sort()
+
+    def is_current(self, node_groups):
+        """Return whether this index still matches an org's node_groups."""
+        return node_groups is self.node_groups and \
+            len(node_groups) == self.size
+
+    def get_network_names(self, network_types=None):
+        """Return sorted names of the non-template networks of some types.
+
+        The per-type lists are already sorted, so they are merged instead
+        of sorted, and the result of each combination of types is kept.
+
+        Args:
+            network_types (list): Types to include. All if None/empty.
+
+        """
+        network_types = tuple(sorted(network_types or NETWORK_TYPES))
+        if network_types not in self.merged_names:
+            self.merged_names[network_types] = list(heapq.merge(
+                *[self.type_names.get(network_type, [])
+                  for network_type in network_types]))
+        return list(self.merged_names[network_types])
+
+    def get_name_search(self):
+        """Return the NameSearchIndex of this org's networks."""
+        if self.name_search is None:
+            self.name_search = NameSearchIndex(
+                (record.id, record.display_name, record.network_type)
+                for record in self.records.values())
+        return self.name_search
+
+    def search_networks(self, query, network_types=None, limit=10,
+                        include_templates=False):
+        """Return the networks that best match a query, best first.
+
+        Args:
+            query (string): Whole, partial or misspelled network name.
+            network_types (list): Types to include. All if None/empty.
+            limit (int): Most results to return. All matches if None.
+            include_templates (bool): Whether to include config templates.
+        Returns:
+            (list): SearchResults of (network id, display name, score).
+
+        """
+        results = self.get_name_search().search(query, network_types,
+                                                limit=None)
+        if not include_templates:
+            results = [result for result in results
+                       if result.item_id not in self.template_ids]
+        return results[:limit]
+
+    def find_network_id(self, network_name, network_types=None):
+        """Return the id of the network that best matches a name, or None.
+
+        An exact (case-insensitive) name wins, then the shortest name that
+        starts with it, then one with a word that starts with it, then one
+        that contains it, then the closest fuzzy match with at least
+        MIN_FIND_SCORE of its trigrams (see NameSearchIndex).
+        Names with or without ' - appliance' both match.
+
+        Args:
+            network_name (string): Name or part of one.
+            network_types (list): Types the network may have. All if None.
+
+        """
+        if isinstance(network_types, str):
+            network_types = [network_types]
+        for network_id in self.ids_by_name.get(network_name.lower(), ()):
+            if not network_types or \
+                    self.records[network_id].network_type in network_types:
+                return network_id
+        results = self.get_name_search().search(
+            get_display_name(network_name), network_types, limit=1,
+            min_score=MIN_FIND_SCORE)
+        return results[0].item_id if results else None
+
+
+class OrgIndex:
+    """Indexes over orgs_dict, with one lazily built NetworkIndex per org.
+
+    Attributes:
+        orgs_dict (dict): The orgs_dict this was built from.
+        size (int): len(orgs_dict) when this was built.
+        records (dict): {org id: OrgRecord}.
+        ids_by_name (dict): {lowercase name: [org ids]}.
+        org_names (list): Sorted org names.
+        name_search (NameSearchIndex): Org names, or None until first
+            searched.
+        networks (dict): {org id: NetworkIndex} built so far.
+
+    """
+
+    def __init__(self, orgs_dict):
+        """Index orgs_dict. Networks are indexed when first needed."""
+        self.orgs_dict = orgs_dict
+        self.size = len(orgs_dict)
+        self.records = {}
+        self.ids_by_name = {}
+        for org_id in orgs_dict:
+            record = OrgRecord(org_id, orgs_dict[org_id])
+            self.records[org_id] = record
+            self.ids_by_name.setdefault(record.name.lower(), []).append(
+                org_id)
+        self.org_names = sorted(record.name
+                                for record in self.records.values())
+        self.name_search = None
+        self.networks = {}
+
+    def is_current(self, orgs_dict):
+        """Return whether this index still matches orgs_dict."""
+        return orgs_dict is self.orgs_dict and len(orgs_dict) == self.size
+
+    def get_org_names(self):
+        """Return the sorted org names."""
+        return list(self.org_names)
+
+    def get_name_search(self):
+        """Return the NameSearchIndex of the org names."""
+        if self.name_search is None:
+            self.name_search = NameSearchIndex(
+                (record.id, record.name, None)
+                for record in self.records.values())
+        return self.name_search
+
+    def search_orgs(self, query, limit=10):
+        """Return SearchResults of the orgs that best match a query."""
+        return self.get_name_search().search(query, limit=limit)
+
+    def find_org_id(self, org_name):
+        """Return the id of the org that best matches a name, or None.
+
+        Ranked like NetworkIndex.find_network_id.
+        """
+        org_ids = self.ids_by_name.get(org_name.lower())
+        if org_ids:
+            return org_ids[0]
+        results = self.get_name_search().search(
+            org_name, limit=1, min_score=MIN_FIND_SCORE)
+        return results[0].item_id if results else None
+
+    def get_network_index(self, org_id):
+        """Return the NetworkIndex of an org, (re)building it if need be.
+
+        Raises:
+            KeyError: If org_id is not in orgs_dict.
+
+        """
+        node_groups = self.orgs_dict[org_id]['node_groups']
+        network_index = self.networks.get(org_id)
+        if network_index is None or not network_index.is_current(
+                node_groups):
+            network_index = NetworkIndex(node_groups)
+            self.networks[org_id] = network_index
+        return network_index
+
+    def invalidate_org(self, org_id):
+        """Forget an org's NetworkIndex (i.e. after editing its networks)."""
+        self.networks.pop(org_id, None)
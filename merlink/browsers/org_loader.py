@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Track which orgs' networks are known and merge new ones into orgs_dict.
+
+administered_orgs lists every org, but only has node_groups for the org it
+is requested from. Before, switching to an org whose node_groups were empty
+always fetched administered_orgs again and replaced the org's entry, so an
+org without networks was refetched on every switch. OrgLoader records when
+each org's node_groups were fetched and merges a response into orgs_dict
+in place, so each org costs one request (until max_age, if set):
+
+    loader = OrgLoader()
+    loader.merge(orgs_dict, administered_orgs)         # org_data_setup
+    if loader.needs_load(orgs_dict, org_id):
+        loader.merge(orgs_dict, fetched_from_org, org_id)
+"""
+import time
+
+
+class OrgLoader:
+    """Per-org freshness of node_groups in orgs_dict.
+
+    Attributes:
+        max_age (float): Seconds an org's node_groups are kept before they
+            are fetched again. Never refetched if None.
+        loaded_at (dict): {org id: time.time() its node_groups were
+            fetched, or None if they should be fetched again}.
+
+    """
+
+    def __init__(self, max_age=None):
+        """Start with no orgs loaded."""
+        self.max_age = max_age
+        self.loaded_at = {}
+
+    def needs_load(self, orgs_dict, org_id):
+        """Return whether an org's node_groups need to be fetched.
+
+        Orgs with node_groups this loader did not record (i.e. from a
+        restored session) count as loaded.
+
+        Raises:
+            KeyError: If org_id is not in orgs_dict.
+
+        """
+        if org_id not in self.loaded_at:
+            return not orgs_dict[org_id]['node_groups']
+        if self.loaded_at[org_id] is None:
+            return True
+        return self.max_age is not None and \
+            time.time() - self.loaded_at[org_id] > self.max_age
+
+    def merge(self, orgs_dict, administered_orgs, org_id=None):
+        """Merge an administered_orgs response into orgs_dict in place.
+
+        Orgs that are new are added. An org's entry is replaced only if the
+        response has its node_groups, or it is the org the response was
+        fetched for (so an org without networks is not fetched again).
+        Entries of every other org are left as they are.
+
+        Args:
+            orgs_dict (dict): The browser's orgs_dict.
+            administered_orgs (dict|iterable): Decoded administered_orgs,
+                or its (org id, org) items as they are streamed (see
+                DashboardBrowser.iter_json).
+            org_id: Org the response was requested from, if any.
+        Returns:
+            (list): Ids of the orgs whose networks were loaded.
+        Raises:
+            KeyError: If org_id is not in administered_orgs.
+
+        """
+        if isinstance(administered_orgs, dict):
+            administered_orgs = administered_orgs.items()
+        loaded_at = time.time()
+        loaded_ids = []
+        for key, org in administered_orgs:
+            if self.merge_org(orgs_dict, key, org, key == org_id, loaded_at):
+                loaded_ids.append(key)
+        if org_id is not None and org_id not in loaded_ids:
+            raise KeyError(org_id)
+        return loaded_ids
+
+    def merge_org(self, orgs_dict, key, org, is_fetched_org, loaded_at):
+        """Merge one org of an administered_orgs response (see merge).
+
+        Returns:
+            (bool): Whether the org's networks were loaded.
+
+        """
+        if org['node_groups'] or is_fetched_org:
+            orgs_dict[key] = org
+            self.loaded_at[key] = loaded_at
+            return True
+        if key not in orgs_dict:
+            orgs_dict[key] = org
+        return False
+
+    def forget(self, org_id):
+        """Make the next needs_load of an org say its networks are stale."""
+        self.loaded_at[org_id] = None
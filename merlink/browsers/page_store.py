@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Bounded store of visited pages.
+
+A BeautifulSoup tree is many times the size of the HTML it was parsed
+from, so pages are kept as raw (optionally zlib-compressed) bytes and the
+soup is only rebuilt when a page is read again. Pages are evicted in LRU
+order once the store goes over its byte budget.
+
+Pages are indexed by their canonical (host, eid, route) key, so a URL with
+a different network name slug or trailing dashboard junk finds the same
+page with one dict lookup.
+"""
+import zlib
+from collections import OrderedDict
+
+import bs4
+
+from .pages.page_hunters import PageJsonIndex
+from .route_urls import get_route_key
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+# Rough per-page cost of the key, tuple and OrderedDict slot.
+PAGE_OVERHEAD_BYTES = 256
+
+
+class PageStore:
+    """Byte-budgeted LRU store of page bodies keyed by canonical URL.
+
+    Attributes:
+        max_bytes (int): Memory budget for stored bodies.
+        compress (bool): Whether bodies are zlib-compressed.
+        pages (OrderedDict): {route key: (body, encoding, url)}, least
+            recently used first.
+        footprint (int): Bytes currently used by stored pages.
+        soup_key (tuple): Route key of the one memoized soup.
+        soup (BeautifulSoup): Memoized soup of soup_key.
+        text_key (tuple): Route key of the one memoized decoded body.
+        text (string): Memoized decoded body of text_key, for the hunters
+            in pages/page_hunters.py.
+        json_key (tuple): Route key of the one memoized JSON index.
+        json_index (PageJsonIndex): Memoized JSON key index of json_key.
+        snapshots (dict): {route key: {snapshot type: snapshot}} of records
+            read from stored pages (see pages/mx.py ClientVpnSettings).
+            They are forgotten with their page.
+
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, compress=True):
+        """Initialize an empty store."""
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.pages = OrderedDict()
+        self.footprint = 0
+        self.soup_key = None
+        self.soup = None
+        self.text_key = None
+        self.text = None
+        self.json_key = None
+        self.json_index = None
+        self.snapshots = {}
+
+    def __contains__(self, url):
+        """Return whether a page is stored for this URL."""
+        return get_route_key(url) in self.pages
+
+    def __len__(self):
+        """Return the number of stored pages."""
+        return len(self.pages)
+
+    def keys(self):
+        """Return the stored URLs, least recently used first."""
+        return [page[2] for page in self.pages.values()]
+
+    def add(self, url, body, encoding=None):
+        """Store a page body, evicting old pages if over budget.
+
+        Args:
+            url (string): URL the page is stored under.
+            body (bytes): Raw response body.
+            encoding (string): Charset of the body, if known.
+
+        """
+        key = get_route_key(url)
+        if key in self.pages:
+            self.remove_key(key)
+        if self.compress:
+            body = zlib.compress(body, 1)
+        self.pages[key] = (body, encoding, url)
+        self.footprint += len(body) + PAGE_OVERHEAD_BYTES
+        while self.footprint > self.max_bytes and len(self.pages) > 1:
+            self.remove_key(next(iter(self.pages)))
+
+    def remove(self, url):
+        """Forget a stored page."""
+        self.remove_key(get_route_key(url))
+
+    def remove_key(self, key):
+        """Forget the page stored under a route key."""
+        body = self.pages.pop(key)[0]
+        self.footprint -= len(body) + PAGE_OVERHEAD_BYTES
+        self.snapshots.pop(key, None)
+        if key == self.soup_key:
+            self.soup_key = None
+            self.soup = None
+        if key == self.text_key:
+            self.text_key = None
+            self.text = None
+        if key == self.json_key:
+            self.json_key = None
+            self.json_index = None
+
+    def get_body(self, url):
+        """Return the raw body of a stored page and mark it recently used.
+
+        Raises:
+            KeyError: If no page is stored for this URL.
+
+        """
+        key = get_route_key(url)
+        body = self.pages[key][0]
+        self.pages.move_to_end(key)
+        if self.compress:
+            body = zlib.decompress(body)
+        return body
+
+    def get_text(self, url):
+        """Return the body of a stored page decoded to a string.
+
+        Like the soup, only the last decoded body is kept, so reading the
+        same page's text again costs nothing.
+        """
+        key = get_route_key(url)
+        if key != self.text_key:
+            self.text = self.get_body(url).decode(
+                self.get_encoding(url) or 'utf-8', 'replace')
+            self.text_key = key
+        else:
+            self.pages.move_to_end(key)
+        return self.text
+
+    def get_encoding(self, url):
+        """Return the charset a stored page was served with (or None)."""
+        return self.pages[get_route_key(url)][1]
+
+    def get_soup(self, url):
+        """Return the soup of a stored page, parsing it if need be.
+
+        Only the last soup is kept, so memory stays bounded by the budget
+        plus one parsed page.
+        """
+        key = get_route_key(url)
+        if key != self.soup_key:
+            self.soup = bs4.BeautifulSoup(
+                self.get_body(url), 'lxml',
+                from_encoding=self.get_encoding(url))
+            self.soup_key = key
+        return self.soup
+
+    def get_json_index(self, url):
+        """Return the JSON key index of a stored page, building it if need be.
+
+        Like the soup, only the last index is kept.
+        """
+        key = get_route_key(url)
+        if key != self.json_key:
+            self.json_index = PageJsonIndex(self.get_text(url))
+            self.json_key = key
+        return self.json_index
+
+    def get_snapshot(self, url, snapshot_type):
+        """Return a stored page's snapshot of a type (or None)."""
+        return self.snapshots.get(get_route_key(url), {}).get(snapshot_type)
+
+    def add_snapshot(self, url, snapshot):
+        """Keep a snapshot read from a stored page until it is evicted."""
+        key = get_route_key(url)
+        if key in self.pages:
+            self.snapshots.setdefault(key, {})[type(snapshot)] = snapshot
+
+    def get_footprint(self):
+        """Return the bytes used by stored pages (excluding the soup)."""
+        return self.footprint
+
+    def clear(self):
+        """Forget every stored page."""
+        self.pages.clear()
+        self.footprint = 0
+        self.soup_key = None
+        self.soup = None
+        self.text_key = None
+        self.text = None
+        self.json_key = None
+        self.json_index = None
+        self.snapshots = {}
@@ -22,9 +22,7 @@ Helper functions should start with 'do'.
 """
 import re
 
-import requests
-
-from .page_hunters import get_pagetext_mkiconf
+from .page_hunters import get_pagetext_mkiconf_value
 
 
 def break_onetime_tfa_codes(self):
@@ -43,9 +41,9 @@ def break_onetime_tfa_codes(self):
     self.push_button(url, params, commit_msg)
 
     url = url.split('/manage')[0] + '/manage/users/edit'
-    response = requests.get(url=url,
-                            json=self.request_body,
-                            headers=self.header_dict)
+    response = self.transport.get(url=url,
+                                  json=self.request_body,
+                                  headers=self.header_dict)
     if 'New one-time codes generated.' in response.text:
         print('Successfully generated new codes!')
     new_onetime_codes = re.findall('(?<=<li>)(\d{6})(?=<\/li>)',
@@ -74,9 +72,10 @@ def do_push_button(self, url, params, commit, req_body_params=None):
     cookie_string += 'dash_auth=' + cookie_dict['dash_auth']
     # Commit message cannot be url-encoded.
     encoding = 'utf8=%E2%9C%93&'
-    mkiconf_vars = get_pagetext_mkiconf(self.browser.get_page().text)
+    # The token is near the top of the page, so stop scanning once found.
     authenticity_token = urlencode({
-        'authenticity_token': mkiconf_vars['authenticity_token']})
+        'authenticity_token': get_pagetext_mkiconf_value(
+            self.browser.get_pagetext(), 'authenticity_token')})
 
     more_params = ''
     if req_body_params:
@@ -88,8 +87,8 @@ def do_push_button(self, url, params, commit, req_body_params=None):
         'Upgrade-Insecure-Requests': '1',
         'DNT': '1',
     }
-    requests.request('POST', url=url, json=request_body,
-                     headers=header_dict, params=params)
+    self.browser.transport.request('POST', url=url, json=request_body,
+                                   headers=header_dict, params=params)
     self.request_body = request_body
     self.header_dict = header_dict
 
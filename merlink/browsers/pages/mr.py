@@ -38,9 +38,9 @@ def mr_get_ssids(self):
         (list(string)): A list of SSIDs.
 
     """
-    self.open_route('/configure/access_control', "Wireless")
+    self.open_route('/configure/access_control', "Wireless", parse=False)
     dropdown_values = page_utils.get_all_dropdown_values(
-        self.get_page(),
+        self.get_page_elements('select_ssid'),
         var_id='select_ssid')
     return dropdown_values
 
@@ -61,9 +61,9 @@ def mr_get_group_policies_by_device_type_enabled(self):
     Returns:
         (list(string)): A list of SSIDs.
     """
-    self.open_route('/configure/access_control', "Wireless")
+    self.open_route('/configure/access_control', "Wireless", parse=False)
     dropdown_value = page_utils.get_dropdown_value(
-        self.get_page(),
+        self.get_page_elements('ssid_auto_group_policies_enabled'),
         var_id='ssid_auto_group_policies_enabled')
     enabled_str = 'Enabled: assign group policies automatically by device type'
     return dropdown_value == enabled_str
@@ -33,9 +33,9 @@ def ms_get_management_vlan(self):
         (string): The management VLAN for this switch network.
 
     """
-    self.open_route('/configure/switch_settings', "Switch")
+    self.open_route('/configure/switch_settings', "Switch", parse=False)
     textarea_value = page_utils.get_input_var_value(
-        self.get_page(),
+        self.get_page_elements('node_group_management_vlan'),
         var_id='node_group_management_vlan')
     return textarea_value
 
@@ -54,8 +54,8 @@ def ms_get_rstp_enabled(self):
         (bool): Whether RSTP is enabled for this switch network.
 
     """
-    self.open_route('/configure/switch_settings', "Switch")
+    self.open_route('/configure/switch_settings', "Switch", parse=False)
     dropdown_value = page_utils.get_dropdown_value(
-        self.get_page(),
+        self.get_page_elements('node_group_use_stp'),
         var_id='node_group_use_stp')
     return dropdown_value == 'Enable RSTP'
@@ -3,6 +3,7 @@
 
 Current functions:
 
+mx_get_client_vpn_settings,
 mx_get_client_vpn_subnet,
 mx_get_client_vpn_dns_mode,
 mx_get_custom_name_servers,
@@ -12,14 +13,130 @@ mx_get_client_auth_type,
 mx_get_sentry_vpn_enabled,
 mx_get_active_directory_enabled,
 mx_get_primary_uplink,
+mx_get_security_filtering_settings,
 mx_get_amp_enabled,
 mx_get_ids_mode,
 mx_get_ids_ruleset
+
+Client VPN and Threat Protection fields are read from one route snapshot
+(ClientVpnSettings, SecurityFilteringSettings), so reading all of a page's
+fields costs one fetch and one parse.
 """
+from collections import namedtuple
 
 from . import page_utils
 
 
+class ClientVpnSettings(namedtuple('ClientVpnSettings', [
+        'subnet', 'dns_mode', 'nameservers', 'wins_enabled', 'secret',
+        'auth_type', 'sentry_vpn_enabled'])):
+    """Snapshot of Security appliance > Client VPN > Client VPN.
+
+    Fields that are not on the page are None.
+
+    Attributes:
+        subnet (string): Client VPN subnet/cidr (i.e. '10.0.0.0/24').
+        dns_mode (string): Selected DNS mode (i.e. 'Use Google Public DNS').
+        nameservers (list): Custom name servers, or None if not specified.
+        wins_enabled (bool): Whether WINS is enabled.
+        secret (string): Client VPN PSK.
+        auth_type (string): Authentication type (i.e. 'Meraki cloud').
+        sentry_vpn_enabled (bool): Whether Sentry VPN is enabled.
+
+    """
+    __slots__ = ()
+    route = '/configure/client_vpn_settings'
+    element_ids = ('wired_config_client_vpn_subnet',
+                   'wired_config_client_vpn_dns_mode',
+                   'wired_config_client_vpn_dns',
+                   'wired_config_client_vpn_wins_enabled',
+                   'wired_config_client_vpn_secret',
+                   'wired_config_client_vpn_auth_type',
+                   'wired_config_client_vpn_pcc_access_enabled')
+
+    @classmethod
+    def from_page(cls, page):
+        """Read every field from a soup that has element_ids."""
+        values = {}
+        for field, extractor, var_id in zip(cls._fields, (
+                page_utils.get_input_var_value,
+                page_utils.get_dropdown_value,
+                page_utils.get_textarea_list,
+                page_utils.get_dropdown_value,
+                page_utils.get_input_var_value,
+                page_utils.get_dropdown_value,
+                page_utils.get_dropdown_value), cls.element_ids):
+            values[field] = page_utils.get_optional_value(extractor, page,
+                                                          var_id)
+        if values['nameservers'] == 'Specify nameservers...':
+            values['nameservers'] = None
+        for field in ('wins_enabled', 'sentry_vpn_enabled'):
+            if values[field] is not None:
+                values[field] = values[field] == 'Enabled'
+        return cls(**values)
+
+
+class SecurityFilteringSettings(namedtuple('SecurityFilteringSettings', [
+        'amp_enabled', 'ids_mode', 'ids_ruleset'])):
+    """Snapshot of Security appliance > Threat Protection.
+
+    Fields that are not on the page are None.
+
+    Attributes:
+        amp_enabled (bool): Whether AMP is enabled.
+        ids_mode (string): One of ['Disabled', 'Detection', 'Prevention'].
+        ids_ruleset (string): One of ['Connectivity', 'Balanced',
+            'Security'], or 'Disabled' if IDS is disabled.
+
+    """
+    __slots__ = ()
+    route = '/configure/security_filtering'
+    element_ids = ('scanning_enabled_select', 'ids_mode_select',
+                   'ids_ruleset_select')
+
+    @classmethod
+    def from_page(cls, page):
+        """Read every field from a soup that has element_ids."""
+        amp_enabled = page_utils.get_optional_value(
+            page_utils.get_dropdown_value, page, 'scanning_enabled_select')
+        if amp_enabled is not None:
+            amp_enabled = amp_enabled == 'Enabled'
+        ids_mode = page_utils.get_optional_value(
+            page_utils.get_dropdown_value, page, 'ids_mode_select')
+        # If IDS is disabled, don't send another value, even if it is in
+        # the HTML
+        if ids_mode == 'Disabled':
+            ids_ruleset = 'Disabled'
+        else:
+            ids_ruleset = page_utils.get_optional_value(
+                page_utils.get_dropdown_value, page, 'ids_ruleset_select')
+        return cls(amp_enabled=amp_enabled, ids_mode=ids_mode,
+                   ids_ruleset=ids_ruleset)
+
+
+def mx_get_client_vpn_settings(self):
+    """Return a ClientVpnSettings snapshot of the Client VPN page.
+
+    Location: Security appliance > Client VPN > Client VPN
+
+    The page is fetched and parsed once; every later call (and every
+    mx_get_client_vpn_* view) reads the cached snapshot.
+    """
+    self.open_route(ClientVpnSettings.route, "Security appliance",
+                    parse=False)
+    return self.get_route_snapshot(ClientVpnSettings)
+
+
+def mx_get_security_filtering_settings(self):
+    """Return a SecurityFilteringSettings snapshot of Threat Protection.
+
+    Location: Security appliance > Threat Protection
+    """
+    self.open_route(SecurityFilteringSettings.route, "Security appliance",
+                    parse=False)
+    return self.get_route_snapshot(SecurityFilteringSettings)
+
+
 def mx_get_client_vpn_subnet(self):
     """Get the Client VPN subnet/cidr (string).
     Location: Security appliance > Client VPN > Client VPN
@@ -31,10 +148,7 @@ def mx_get_client_vpn_subnet(self):
         "wired_config_client_vpn_subnet" name="wired_config[
         client_vpn_subnet]" size="20" type="text" value="10.0.0.0/24" />
     """
-    self.open_route('/configure/client_vpn_settings', "Security appliance")
-    return page_utils.get_input_var_value(
-        self.get_page(),
-        'wired_config_client_vpn_subnet')
+    return self.mx_get_client_vpn_settings().subnet
 
 
 def mx_get_client_vpn_dns_mode(self):
@@ -49,11 +163,7 @@ def mx_get_client_vpn_dns_mode(self):
         "opendns">Use OpenDNS</option><option value="custom">
         Specify nameservers...</option></select>
     """
-    route = '/configure/client_vpn_settings'
-    self.open_route(route)
-    return page_utils.get_dropdown_value(
-        self.get_page(),
-        'wired_config_client_vpn_dns_mode')
+    return self.mx_get_client_vpn_settings().dns_mode
 
 
 def mx_get_client_vpn_nameservers(self):
@@ -66,13 +176,7 @@ def mx_get_client_vpn_nameservers(self):
         "wired_config_client_vpn_dns" name="wired_config[client_vpn_dns]"
         rows="2">\n10.0.0.2\n10.0.0.3</textarea>
     """
-    self.open_route('/configure/client_vpn_settings', "Security appliance")
-    nameservers = page_utils.get_textarea_list(
-        self.get_page(),
-        var_id='wired_config_client_vpn_dns')
-    if nameservers == 'Specify nameservers...':
-        nameservers = None
-    return nameservers
+    return self.mx_get_client_vpn_settings().nameservers
 
 
 def mx_get_client_vpn_wins_enabled(self):
@@ -86,11 +190,7 @@ def mx_get_client_vpn_wins_enabled(self):
         Specify WINS servers...</option><option value="false"
         selected="selected">No WINS servers</option></select>
     """
-    self.open_route('/configure/client_vpn_settings', "Security appliance")
-    dropdown_value = page_utils.get_dropdown_value(
-        self.get_page(),
-        var_id='wired_config_client_vpn_wins_enabled')
-    return dropdown_value == 'Enabled'
+    return self.mx_get_client_vpn_settings().wins_enabled
 
 
 def mx_get_client_vpn_secret(self):
@@ -104,10 +204,7 @@ def mx_get_client_vpn_secret(self):
         name="wired_config[client_vpn_secret]" size="25"
         value="my-client-vpn-psk" type="password">
     """
-    self.open_route('/configure/client_vpn_settings', "Security appliance")
-    return page_utils.get_input_var_value(
-        self.get_page(),
-        var_id='wired_config_client_vpn_secret')
+    return self.mx_get_client_vpn_settings().secret
 
 
 def mx_get_client_auth_type(self):
@@ -122,10 +219,7 @@ def mx_get_client_auth_type(self):
         <option value="radius">RADIUS</option>
         <option value="active_directory">Active Directory</option></select>
     """
-    self.open_route('/configure/client_vpn_settings', "Security appliance")
-    return page_utils.get_dropdown_value(
-        self.get_page(),
-        var_id='wired_config_client_vpn_auth_type')
+    return self.mx_get_client_vpn_settings().auth_type
 
 
 def mx_get_sentry_vpn_enabled(self):
@@ -139,11 +233,7 @@ def mx_get_sentry_vpn_enabled(self):
         Enabled</option><option value="false" selected="selected">
         Disabled</option></select>
     """
-    self.open_route('/configure/client_vpn_settings', "Security appliance")
-    dropdown_value = page_utils.get_dropdown_value(
-        self.get_page(),
-        var_id='wired_config_client_vpn_pcc_access_enabled')
-    return dropdown_value == 'Enabled'
+    return self.mx_get_client_vpn_settings().sentry_vpn_enabled
 
 
 def mx_get_active_directory_enabled(self):
@@ -157,9 +247,10 @@ def mx_get_active_directory_enabled(self):
         users with Active Directory</option><option value="false" selected=
         "selected">No authentication</option></select>
     """
-    self.open_route('/configure/active_directory', "Security appliance")
+    self.open_route('/configure/active_directory', "Security appliance",
+                    parse=False)
     dropdown_value = page_utils.get_dropdown_value(
-        self.get_page(),
+        self.get_page_elements('active_directory_enabled_select'),
         var_id='active_directory_enabled_select')
     return dropdown_value == 'Authenticate users with Active Directory'
 
@@ -175,9 +266,10 @@ def mx_get_primary_uplink(self):
         "primary_uplink_select"><option value="0" selected="selected">WAN 1
         </option><option value="1">WAN 2</option></select>
     """
-    self.open_route('/configure/traffic_shaping', "Security appliance")
+    self.open_route('/configure/traffic_shaping', "Security appliance",
+                    parse=False)
     return page_utils.get_dropdown_value(
-        self.get_page(),
+        self.get_page_elements('wired_config_primary_uplink'),
         var_id='wired_config_primary_uplink')
 
 
@@ -193,11 +285,7 @@ def mx_get_amp_enabled(self):
             <option value="true" selected="selected">Enabled</option>
             <option value="false">Disabled</option></select>
     """
-    self.open_route('/configure/security_filtering', "Security appliance")
-    dropdown_value = page_utils.get_dropdown_value(
-        self.get_page(),
-        var_id='scanning_enabled_select')
-    return dropdown_value == 'Enabled'
+    return self.mx_get_security_filtering_settings().amp_enabled
 
 
 def mx_get_ids_mode(self):
@@ -211,10 +299,7 @@ def mx_get_ids_mode(self):
             <option value="detection">Detection</option>
             <option value="prevention">Prevention</option></select>
     """
-    self.open_route('/configure/security_filtering', "Security appliance")
-    return page_utils.get_dropdown_value(
-        self.get_page(),
-        var_id='ids_mode_select')
+    return self.mx_get_security_filtering_settings().ids_mode
 
 
 def mx_get_ids_ruleset(self):
@@ -228,11 +313,4 @@ def mx_get_ids_ruleset(self):
             <option value="medium" selected="selected">Balanced</option>
             <option value="low">Security</option></select>
     """
-    # If IDS is disabled, don't send another value, even if it is in the HTML
-    if self.mx_get_ids_mode() == 'Disabled':
-        return 'Disabled'
-
-    self.open_route('/configure/security_filtering', "Security appliance")
-    return page_utils.get_dropdown_value(
-        self.get_page(),
-        var_id='ids_ruleset_select')
+    return self.mx_get_security_filtering_settings().ids_ruleset
@@ -3,6 +3,58 @@
 import re
 import json
 
+from ..route_urls import get_route_key
+
+SIDE_NAV_CALL = 'window.initializeSideNavigation('
+
+# Mkiconf.<property> = (but not ==). The value starts where this ends.
+# Starting with a literal (no \b) lets re skip ahead to each 'Mkiconf.'.
+MKICONF_KEY_PATTERN = re.compile(
+    r'Mkiconf\.([\w$]+(?:\[[^\]\n]*\])*)[ \t]*=(?!=)[ \t]*')
+# Fallback for values that are JavaScript rather than JSON.
+MKICONF_RAW_VALUE_PATTERN = re.compile(r'[^;\n]*')
+JSON_DECODER = json.JSONDecoder()
+# End of "<key>": in a JSON blob. Searching for the rare ": and looking
+# back for the key is several times faster than matching at every quote.
+JSON_KEY_END_PATTERN = re.compile(r'"[ \t]*:[ \t]*')
+MAX_JSON_KEY_CHARS = 128
+JSON_COLON_PATTERN = re.compile(r'[ \t]*:[ \t]*')
+JSON_RAW_VALUE_PATTERN = re.compile(r'[^,}\n]*')
+
+
+def get_pagetext_side_nav(pagetext):
+    """Return the side navigation JSON passed to initializeSideNavigation.
+
+    The call is found with one substring search and its JSON argument is
+    decoded in place, so this is linear in the page size.
+
+    Args:
+        pagetext (string): HTML to be searched through
+    Returns:
+        (dict): {'tab_menu': {'tabs': [...]}, ...}
+    Raises:
+        LookupError: If the page has no side navigation.
+
+    """
+    call_start = pagetext.find(SIDE_NAV_CALL)
+    if call_start == -1:
+        raise LookupError
+    object_start = pagetext.find('{', call_start)
+    while object_start != -1:
+        json_dict, object_end = decode_json_at(pagetext, object_start)
+        if isinstance(json_dict, dict) and 'tab_menu' in json_dict:
+            return json_dict
+        object_start = pagetext.find('{', object_end)
+    raise LookupError
+
+
+def decode_json_at(pagetext, start):
+    """Return (value, end) of the JSON at start, or (None, start + 1)."""
+    try:
+        return JSON_DECODER.raw_decode(pagetext, start)
+    except ValueError:
+        return None, start + 1
+
 
 def get_pagetext_links(pagetext):
     """Get all page links from current page's pagetext.
@@ -12,37 +64,79 @@ def get_pagetext_links(pagetext):
     Returns:
         (dict): Pagetext links like {Category: {Pagename: URL}, ...}
     """
-    json_text = re.findall(
-        r'window\.initializeSideNavigation\([ -(*-~\r\n]*\)',
-        pagetext)[0][69:-10]
-    json_dict = json.loads(json_text)
+    json_dict = get_pagetext_side_nav(pagetext)
     # Format of this dict: {tab_menu: {tab: {'url': val, 'name': val}, ...
     page_url_dict = {}
-    for tab_menu in range(len(json_dict['tab_menu']['tabs'])):
-        tab_menu = json_dict['tab_menu']['tabs'][tab_menu]
+    for tab_menu in json_dict['tab_menu']['tabs']:
         category = tab_menu['name']
         page_url_dict[category] = {}
         for menu in ('Monitor', 'Configure'):
             # Cameras do not have a configure section.
-            if not (category == 'Cameras' and menu == 'Configure'):
-                menu_items = tab_menu['menus'][menu]['items']
-                for tab_index, _ in enumerate(menu_items):
+            if menu in tab_menu['menus']:
+                for menu_item in tab_menu['menus'][menu]['items']:
                     # Sometimes a tab JSON is Null, in which case skip it.
-                    if menu_items[tab_index]:
-                        name = menu_items[tab_index]['name']
-                        url = menu_items[tab_index]['url']
-                        page_url_dict[category][name] = url
+                    if menu_item:
+                        page_url_dict[category][menu_item['name']] = \
+                            menu_item['url']
 
     return page_url_dict
 
 
-def get_pagetext_mkiconf(pagetext):
-    """Return the mkiconf vars found on most dashboard pages.
+class SideNavigation:
+    """Side navigation links of a network with a route -> URL index.
+
+    The side nav is the same on every page of a network, so it only needs
+    to be parsed once per network (see DashboardBrowser.get_side_nav).
 
-    These variables are largely the same as administered orgs, but could
-    be useful elsewhere. Keeping this here is in case I could use this of
-    scraping method later. Check the regex below for the expected string.
-    The format will look like this:
+    Attributes:
+        links (dict): {Category: {Pagename: URL}} (see get_pagetext_links).
+        routes (dict): {canonical route: {Category: URL}}, i.e.
+            {'/configure/client_vpn_settings': {'Security appliance': URL}}.
+
+    """
+
+    def __init__(self, pagetext):
+        """Parse the side navigation of a page.
+
+        Raises:
+            LookupError: If the page has no side navigation.
+
+        """
+        self.links = get_pagetext_links(pagetext)
+        self.routes = {}
+        for category in self.links:
+            for page_url in self.links[category].values():
+                route = get_route_key(page_url)[2]
+                self.routes.setdefault(route, {})[category] = page_url
+
+    def get_categories(self, route):
+        """Return the categories (i.e. 'Switch') that have a route."""
+        return sorted(self.routes.get(get_route_key('/manage' + route)[2],
+                                      {}))
+
+    def get_url(self, route, category):
+        """Return the URL of a route under a category (or None).
+
+        Args:
+            route (string): Text following '/manage' in the url.
+            category (string): Side nav category (i.e. 'Security appliance').
+
+        """
+        category_urls = self.routes.get(get_route_key('/manage' + route)[2])
+        if category_urls and category in category_urls:
+            return category_urls[category]
+        # Partial routes (i.e. without a query the link has) are rare.
+        for page_url in self.links.get(category, {}).values():
+            if route in page_url:
+                return page_url
+        return None
+
+
+def iter_pagetext_mkiconf(pagetext):
+    """Yield every mkiconf var found on most dashboard pages, in order.
+
+    Check MKICONF_KEY_PATTERN for the expected string. The format will look
+    like this:
 
         Mkiconf.action_name = "new_wired_status";
         Mkiconf.log_errors = false;
@@ -51,47 +145,160 @@ def get_pagetext_mkiconf(pagetext):
 
     Essentially  Mkiconf.<property> = <JSON>;
 
+    The page is scanned once by a compiled regex and each value is decoded
+    in place with JSONDecoder.raw_decode, so no part of the page is copied
+    besides the values themselves. This is a generator, so callers that
+    only want one var can stop as soon as they have it.
+
+    Args:
+        pagetext (string): Text of a webpage
+    Yields:
+        (tuple): (key, value). value is decoded from JSON if it is JSON
+            (i.e. false -> False, "abc" -> 'abc') and otherwise is the raw
+            JavaScript text (i.e. 'new Date()').
+
+    """
+    for match in MKICONF_KEY_PATTERN.finditer(pagetext):
+        value_start = match.end()
+        try:
+            value, _ = JSON_DECODER.raw_decode(pagetext, value_start)
+        except ValueError:
+            raw_value = MKICONF_RAW_VALUE_PATTERN.match(pagetext, value_start)
+            value = raw_value.group().strip()
+        yield match.group(1), value
+
+
+def get_pagetext_mkiconf(pagetext):
+    """Return the mkiconf vars found on most dashboard pages.
+
+    See iter_pagetext_mkiconf for the expected format.
+
     Args:
         pagetext (string): Text of a webpage
     Returns:
         (dict) All available Mkiconf vars.
 
     """
-    mki_lines = re.findall(' Mkiconf[!-:<-~]* =[ -:<-~]*;', pagetext)
-    mki_dict = {}
-    for line in mki_lines:
-        mki_string = \
-            re.findall(r'[0-9a-zA-Z_\[\]\"]+\s*=\s[ -:<-~]*;', line)[0]
-        # mki_key = <property>, mki_value = <JSON>
-        mki_key, mki_value = mki_string.split(' = ', 1)
-        if mki_value[-1] == ';':  # remove trailing ;
-            mki_value = mki_value[:-1]
-        # If the value is double quoted, remove both "s
-        if mki_value[0] == '"' and mki_value[-1] == '"':
-            mki_value = mki_value[1:-1]
-        mki_dict[mki_key] = mki_value
-
-    return mki_dict
+    return dict(iter_pagetext_mkiconf(pagetext))
+
+
+def get_pagetext_mkiconf_value(pagetext, key):
+    """Return one mkiconf var, scanning the page only until it is found.
+
+    Args:
+        pagetext (string): Text of a webpage
+        key (string): Mkiconf property (i.e. 'authenticity_token').
+    Returns:
+        The (JSON-decoded) value.
+    Raises:
+        LookupError: If the page has no such var.
+
+    """
+    for mki_key, mki_value in iter_pagetext_mkiconf(pagetext):
+        if mki_key == key:
+            return mki_value
+    print('\nERROR:  Mkiconf.' + key + '  not found!')
+    raise LookupError
+
+
+def decode_pagetext_json_value(pagetext, value_start):
+    """Decode the JSON value that starts at an offset of a page.
+
+    Args:
+        pagetext (string): Text of a webpage
+        value_start (int): Offset of the first char of the value.
+    Returns:
+        The decoded value, or the raw text up to the next , } or newline if
+        it is not JSON (i.e. a JavaScript expression).
+
+    """
+    try:
+        return JSON_DECODER.raw_decode(pagetext, value_start)[0]
+    except ValueError:
+        return JSON_RAW_VALUE_PATTERN.match(pagetext, value_start).group()\
+            .strip()
 
 
 def get_pagetext_json_value(pagetext, key):
     """Return a value for a key in a JSON blob in the HTML of a page.
 
+    This scans the page for one key. Use PageJsonIndex to look up several
+    keys of the same page.
+
     Args:
         pagetext (string): Text to search through.
-        key (string): The key we want the value for.
-            Format: '<differentiating chars>"key"'
-            Note a colon would be the next char of this string
+        key (string): The key we want the value for. Prefix it with '{"'
+            to only match a key that starts an object (i.e. '{"public_ip').
 
     Returns:
-        (String): The value of the passed-in key.
+        The (JSON-decoded) value of the passed-in key, or -1 if not found.
 
     """
-    key_location = pagetext.find(key)
-    if key_location == -1:  # If key is not found
-        return -1
-    value_start = pagetext.find(key) + len(key) + 3
-    value_end = pagetext[value_start:].find('\"') + value_start
-    value = pagetext[value_start:value_end]
-    print('For key:', key, 'retrieved value:', value)
-    return value
+    if key.startswith('{"'):
+        needle = key + '"'
+    else:
+        needle = '"' + key + '"'
+    key_location = pagetext.find(needle)
+    while key_location != -1:
+        match = JSON_COLON_PATTERN.match(pagetext,
+                                         key_location + len(needle))
+        if match:
+            return decode_pagetext_json_value(pagetext, match.end())
+        key_location = pagetext.find(needle, key_location + 1)
+    return -1
+
+
+class PageJsonIndex:
+    """Index of the "key": value pairs of the JSON blobs in a page.
+
+    The page is scanned once for keys and only the offset of each key's
+    first value is kept. Values are decoded in place the first time they
+    are looked up and are memoized, so every later lookup is one dict
+    lookup and no part of the page is copied.
+
+    Attributes:
+        pagetext (string): Text of the indexed page.
+        offsets (dict): {key: offset of the key's first value}. Keys that
+            start an object are also stored as '{"key'.
+        values (dict): {key: decoded value} of the keys looked up so far.
+
+    """
+
+    def __init__(self, pagetext):
+        """Scan a page for JSON keys."""
+        self.pagetext = pagetext
+        self.offsets = {}
+        self.values = {}
+        for match in JSON_KEY_END_PATTERN.finditer(pagetext):
+            key_end = match.start()
+            key_start = pagetext.rfind(
+                '"', max(key_end - MAX_JSON_KEY_CHARS, 0), key_end) + 1
+            if not key_start:
+                continue
+            key = pagetext[key_start:key_end]
+            if key not in self.offsets:
+                self.offsets[key] = match.end()
+            if pagetext[key_start - 2:key_start - 1] == '{' and \
+                    '{"' + key not in self.offsets:
+                self.offsets['{"' + key] = match.end()
+
+    def __contains__(self, key):
+        """Return whether the page has this key."""
+        return key in self.offsets
+
+    def get(self, key, default=-1):
+        """Return the decoded value of a key (see get_pagetext_json_value).
+
+        Args:
+            key (string): The key we want the value for (i.e. 'request_ip'
+                or '{"public_ip').
+            default: Returned if the page does not have the key. -1 like
+                get_pagetext_json_value by default.
+
+        """
+        if key not in self.values:
+            if key not in self.offsets:
+                return default
+            self.values[key] = decode_pagetext_json_value(
+                self.pagetext, self.offsets[key])
+        return self.values[key]
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Export client, inventory and switchport JSON as columnar tables.
+
+Each route is streamed (see DashboardBrowser.iter_json) into a ColumnTable,
+so rows go straight from the response into typed columns. The items of the
+route's top-level array/object are the rows.
+"""
+from ..columnar import (CLIENT_COLUMNS, INVENTORY_COLUMNS, PORT_COLUMNS,
+                        ColumnTable)
+
+
+def get_org_network_ids(self, network_types=None):
+    """Return the ids of the active org's networks of some types."""
+    node_groups = self.orgs_dict[self.active_org_id]['node_groups']
+    return [network_id for network_id in node_groups
+            if not network_types
+            or node_groups[network_id].get('network_type') in network_types]
+
+
+def iter_network_json(self, route, network_id):
+    """Yield the items of a route of one of the active org's networks.
+
+    The URL is built for that network (with its own name in the path), not
+    from the active network's.
+    """
+    return self.iter_url_json(self.get_context_route_url(
+        route, self.active_org_id, network_id))
+
+
+def get_client_table(self, network_ids=None):
+    """Return the clients of networks as a CLIENT_COLUMNS table.
+
+    Location: Network-wide > Clients
+
+    Args:
+        network_ids (list): Networks to export. All of the active org's
+            networks if None.
+    Returns:
+        (ColumnTable): One row per client with its network_id.
+
+    """
+    table = ColumnTable(CLIENT_COLUMNS)
+    if network_ids is None:
+        network_ids = get_org_network_ids(self)
+    for network_id in network_ids:
+        table.extend_stream(
+            (row for _, row in iter_network_json(
+                self, '/usage/client_list_json', network_id)),
+            network_id=network_id)
+    return table
+
+
+def get_inventory_table(self):
+    """Return the active org's inventory as an INVENTORY_COLUMNS table.
+
+    Location: Organization > Inventory
+
+    Returns:
+        (ColumnTable): One row per device.
+
+    """
+    table = ColumnTable(INVENTORY_COLUMNS)
+    table.extend_stream(row for _, row in self.iter_json(
+        '/organization/inventory_data'))
+    return table
+
+
+def get_switchport_table(self, network_ids=None):
+    """Return the switchports of networks as a PORT_COLUMNS table.
+
+    Location: Switches > Switch ports
+
+    Args:
+        network_ids (list): Networks to export. All of the active org's
+            switch networks if None.
+    Returns:
+        (ColumnTable): One row per port with its network_id.
+
+    """
+    table = ColumnTable(PORT_COLUMNS)
+    if network_ids is None:
+        network_ids = get_org_network_ids(self, ['switch'])
+    for network_id in network_ids:
+        table.extend_stream(
+            (row for _, row in iter_network_json(
+                self, '/nodes/ports_json', network_id)),
+            network_id=network_id)
+    return table
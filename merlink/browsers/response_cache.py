@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Persistent on-disk cache of dashboard responses.
+
+Responses are stored in SQLite, keyed by (account, shard host, org/network
+eid, route), so that repeat CLI runs and GUI restarts don't download
+administered_orgs and friends again. Each route has a TTL. Once it has
+expired, the entry is revalidated with If-None-Match / If-Modified-Since,
+and a 304 refreshes it without a download.
+
+Nothing is cached until set_account is called with the credentials of the
+login (DashboardBrowser.login does this). The account's entries are only
+found with its keys, their bodies are encrypted with them (see
+session_store), and forget_account removes them at logout. Only routes in
+route_ttls are cached, and never pages that carry CSRF tokens or secrets
+(NEVER_CACHED_ROUTES).
+
+The cache is used by DashboardTransport; see DashboardTransport.request.
+"""
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .route_urls import get_route_key, is_route_url
+from .session_store import DEFAULT_ITERATIONS, SALT_BYTES, derive_keys, \
+    seal, unseal
+
+# Seconds a response is fresh for, by route prefix. Routes that match none
+# are not cached unless a default_ttl is given.
+DEFAULT_ROUTE_TTLS = {
+    '/organization/administered_orgs': 3600,
+    '/nodes/new_wired_status': 60,
+    '/usage/': 60,
+    '/dashboard/event_log': 30,
+}
+# Pages with authenticity tokens or secrets (i.e. the client VPN PSK) are
+# never cached, whatever route_ttls and default_ttl say.
+NEVER_CACHED_ROUTES = ('/users/', '/configure/settings')
+# Response headers that must not be replayed from disk.
+UNCACHED_HEADERS = ('set-cookie', 'content-encoding', 'transfer-encoding',
+                    'content-length', 'connection')
+
+
+def get_default_cache_path():
+    """Return the default cache location (~/.merlink/cache.sqlite)."""
+    return os.path.join(os.path.expanduser('~'), '.merlink', 'cache.sqlite')
+
+
+def create_private_file(path):
+    """Create a file (and its directory) only the user may read.
+
+    Pages contain org data, so no one else should read the cache.
+    """
+    cache_dir = os.path.dirname(path)
+    if cache_dir and not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir, mode=0o700)
+    if not os.path.exists(path):
+        os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+
+
+def is_never_cached(route):
+    """Return whether a route may not be cached."""
+    return route.startswith(NEVER_CACHED_ROUTES)
+
+
+def get_cache_key(url):
+    """Return the (host, eid, route) key of a dashboard URL.
+
+    Args:
+        url (string): i.e. https://n1.meraki.com/Net/n/abc123/manage/usage
+    Returns:
+        (tuple): ('n1.meraki.com', 'n/abc123', '/usage') or None if the url
+            is not a dashboard route (i.e. login pages are never cached).
+
+    """
+    if not is_route_url(url):
+        return None
+    return get_route_key(url)
+
+
+class CachedResponse:
+    """A response as stored in the cache.
+
+    Attributes:
+        url (string): URL the response was fetched from.
+        status_code (int): HTTP status.
+        headers (dict): Response headers minus UNCACHED_HEADERS.
+        body (bytes): Response body.
+        stored_at (float): Epoch time the response was stored/revalidated.
+        expires_at (float): Epoch time after which it must be revalidated.
+
+    """
+    __slots__ = ('url', 'status_code', 'headers', 'body', 'stored_at',
+                 'expires_at')
+
+    def __init__(self, url, status_code, headers, body, stored_at,
+                 expires_at):
+        """Store the response fields."""
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+    def is_fresh(self):
+        """Return whether the TTL has not expired yet."""
+        return time.time() < self.expires_at
+
+    def get_validators(self):
+        """Return the conditional request headers for revalidation."""
+        validators = {}
+        headers = CaseInsensitiveDict(self.headers)
+        if 'etag' in headers:
+            validators['If-None-Match'] = headers['etag']
+        if 'last-modified' in headers:
+            validators['If-Modified-Since'] = headers['last-modified']
+        return validators
+
+    def to_response(self, cache_status):
+        """Rebuild a requests.Response that mechsoup/scrape_json can use.
+
+        Args:
+            cache_status (string): Value of the X-Merlink-Cache header
+                ('hit', 'revalidated' or 'stale').
+        Returns:
+            (requests.Response): Response with the cached body.
+
+        """
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.reason = 'OK'
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.headers['X-Merlink-Cache'] = cache_status
+        response._content = self.body  # pylint: disable=protected-access
+        response.encoding = requests.utils.get_encoding_from_headers(
+            response.headers)
+        response.elapsed = timedelta(0)
+        response.request = requests.Request('GET', self.url).prepare()
+        return response
+
+
+class ResponseCache:
+    """SQLite-backed cache of GET responses with per-route TTLs.
+
+    Attributes:
+        path (string): SQLite file. ':memory:' keeps the cache in RAM.
+        route_ttls (dict): {route prefix: seconds}. Longest prefix wins.
+        default_ttl (int): TTL of routes that match no prefix. They are not
+            cached if None.
+        stale_while_revalidate (bool): Serve expired entries immediately and
+            revalidate them in the background instead of waiting.
+        iterations (int): PBKDF2 iterations of set_account.
+        account (string): Id of the account whose entries are used, or None
+            if nothing may be cached (no one has logged in).
+        enc_key (bytes): Key the account's bodies are encrypted with.
+        mac_key (bytes): Key the account's id is derived from.
+        stats (dict): Counters of 'hits', 'misses', 'revalidated' (304s),
+            'stale' (served while revalidating) and 'stores'.
+
+    """
+
+    def __init__(self, path=None, route_ttls=None, default_ttl=None,
+                 stale_while_revalidate=False,
+                 iterations=DEFAULT_ITERATIONS):
+        """Open (and create if need be) the cache file."""
+        if path is None:
+            path = get_default_cache_path()
+        if path != ':memory:':
+            create_private_file(path)
+        self.path = path
+        self.route_ttls = dict(DEFAULT_ROUTE_TTLS)
+        if route_ttls:
+            self.route_ttls.update(route_ttls)
+        self.default_ttl = default_ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.iterations = iterations
+        self.account = None
+        self.enc_key = None
+        self.mac_key = None
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stale': 0,
+                      'stores': 0}
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS account_responses ('
+            'account TEXT, host TEXT, eid TEXT, route TEXT, url TEXT, '
+            'status INTEGER, headers TEXT, body BLOB, stored_at REAL, '
+            'expires_at REAL, PRIMARY KEY (account, host, eid, route))')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS settings ('
+            'name TEXT PRIMARY KEY, value BLOB)')
+        self.connection.commit()
+
+    def set_account(self, username, password):
+        """Use the entries of the account that logs in with these.
+
+        Keys are derived from the credentials with a salt kept in the
+        cache, so entries can't be told apart or read without them.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM settings WHERE name='salt'").fetchone()
+            if row is None:
+                salt = os.urandom(SALT_BYTES)
+                self.connection.execute(
+                    "INSERT INTO settings VALUES ('salt', ?)", (salt,))
+                self.connection.commit()
+            else:
+                salt = row[0]
+        enc_key, mac_key = derive_keys(username, password, salt,
+                                       self.iterations)
+        account = hmac.new(mac_key, b'account', hashlib.sha256).hexdigest()
+        with self.lock:
+            self.account, self.enc_key, self.mac_key = \
+                account, enc_key, mac_key
+
+    def forget_account(self):
+        """Remove the account's entries and cache nothing until set again."""
+        with self.lock:
+            if self.account is not None:
+                self.connection.execute(
+                    'DELETE FROM account_responses WHERE account=?',
+                    (self.account,))
+                self.connection.commit()
+            self.account = self.enc_key = self.mac_key = None
+
+    def get_ttl(self, route):
+        """Return the TTL in seconds for a route (longest prefix wins).
+
+        None if the route is not cached.
+        """
+        if is_never_cached(route):
+            return None
+        matches = [prefix for prefix in self.route_ttls
+                   if route.startswith(prefix)]
+        if not matches:
+            return self.default_ttl
+        return self.route_ttls[max(matches, key=len)]
+
+    def get_key(self, url):
+        """Return (account, host, eid, route) of a url if it is cached.
+
+        None if it is not a dashboard route, its route is not cached or no
+        account is set.
+        """
+        key = get_cache_key(url)
+        if key is None or self.account is None or \
+                self.get_ttl(key[2]) is None:
+            return None
+        return (self.account,) + key
+
+    def encrypt(self, key, body):
+        """Return the seal() of a body stored under key."""
+        return seal(self.enc_key, body, json.dumps(key).encode('utf-8'))
+
+    def decrypt(self, key, blob):
+        """Return the body of an encrypt() blob, or None if it isn't valid."""
+        try:
+            return unseal(self.enc_key, blob, json.dumps(key).encode('utf-8'))
+        except ValueError:
+            return None
+
+    def get(self, url):
+        """Return the CachedResponse for a url, or None if not cached."""
+        key = self.get_key(url)
+        if key is None:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT url, status, headers, body, stored_at, expires_at '
+                'FROM account_responses '
+                'WHERE account=? AND host=? AND eid=? AND route=?',
+                key).fetchone()
+        if row is None:
+            return None
+        body = self.decrypt(key, row[3])
+        if body is None:
+            return None
+        return CachedResponse(row[0], row[1], json.loads(row[2]), body,
+                              row[4], row[5])
+
+    def store(self, url, response):
+        """Store a 200 response for a url.
+
+        Args:
+            url (string): URL that was requested (not the one redirected to).
+            response (requests.Response): Response to store.
+
+        """
+        key = self.get_key(url)
+        if key is None or response.status_code != 200:
+            return
+        # Redirects (i.e. to the login page) are not what the route returns.
+        if get_cache_key(response.url) != key[1:]:
+            return
+        headers = {name: value for name, value in response.headers.items()
+                   if name.lower() not in UNCACHED_HEADERS}
+        body = self.encrypt(key, response.content)
+        now = time.time()
+        with self.lock:
+            # The account may have logged out while this was downloading.
+            if self.account != key[0]:
+                return
+            self.connection.execute(
+                'INSERT OR REPLACE INTO account_responses VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                key + (response.url, response.status_code,
+                       json.dumps(headers), body, now,
+                       now + self.get_ttl(key[3])))
+            self.connection.commit()
+            self.stats['stores'] += 1
+
+    def refresh(self, url):
+        """Restart the TTL of an entry after a 304 Not Modified."""
+        key = self.get_key(url)
+        if key is None:
+            return
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                'UPDATE account_responses SET stored_at=?, expires_at=? '
+                'WHERE account=? AND host=? AND eid=? AND route=?',
+                (now, now + self.get_ttl(key[3])) + key)
+            self.connection.commit()
+
+    def record(self, stat):
+        """Increment one of the stats counters."""
+        with self.lock:
+            self.stats[stat] += 1
+
+    def get_hit_ratio(self):
+        """Return the share of lookups answered without a full download."""
+        served = self.stats['hits'] + self.stats['revalidated'] \
+            + self.stats['stale']
+        total = served + self.stats['misses']
+        if not total:
+            return 0.0
+        return served / total
+
+    def clear(self):
+        """Remove every cached response."""
+        with self.lock:
+            self.connection.execute('DELETE FROM account_responses')
+            self.connection.commit()
+
+    def close(self):
+        """Close the SQLite connection."""
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Canonical keys for dashboard URLs.
+
+The same page can be reached by many URLs: the network name slug before
+/n/<eid> changes when a network is renamed, dashboard appends junk such as
+'?only_path=false&protocol=https' or a trailing '#', and hosts differ only
+by case. get_route_key maps all of these to one (host, eid, route) key so
+that visited pages can be looked up in a dict instead of by substring scan.
+"""
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# Query params dashboard adds that don't change the page's content.
+JUNK_QUERY_PARAMS = ('only_path', 'protocol')
+JUNK_QUERY_PREFIXES = ('utm_',)
+
+
+def is_route_url(url):
+    """Return whether a URL is a dashboard route (has /manage in its path)."""
+    return '/manage' in urlsplit(url).path
+
+
+def is_junk_param(name):
+    """Return whether a query param doesn't change the page's content."""
+    return name in JUNK_QUERY_PARAMS or name.startswith(JUNK_QUERY_PREFIXES)
+
+
+def get_route_key(url):
+    """Return the canonical (host, eid, route) key of a URL.
+
+    Args:
+        url (string): i.e. https://N1.meraki.com/Net/n/abc/manage/usage/?x=1#
+    Returns:
+        (tuple): i.e. ('n1.meraki.com', 'n/abc', '/usage?x=1'). eid is
+            'n/<eid>' for network pages, 'o/<eid>' for org pages and '' if
+            there is none. For URLs that are not routes (i.e. login pages),
+            route is the whole path.
+
+    """
+    url_parts = urlsplit(url)
+    path = url_parts.path
+    eid = ''
+    if '/manage' in path:
+        base_path, path = path.split('/manage', 1)
+        base_parts = base_path.strip('/').split('/')
+        if len(base_parts) >= 2 and base_parts[-2] in ('n', 'o'):
+            eid = base_parts[-2] + '/' + base_parts[-1]
+    route = path.rstrip('/') or '/'
+    query_params = [(name, value) for name, value in parse_qsl(
+        url_parts.query, keep_blank_values=True) if not is_junk_param(name)]
+    if query_params:
+        route += '?' + urlencode(sorted(query_params))
+    return url_parts.netloc.lower(), eid, route
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Per-shard rate limiting, prioritization, retries and circuit breaking.
+
+Every live request made by DashboardTransport goes through
+RequestScheduler.send, which per shard host:
+
+* waits for a token from a token bucket. Tokens go to the waiting request
+  with the best priority class, so INTERACTIVE work (GUI/CLI actions) goes
+  ahead of BACKGROUND work (crawls, stale-while-revalidate refreshes).
+* retries 429s, and 5xx responses and connection errors of idempotent
+  requests, with jittered exponential backoff, honoring Retry-After. A
+  429 halves the host's rate and pauses the host; every success raises
+  the rate a little until it is back to the configured one (AIMD), so
+  sustained throughput settles just under what dashboard allows.
+* stops sending to a host whose requests keep failing (circuit breaker)
+  and lets one trial request through once reset_timeout has passed.
+
+Transports that share one RequestScheduler share its buckets, so a GUI and
+a background crawl using the same scheduler can't starve each other.
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+INTERACTIVE = 0
+BACKGROUND = 1
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending to a host whose circuit is open."""
+
+
+def get_retry_after(response):
+    """Return the Retry-After of a response in seconds (or None).
+
+    Args:
+        response (requests.Response): Response that may have Retry-After
+            as either delta-seconds or an HTTP date.
+
+    """
+    retry_after = response.headers.get('Retry-After')
+    if not retry_after:
+        return None
+    if retry_after.strip().isdigit():
+        return float(retry_after)
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class TokenBucket:
+    """Token bucket whose rate adapts to throttling (not thread-safe).
+
+    Attributes:
+        max_rate (float): Configured tokens per second. None = unlimited.
+        rate (float): Current tokens per second.
+        min_rate (float): Rate is never halved below this.
+        rate_step (float): Rate added back after each success.
+        burst (int): Max tokens that can be saved up.
+        tokens (float): Tokens currently available.
+        updated_at (float): Monotonic time tokens was last refilled.
+        blocked_until (float): Monotonic time before which no token is
+            given out (i.e. after a 429 with Retry-After).
+
+    """
+    __slots__ = ('max_rate', 'rate', 'min_rate', 'rate_step', 'burst',
+                 'tokens', 'updated_at', 'blocked_until')
+
+    def __init__(self, rate, burst, min_rate=0.5, rate_step=0.1):
+        """Start with a full bucket."""
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.rate_step = rate_step
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def get_wait(self, now):
+        """Return the seconds until a token can be taken (0 if now)."""
+        wait = max(self.blocked_until - now, 0.0)
+        if self.max_rate is None:
+            return wait
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self):
+        """Use up one token."""
+        self.tokens -= 1
+
+    def block(self, seconds, now):
+        """Give out no tokens for the next seconds."""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def slow_down(self):
+        """Halve the rate after being throttled."""
+        if self.max_rate is not None:
+            self.rate = max(self.rate / 2, min(self.min_rate, self.max_rate))
+
+    def speed_up(self):
+        """Raise the rate by rate_step, up to max_rate."""
+        if self.max_rate is not None:
+            self.rate = min(self.rate + self.rate_step, self.max_rate)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (not thread-safe).
+
+    Attributes:
+        failure_threshold (int): Consecutive failures that open the circuit.
+        reset_timeout (float): Seconds the circuit stays open before one
+            trial request is let through.
+        state (string): 'closed', 'open' or 'half-open'.
+        failures (int): Consecutive failures so far.
+        opened_at (float): Monotonic time the circuit was last opened.
+
+    """
+    __slots__ = ('failure_threshold', 'reset_timeout', 'state', 'failures',
+                 'opened_at')
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        """Start closed."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self, now):
+        """Return whether a request may be sent now.
+
+        Once reset_timeout has passed, the circuit goes half-open and the
+        first caller gets to send the trial request.
+        """
+        if self.state == 'closed':
+            return True
+        if self.state == 'open' and now >= self.opened_at + \
+                self.reset_timeout:
+            self.state = 'half-open'
+            return True
+        return False
+
+    def record_success(self):
+        """Close the circuit."""
+        self.state = 'closed'
+        self.failures = 0
+
+    def record_failure(self, now):
+        """Count a failure, opening the circuit if need be."""
+        self.failures += 1
+        if self.state == 'half-open' or \
+                self.failures >= self.failure_threshold:
+            self.state = 'open'
+            self.opened_at = now
+
+
+class HostState:
+    """Bucket, breaker and priority queue of waiters for one host."""
+    __slots__ = ('bucket', 'breaker', 'condition', 'waiters')
+
+    def __init__(self, bucket, breaker):
+        """Store the host's bucket and breaker."""
+        self.bucket = bucket
+        self.breaker = breaker
+        self.condition = threading.Condition()
+        self.waiters = []  # heap of (priority, ticket)
+
+
+class RequestScheduler:
+    """Rate limit, prioritize and retry requests per shard host.
+
+    Attributes:
+        rate (float): Requests per second per host. None = unlimited.
+        burst (int): Requests a host can get at once after being idle.
+        max_retries (int): Retries of a throttled/failed request.
+        backoff_base (float): Backoff cap of the first retry in seconds.
+            It doubles with each retry.
+        max_delay (float): Longest backoff/Retry-After that is waited for.
+            If the server asks for longer, its response is returned.
+        failure_threshold (int): See CircuitBreaker.
+        reset_timeout (float): See CircuitBreaker.
+        hosts (dict): {host: HostState} for every host seen.
+        stats (dict): Counters of 'requests', 'retries', 'throttled' (429s)
+            and 'rejected' (not sent because a circuit was open).
+
+    """
+
+    def __init__(self, rate=5.0, burst=10, max_retries=4, backoff_base=0.5,
+                 max_delay=60.0, failure_threshold=5, reset_timeout=30.0):
+        """Store the limits. Host state is created on first use."""
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hosts = {}
+        self.hosts_lock = threading.Lock()
+        self.tickets = itertools.count()
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0,
+                      'rejected': 0}
+
+    def get_host_state(self, host):
+        """Return the HostState of a host, creating it if need be."""
+        with self.hosts_lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostState(
+                    TokenBucket(self.rate, self.burst),
+                    CircuitBreaker(self.failure_threshold,
+                                   self.reset_timeout))
+            return self.hosts[host]
+
+    def acquire(self, state, priority):
+        """Block until this request is next in line and has a token."""
+        with state.condition:
+            entry = (priority, next(self.tickets))
+            heapq.heappush(state.waiters, entry)
+            try:
+                while True:
+                    is_next = state.waiters[0] == entry
+                    wait = state.bucket.get_wait(time.monotonic())
+                    if is_next and wait <= 0:
+                        heapq.heappop(state.waiters)
+                        state.bucket.take()
+                        return
+                    # Only the head of the line needs to watch the clock.
+                    state.condition.wait(wait if is_next else None)
+            finally:
+                if entry in state.waiters:
+                    state.waiters.remove(entry)
+                    heapq.heapify(state.waiters)
+                state.condition.notify_all()
+
+    def record(self, stat):
+        """Increment one of the stats counters."""
+        with self.hosts_lock:
+            self.stats[stat] += 1
+
+    def get_backoff(self, attempt):
+        """Return a full-jitter exponential backoff for a retry."""
+        return random.uniform(0, self.backoff_base * 2 ** attempt)
+
+    def send(self, host, method, send_request, priority=INTERACTIVE):
+        """Send a request through the host's limiter, retrying if need be.
+
+        Args:
+            host (string): Host the request goes to (i.e. n1.meraki.com).
+            method (string): HTTP method. Only idempotent methods are
+                retried on 5xx or connection errors/timeouts (the server
+                may have handled a request it didn't answer); any method
+                is retried on 429.
+            send_request (function): Sends the request and returns a
+                requests.Response. Called once per attempt.
+            priority (int): INTERACTIVE or BACKGROUND.
+        Returns:
+            (requests.Response): The last response.
+        Raises:
+            CircuitOpenError: If the host's circuit is open.
+            requests.exceptions.RequestException: If every attempt failed
+                to connect/timed out, or a non-idempotent request did.
+
+        """
+        state = self.get_host_state(host)
+        is_idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            self.check_circuit(host, state)
+            self.acquire(state, priority)
+            self.record('requests')
+            try:
+                response = send_request()
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as error:
+                response, delay = self.handle_error(
+                    state, error, attempt, is_idempotent)
+            else:
+                response, delay = self.handle_response(
+                    state, response, attempt, is_idempotent)
+                if delay is None:
+                    return response
+                response.close()
+            self.record('retries')
+            time.sleep(delay)
+            attempt += 1
+
+    def check_circuit(self, host, state):
+        """Raise CircuitOpenError if no request may be sent to a host."""
+        with state.condition:
+            is_allowed = state.breaker.allow(time.monotonic())
+        if not is_allowed:
+            self.record('rejected')
+            raise CircuitOpenError(
+                'Too many failed requests to ' + host + '. Not sending '
+                'for ' + str(state.breaker.reset_timeout) + 's.')
+
+    def handle_error(self, state, error, attempt, is_idempotent):
+        """Return (None, delay) before retrying a failed connection.
+
+        Raises:
+            error: If the request is not idempotent or out of retries.
+
+        """
+        with state.condition:
+            state.breaker.record_failure(time.monotonic())
+        if not is_idempotent or attempt >= self.max_retries:
+            raise error
+        return None, self.get_backoff(attempt)
+
+    def handle_response(self, state, response, attempt, is_idempotent):
+        """Return (response, delay before retrying it).
+
+        delay is None if the response is to be returned, i.e. it succeeded
+        or the retries, or the server's patience, have run out.
+        """
+        if response.status_code == 429:
+            delay = self.handle_throttled(state, response, attempt)
+        elif response.status_code >= 500:
+            delay = self.handle_server_error(state, response, attempt,
+                                             is_idempotent)
+        else:
+            with state.condition:
+                state.breaker.record_success()
+                state.bucket.speed_up()
+            delay = None
+        if delay is None or attempt >= self.max_retries or \
+                delay > self.max_delay:
+            return response, None
+        return response, delay
+
+    def handle_throttled(self, state, response, attempt):
+        """Slow the host down after a 429 and return the retry delay."""
+        delay = get_retry_after(response)
+        if delay is None:
+            delay = self.get_backoff(attempt)
+        self.record('throttled')
+        with state.condition:
+            state.breaker.record_success()
+            state.bucket.slow_down()
+            # Everyone waits, not just this request, but no longer than a
+            # retry would (i.e. Retry-After: 3600 is returned, not waited
+            # for).
+            state.bucket.block(min(delay, self.max_delay), time.monotonic())
+            state.condition.notify_all()
+        return delay
+
+    def handle_server_error(self, state, response, attempt, is_idempotent):
+        """Return the retry delay of a 5xx (None if it isn't retried)."""
+        with state.condition:
+            state.breaker.record_failure(time.monotonic())
+        if not is_idempotent:
+            return None
+        delay = get_retry_after(response)
+        if delay is None:
+            delay = self.get_backoff(attempt)
+        return delay
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Pool of logged in sessions, possibly of different admin accounts.
+
+One AsyncDashboardBrowser is one login with its own cookies, connection
+pools and request limit. Orgs managed under several admin accounts need
+several of them. SessionPool holds them and runs each job on a session
+whose account can access the job's org, choosing the least busy one that
+has a free slot:
+
+    pool = SessionPool()
+    await pool.add_account('alice@acme.corp', password, max_jobs=4)
+    await pool.add_account('bob@acme.corp', password, max_jobs=4)
+    subnets = await pool.map(
+        lambda session, org_id, network_id:
+            session.mx_get_client_vpn_subnet(org_id, network_id),
+        [(org_id, network_id) for org_id, network_id in networks])
+
+Sessions of different accounts have separate rate limits, so throughput
+grows with the number of accounts.
+"""
+import asyncio
+
+from .async_dashboard import AsyncDashboardBrowser
+
+
+class PooledSession:
+    """A session in a SessionPool and its job counts.
+
+    Attributes:
+        session (AsyncDashboardBrowser): Logged in session.
+        name (string): Label for reports (i.e. the account's username).
+        max_jobs (int): Most jobs run on this session at once.
+        in_flight (int): Jobs running on it now.
+        completed (int): Jobs that have finished on it.
+        failed (int): Jobs that raised on it.
+
+    """
+    __slots__ = ('session', 'name', 'max_jobs', 'in_flight', 'completed',
+                 'failed')
+
+    def __init__(self, session, name, max_jobs):
+        """Start with no jobs run."""
+        self.session = session
+        self.name = name
+        self.max_jobs = max_jobs
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+
+    def can_access(self, org_id):
+        """Return whether this session's account can see an org."""
+        return org_id in self.session.orgs_dict
+
+    def get_load(self):
+        """Return the share of this session's job slots in use."""
+        return self.in_flight / self.max_jobs
+
+
+class SessionPool:
+    """Routes jobs by org to sessions with per-session job limits.
+
+    Attributes:
+        sessions (list): PooledSessions in the order they were added.
+        condition (asyncio.Condition): Notified when a job slot frees up.
+            Created on first use so that it belongs to the running loop.
+
+    """
+
+    def __init__(self, sessions=()):
+        """Start a pool, optionally with already logged in sessions.
+
+        Args:
+            sessions (iterable): AsyncDashboardBrowsers to add (see add).
+
+        """
+        self.sessions = []
+        self.condition = None
+        for session in sessions:
+            self.add(session)
+
+    def add(self, session, name=None, max_jobs=None):
+        """Add a logged in session.
+
+        Args:
+            session (AsyncDashboardBrowser): Session with orgs_dict set up.
+            name (string): Label for reports. 'session <n>' if None.
+            max_jobs (int): Most jobs at once on this session. The
+                session's max_concurrency if None.
+        Returns:
+            (PooledSession): The pool's entry for the session.
+
+        """
+        if name is None:
+            name = 'session ' + str(len(self.sessions) + 1)
+        if max_jobs is None:
+            max_jobs = session.max_concurrency
+        if max_jobs < 1:
+            raise ValueError('max_jobs must be at least 1')
+        entry = PooledSession(session, name, max_jobs)
+        self.sessions.append(entry)
+        return entry
+
+    async def add_account(self, username, password, tfa_code=None,
+                          max_jobs=8):
+        """Log in to an account and add its session.
+
+        Returns:
+            (PooledSession): The pool's entry for the session.
+        Raises:
+            PermissionError: If the login does not succeed.
+
+        """
+        session = AsyncDashboardBrowser(max_concurrency=max_jobs)
+        result = await session.login(username, password, tfa_code)
+        if result != 'auth_success':
+            session.executor.shutdown(wait=False)
+            raise PermissionError('Login of ' + username + ' failed: ' +
+                                  str(result))
+        return self.add(session, username, max_jobs)
+
+    def get_org_ids(self):
+        """Return the ids of every org any session can access."""
+        org_ids = []
+        seen = set()
+        for entry in self.sessions:
+            for org_id in entry.session.orgs_dict:
+                if org_id not in seen:
+                    seen.add(org_id)
+                    org_ids.append(org_id)
+        return org_ids
+
+    def get_sessions(self, org_id):
+        """Return the PooledSessions that can access an org.
+
+        Raises:
+            LookupError: If no session can.
+
+        """
+        entries = [entry for entry in self.sessions
+                   if entry.can_access(org_id)]
+        if not entries:
+            raise LookupError('No session can access org ' + str(org_id))
+        return entries
+
+    async def acquire(self, org_id):
+        """Wait for a free job slot on a session that can access an org.
+
+        The least loaded session (share of its slots in use) is chosen.
+        Returns:
+            (PooledSession): Entry to release when the job is done.
+
+        """
+        entries = self.get_sessions(org_id)
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        async with self.condition:
+            while True:
+                free_entries = [entry for entry in entries
+                                if entry.in_flight < entry.max_jobs]
+                if free_entries:
+                    entry = min(free_entries, key=PooledSession.get_load)
+                    entry.in_flight += 1
+                    return entry
+                await self.condition.wait()
+
+    async def release(self, entry, failed=False):
+        """Free the job slot a job took with acquire."""
+        async with self.condition:
+            entry.in_flight -= 1
+            if failed:
+                entry.failed += 1
+            else:
+                entry.completed += 1
+            self.condition.notify_all()
+
+    async def run(self, org_id, job, *args):
+        """Run a job on a session that can access an org.
+
+        Args:
+            org_id: Org the job works in.
+            job (function): Coroutine function called as
+                job(session, org_id, *args).
+        Returns:
+            What the job returns.
+
+        """
+        entry = await self.acquire(org_id)
+        failed = True
+        try:
+            result = await job(entry.session, org_id, *args)
+            failed = False
+            return result
+        finally:
+            await self.release(entry, failed)
+
+    async def map(self, job, work, return_exceptions=False):
+        """Run a job for every item of a work queue, spread over sessions.
+
+        Args:
+            job (function): See run.
+            work (iterable): (org_id, *args) of each job.
+            return_exceptions (bool): Return exceptions in the results
+                instead of raising the first one.
+        Returns:
+            (list): Results in the order of work.
+
+        """
+        return await asyncio.gather(
+            *[self.run(item[0], job, *item[1:]) for item in work],
+            return_exceptions=return_exceptions)
+
+    def get_stats(self):
+        """Return {session name: {in_flight, completed, failed, max_jobs}}."""
+        return {entry.name: {'in_flight': entry.in_flight,
+                             'completed': entry.completed,
+                             'failed': entry.failed,
+                             'max_jobs': entry.max_jobs}
+                for entry in self.sessions}
+
+    async def logout(self):
+        """Log every session out."""
+        await asyncio.gather(*[entry.session.logout()
+                               for entry in self.sessions])
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Encrypted store of a logged in browser session.
+
+Logging in takes several requests plus a TFA code, then org_data_setup
+downloads administered_orgs. A SessionStore saves what that produces (the
+cookie jar with dash_auth and the shard cookies, orgs_dict, the active
+org/network and the current URL) so the next run can skip all of it:
+
+    store = SessionStore()
+    if not store.restore(browser, username, password):
+        browser.login(username, password)  # TFA, org_data_setup, ...
+        store.save(browser, username, password)
+
+The file is encrypted with AES-256-GCM (from the cryptography package)
+under a key derived from the username and password (PBKDF2-HMAC-SHA256),
+so only someone who knows the password can read the cookies.
+"""
+import hashlib
+import json
+import os
+import struct
+import time
+import zlib
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+MAGIC = b'MLS1'
+SALT_BYTES = 16
+NONCE_BYTES = 12  # AES-GCM's standard nonce size
+DEFAULT_ITERATIONS = 100000
+# Dashboard sessions don't last longer than this without activity.
+DEFAULT_MAX_AGE = 12 * 3600
+
+
+def get_default_session_path():
+    """Return the default session location (~/.merlink/session.bin)."""
+    return os.path.join(os.path.expanduser('~'), '.merlink', 'session.bin')
+
+
+def derive_keys(username, password, salt, iterations):
+    """Return (encryption key, MAC key) for a username/password."""
+    secret = (username.lower() + '\0' + password).encode('utf-8')
+    key = hashlib.pbkdf2_hmac('sha256', secret, salt, iterations, dklen=64)
+    return key[:32], key[32:]
+
+
+def seal(key, plaintext, associated_data):
+    """Return nonce + AES-GCM ciphertext (and tag) of plaintext.
+
+    associated_data is authenticated but not encrypted. unseal fails
+    unless it is given the same.
+    """
+    nonce = os.urandom(NONCE_BYTES)
+    return nonce + AESGCM(key).encrypt(nonce, plaintext, associated_data)
+
+
+def unseal(key, blob, associated_data):
+    """Return the plaintext of a seal() blob.
+
+    Raises:
+        ValueError: If the key or associated_data are wrong or the blob
+            has been tampered with.
+
+    """
+    try:
+        return AESGCM(key).decrypt(blob[:NONCE_BYTES], blob[NONCE_BYTES:],
+                                   associated_data)
+    except InvalidTag:
+        raise ValueError('Wrong key or corrupted data.')
+
+
+def encrypt(plaintext, username, password, iterations=DEFAULT_ITERATIONS):
+    """Return MAGIC + iterations + salt + seal() of plaintext."""
+    salt = os.urandom(SALT_BYTES)
+    enc_key, _ = derive_keys(username, password, salt, iterations)
+    header = MAGIC + struct.pack('>I', iterations) + salt
+    return header + seal(enc_key, plaintext, header)
+
+
+def decrypt(blob, username, password):
+    """Return the plaintext of an encrypt() blob.
+
+    Raises:
+        ValueError: If the blob is not ours, the credentials are wrong or
+            the blob has been tampered with.
+
+    """
+    header_len = len(MAGIC) + 4 + SALT_BYTES
+    if len(blob) < header_len + NONCE_BYTES or not blob.startswith(MAGIC):
+        raise ValueError('Not a merlink session file.')
+    header = blob[:header_len]
+    iterations = struct.unpack('>I', header[len(MAGIC):len(MAGIC) + 4])[0]
+    salt = header[len(MAGIC) + 4:]
+    enc_key, _ = derive_keys(username, password, salt, iterations)
+    try:
+        return unseal(enc_key, blob[header_len:], header)
+    except ValueError:
+        raise ValueError('Wrong credentials or corrupted session file.')
+
+
+class SessionStore:
+    """Save and restore a DashboardBrowser's login in an encrypted file.
+
+    Attributes:
+        path (string): Session file.
+        max_age (int): Seconds after which a saved session is not used.
+        iterations (int): PBKDF2 iterations used when saving.
+
+    """
+
+    def __init__(self, path=None, max_age=DEFAULT_MAX_AGE,
+                 iterations=DEFAULT_ITERATIONS):
+        """Store settings. Nothing is read until restore is called."""
+        if path is None:
+            path = get_default_session_path()
+        self.path = path
+        self.max_age = max_age
+        self.iterations = iterations
+
+    def save(self, browser, username, password):
+        """Encrypt and save a logged in browser's session.
+
+        Args:
+            browser (DashboardBrowser): Browser that has logged in.
+            username (string): Username it logged in with.
+            password (string): Password it logged in with (used as the key).
+
+        """
+        cookies = [{
+            'name': cookie.name,
+            'value': cookie.value,
+            'domain': cookie.domain,
+            'path': cookie.path,
+            'secure': cookie.secure,
+            'expires': cookie.expires,
+            'rest': cookie._rest,  # pylint: disable=protected-access
+        } for cookie in browser.transport.cookies]
+        state = {
+            'saved_at': time.time(),
+            'url': browser.get_url(),
+            'cookies': cookies,
+            'orgs_dict': browser.orgs_dict,
+            'org_qty': browser.org_qty,
+            'is_network_admin': browser.is_network_admin,
+            'active_org_id': browser.active_org_id,
+            'active_network_id': browser.active_network_id,
+        }
+        plaintext = zlib.compress(json.dumps(state).encode('utf-8'))
+        blob = encrypt(plaintext, username, password, self.iterations)
+        session_dir = os.path.dirname(self.path)
+        if session_dir and not os.path.isdir(session_dir):
+            os.makedirs(session_dir, mode=0o700)
+        # Write then rename so a crash never leaves half a session file.
+        temp_path = self.path + '.tmp'
+        file_descriptor = os.open(
+            temp_path, os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o600)
+        with os.fdopen(file_descriptor, 'wb') as session_file:
+            session_file.write(blob)
+        os.replace(temp_path, self.path)
+
+    def load(self, username, password):
+        """Return the saved session state, or None if it can't be used.
+
+        Nothing is sent over the network. A session is unusable if there is
+        none, it is someone else's, it is older than max_age or its cookies
+        have expired.
+        """
+        try:
+            with open(self.path, 'rb') as session_file:
+                blob = session_file.read()
+            state = json.loads(zlib.decompress(
+                decrypt(blob, username, password)).decode('utf-8'))
+        except (OSError, ValueError, zlib.error):
+            return None
+        now = time.time()
+        if now - state['saved_at'] > self.max_age or not state['url']:
+            return None
+        if any(cookie['expires'] and cookie['expires'] < now
+               for cookie in state['cookies']):
+            return None
+        return state
+
+    def restore(self, browser, username, password):
+        """Restore a saved session into a browser if it is still valid.
+
+        The cookies, orgs_dict and active org/network are loaded and the
+        session is validated with one request for the saved URL. Only its
+        status is read, so the page body isn't downloaded.
+
+        Args:
+            browser (DashboardBrowser): Browser that has not logged in.
+            username (string): Username of the saved session.
+            password (string): Password of the saved session.
+        Returns:
+            (bool): Whether the browser is now logged in. If False, log in
+                normally and save the new session.
+
+        """
+        state = self.load(username, password)
+        if state is None:
+            return False
+        for cookie in state['cookies']:
+            browser.transport.cookies.set(
+                cookie['name'], cookie['value'], domain=cookie['domain'],
+                path=cookie['path'], secure=cookie['secure'],
+                expires=cookie['expires'], rest=cookie['rest'])
+        # An expired session is redirected to the login page.
+        response = browser.transport.get(state['url'], allow_redirects=False,
+                                         stream=True)
+        response.close()
+        if response.status_code != 200:
+            browser.transport.cookies.clear()
+            return False
+        browser.mechsoup.open_fake_page('', url=state['url'])
+        browser.set_cache_account(username, password)
+        browser.orgs_dict = state['orgs_dict']
+        browser.org_qty = state['org_qty']
+        browser.is_network_admin = state['is_network_admin']
+        browser.active_org_id = state['active_org_id']
+        browser.active_network_id = state['active_network_id']
+        return True
+
+    def clear(self):
+        """Delete the saved session (i.e. after logging out)."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Connection-pooled HTTP transport shared by all dashboard requests.
+
+Every shard host (n<shard_id>.meraki.com) and account.meraki.com gets its
+own connection pool so that TCP+TLS handshakes are paid once per host
+instead of once per request. The mechsoup browser and every direct request
+(scrape_json, danger.py) use the same session, so cookies are shared too.
+
+If a ResponseCache is given, GET requests for dashboard routes are served
+from it while fresh and revalidated with conditional requests once stale.
+Requests that do go over the network are rate limited, prioritized and
+retried per host by a RequestScheduler. Every request is recorded in the
+transport's RequestMetrics.
+"""
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+from .metrics import RequestMetrics
+from .scheduler import BACKGROUND, INTERACTIVE, RequestScheduler
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled sockets have TCP keep-alive enabled.
+
+    Dashboard pages can take a while to be requested again (i.e. a user
+    idling in the GUI), so keep-alive probes stop middleboxes from silently
+    dropping the pooled connections.
+    """
+
+    def __init__(self, keep_alive=True, **kwargs):
+        """Store the keep-alive choice before the pool manager is built."""
+        self.keep_alive = keep_alive
+        super(KeepAliveAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        """Add SO_KEEPALIVE to the default socket options if requested."""
+        if self.keep_alive:
+            kwargs['socket_options'] = HTTPConnection.default_socket_options \
+                + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        super(KeepAliveAdapter, self).init_poolmanager(*args, **kwargs)
+
+    def get_pool_counts(self):
+        """Return (requests, connections) summed over this adapter's pools."""
+        num_requests = 0
+        num_connections = 0
+        pools = self.poolmanager.pools
+        for pool_key in pools.keys():
+            pool = pools[pool_key]
+            num_requests += pool.num_requests
+            num_connections += pool.num_connections
+        return num_requests, num_connections
+
+
+class DashboardTransport(requests.Session):
+    """requests.Session with one keep-alive connection pool per host.
+
+    Adapters are created lazily the first time a host is seen, so a browser
+    that only visits n1.meraki.com and account.meraki.com will only ever
+    hold those two pools.
+
+    Attributes:
+        pool_connections (int): Number of pools cached by each adapter.
+        pool_maxsize (int): Max connections kept open per host. Raise this
+            if many threads share one transport (i.e. AsyncDashboardBrowser).
+        pool_block (bool): Whether to block when a host's pool is exhausted
+            instead of opening a throwaway connection.
+        keep_alive (bool): Whether to keep connections open between requests.
+        host_adapters (dict): {host: KeepAliveAdapter} for every host visited.
+        cache (ResponseCache): Optional on-disk cache for GET routes.
+        scheduler (RequestScheduler): Rate limiter/retrier of live requests.
+            Pass one scheduler to several transports to share its limits.
+        priority (int): Priority class of requests that don't pass one
+            (scheduler.INTERACTIVE or scheduler.BACKGROUND).
+        metrics (RequestMetrics): Per-route latency, bytes, redirects,
+            parse time and cache results.
+
+    """
+
+    def __init__(self, pool_connections=4, pool_maxsize=10,
+                 pool_block=False, keep_alive=True, cache=None,
+                 scheduler=None, priority=INTERACTIVE, metrics=None):
+        """Initialize the session and its pool settings."""
+        super(DashboardTransport, self).__init__()
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.host_adapters = {}
+        self.adapter_lock = threading.Lock()
+        self.cache = cache
+        if scheduler is None:
+            scheduler = RequestScheduler()
+        self.scheduler = scheduler
+        self.priority = priority
+        if metrics is None:
+            metrics = RequestMetrics()
+        self.metrics = metrics
+        self.revalidating = set()
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
+
+    def get_adapter(self, url):
+        """Return the adapter for this url's host, creating it if need be.
+
+        Args:
+            url (string): URL that is about to be requested.
+        Returns:
+            (HTTPAdapter): The adapter that owns this host's pool.
+
+        """
+        url_parts = urlsplit(url)
+        if url_parts.scheme not in ('http', 'https'):
+            return super(DashboardTransport, self).get_adapter(url)
+        host = url_parts.netloc.lower()
+        with self.adapter_lock:
+            if host not in self.host_adapters:
+                self.host_adapters[host] = KeepAliveAdapter(
+                    keep_alive=self.keep_alive,
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize,
+                    pool_block=self.pool_block)
+            return self.host_adapters[host]
+
+    def request(self, method, url, *args, **kwargs):
+        """Send a request, answering cacheable GETs from the cache.
+
+        Only bodiless GETs of dashboard routes are cached. Everything else
+        (logins, form posts, session checks without redirects, streamed
+        bodies that would have to be read whole to be stored, ...) goes
+        straight to the scheduler.
+
+        Args:
+            priority (int): Optional keyword. Priority class of this request
+                if it is not the transport's default.
+        Returns:
+            (requests.Response): Live or cached response. Cached responses
+                have an X-Merlink-Cache header of 'hit', 'revalidated' or
+                'stale'. request_seconds is set to the time it took.
+
+        """
+        priority = kwargs.pop('priority', self.priority)
+        is_cacheable = self.cache is not None and method.upper() == 'GET' \
+            and not args and not kwargs.get('data') \
+            and not kwargs.get('json') and not kwargs.get('params') \
+            and kwargs.get('allow_redirects', True) \
+            and not kwargs.get('stream') \
+            and self.cache.get_key(url) is not None
+        started_at = time.perf_counter()
+        try:
+            if is_cacheable:
+                response = self.send_cacheable(priority, url, kwargs)
+            else:
+                response = self.send_live(priority, method, url, *args,
+                                          **kwargs)
+        except requests.exceptions.RequestException:
+            self.metrics.observe_error(url)
+            raise
+        response.request_seconds = time.perf_counter() - started_at
+        self.observe_response(url, response, is_cacheable,
+                              kwargs.get('stream'))
+        return response
+
+    def observe_response(self, url, response, is_cacheable, is_streamed):
+        """Record a response's time, size, redirects and cache result."""
+        if is_streamed:
+            num_bytes = int(response.headers.get('Content-Length') or 0)
+        else:
+            num_bytes = len(response.content)
+        cache_result = response.headers.get('X-Merlink-Cache')
+        if not cache_result:
+            cache_result = 'miss' if is_cacheable else 'uncached'
+        self.metrics.observe_request(url, response.request_seconds,
+                                     num_bytes, len(response.history),
+                                     cache_result)
+
+    def send_cacheable(self, priority, url, kwargs):
+        """GET a url from the cache, revalidating/fetching it if need be."""
+        cached = self.cache.get(url)
+        if cached is None:
+            self.cache.record('misses')
+            response = self.send_live(priority, 'GET', url, **kwargs)
+            self.cache.store(url, response)
+            return response
+        if cached.is_fresh():
+            self.cache.record('hits')
+            return cached.to_response('hit')
+        if self.cache.stale_while_revalidate:
+            self.cache.record('stale')
+            with self.adapter_lock:
+                is_revalidating = url in self.revalidating
+                self.revalidating.add(url)
+            if not is_revalidating:
+                revalidation = threading.Thread(
+                    target=self.revalidate,
+                    args=(url, cached, kwargs, BACKGROUND))
+                revalidation.daemon = True
+                revalidation.start()
+            return cached.to_response('stale')
+        return self.revalidate(url, cached, kwargs, priority)
+
+    def send_live(self, priority, method, url, *args, **kwargs):
+        """Send a request over the network through the scheduler."""
+        def send_request():
+            """Send one attempt."""
+            return super(DashboardTransport, self).request(
+                method, url, *args, **kwargs)
+        host = urlsplit(url).netloc.lower()
+        return self.scheduler.send(host, method, send_request, priority)
+
+    def revalidate(self, url, cached, kwargs, priority=INTERACTIVE):
+        """Send a conditional GET for a stale entry and update the cache.
+
+        Args:
+            url (string): URL of the stale entry.
+            cached (CachedResponse): The stale entry.
+            kwargs (dict): Keyword arguments of the original request.
+            priority (int): Priority class of the conditional request.
+        Returns:
+            (requests.Response): The cached response if it was not modified,
+                otherwise the new response.
+
+        """
+        kwargs = dict(kwargs)
+        headers = dict(kwargs.get('headers') or {})
+        headers.update(cached.get_validators())
+        kwargs['headers'] = headers
+        try:
+            response = self.send_live(priority, 'GET', url, **kwargs)
+        finally:
+            with self.adapter_lock:
+                self.revalidating.discard(url)
+        if response.status_code == 304:
+            self.cache.refresh(url)
+            self.cache.record('revalidated')
+            return cached.to_response('revalidated')
+        self.cache.record('misses')
+        self.cache.store(url, response)
+        return response
+
+    def get_reuse_stats(self):
+        """Return connection-reuse counters for every host visited.
+
+        Returns:
+            (dict): {host: {'requests': int, 'connections': int,
+                'reused': int}}. 'reused' is the number of requests that did
+                not need a new TCP+TLS handshake.
+
+        """
+        stats = {}
+        for host in list(self.host_adapters):
+            num_requests, num_connections = \
+                self.host_adapters[host].get_pool_counts()
+            stats[host] = {
+                'requests': num_requests,
+                'connections': num_connections,
+                'reused': max(num_requests - num_connections, 0),
+            }
+        return stats
+
+    def close(self):
+        """Close every host pool as well as the default adapters."""
+        for adapter in self.host_adapters.values():
+            adapter.close()
+        self.host_adapters = {}
+        super(DashboardTransport, self).close()
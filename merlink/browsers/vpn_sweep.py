@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This docstring is used for docopt and requires specific formatting.
+r"""MERLINK CLIENT VPN SWEEP
+
+Check client VPN health of every wired network in every org and write a
+JSON report.
+
+It uses relative imports, so run it as a module from the repository root:
+  python -m merlink.browsers.vpn_sweep --username <username> ...
+
+Usage:
+  merlink.browsers.vpn_sweep --username <username> [--password <password>]
+                             [--org-id <org_id>]... [--output <file>]
+                             [--concurrency <concurrency>] [--rate <rate>]
+                             [--networks <networks>]
+                             [--timeout <timeout>] [--no-probe]
+  merlink.browsers.vpn_sweep (-h | --help)
+
+Options:
+  -h, --help            Show this screen.
+  -u <username>, --username <username>
+                        The Dashboard email account that you login with.
+  -p <password>, --password <password>
+                        Your Dashboard account password. Asked securely with
+                        getpass if not entered.
+  -o <org_id>, --org-id <org_id>
+                        Only sweep these orgs. Default is every org.
+  -f <file>, --output <file>
+                        File to write the JSON report to. Default is stdout.
+  -c <concurrency>, --concurrency <concurrency>
+                        Max requests in flight at once. [default: 8]
+  -r <rate>, --rate <rate>
+                        Max requests per second to each dashboard shard.
+                        Raising --concurrency alone doesn't go past it.
+                        [default: 5]
+  -n <networks>, --networks <networks>
+                        Max networks checked at once. [default: 32]
+  -t <timeout>, --timeout <timeout>
+                        Seconds each reachability probe waits. [default: 1]
+  --no-probe            Skip the reachability check.
+
+Each network's checks are:
+  client_vpn_enabled    Is client VPN on? (/configure/settings)
+  firewall_status       Is there an MX and is it online? (new_wired_status)
+  nat_rules             Are udp 500/4500 forwarded or natted? (firewall)
+  connectivity          Does the MX answer IKE probes on udp 500 or 4500?
+"""
+import asyncio
+import json
+import sys
+import time
+
+import docopt
+
+from .async_dashboard import AsyncDashboardBrowser, login_from_args
+from .client_vpn import get_contact_address, get_firewall_status_errors, \
+    get_nat_rule_errors, get_probe_errors
+from .dashboard import DashboardBrowser
+from .pages.page_hunters import PageJsonIndex
+from .scheduler import BACKGROUND, RequestScheduler
+from .transport import DashboardTransport
+from ..vpn.ike_probe import probe_targets
+
+CHECK_NAMES = ('client_vpn_enabled', 'firewall_status', 'nat_rules',
+               'connectivity')
+
+
+def get_sweep_networks(orgs_dict, org_ids):
+    """Yield (org_id, network_id) of every wired non-template network."""
+    for org_id in org_ids:
+        networks = orgs_dict[org_id]['node_groups']
+        for network_id in networks:
+            network = networks[network_id]
+            if network.get('network_type') == 'wired' and \
+                    not network.get('is_config_template'):
+                yield org_id, network_id
+
+
+def get_check(errors, **details):
+    """Return a check's record for the report."""
+    return {'passed': not errors, 'errors': errors, 'details': details}
+
+
+def get_failed_check(error):
+    """Return the record of a check whose page could not be fetched."""
+    return get_check(['ERROR: ' + type(error).__name__ + ' ' + str(error)])
+
+
+async def check_enabled(browser, org_id, network_id):
+    """Return the client_vpn_enabled check of a network."""
+    try:
+        settings = await browser.scrape_json(
+            '/configure/settings', org_id, network_id)
+        enabled = settings['wdc']['client_vpn_enabled']
+    # Any failure is recorded so that one bad network doesn't stop the sweep.
+    except Exception as error:  # pylint: disable=broad-except
+        return get_failed_check(error)
+    # Disabled is a state to report, not a failure.
+    return get_check([], enabled=enabled in (True, 'true'))
+
+
+async def check_nat_rules(browser, org_id, network_id):
+    """Return the nat_rules check of a network."""
+    try:
+        pagetext = await browser.get_pagetext(
+            '/configure/firewall', org_id, network_id)
+    except Exception as error:  # pylint: disable=broad-except
+        return get_failed_check(error)
+    return get_check(get_nat_rule_errors(pagetext))
+
+
+async def check_status_and_connectivity(browser, org_id, network_id,
+                                        probe_semaphore, probe_kwargs):
+    """Return the firewall_status and connectivity checks of a network.
+
+    The MX's address comes from the status page, so it is probed as soon
+    as that page arrives (while the network's other pages may still be
+    downloading).
+
+    Args:
+        probe_semaphore (asyncio.Semaphore): Bounds networks probed at
+            once. No probe is sent if None.
+        probe_kwargs (dict): Keyword arguments of probe_targets.
+
+    """
+    try:
+        pagetext = await browser.get_pagetext(
+            '/nodes/new_wired_status', org_id, network_id)
+    except Exception as error:  # pylint: disable=broad-except
+        failed_check = get_failed_check(error)
+        return failed_check, failed_check
+    status_json = PageJsonIndex(pagetext).get
+    status_check = get_check(
+        get_firewall_status_errors(status_json, check_client_ip=False),
+        firewall_ip=status_json('{"public_ip'),
+        status_code=status_json('status#'))
+    address = get_contact_address(status_json)
+    if probe_semaphore is None:
+        return status_check, None
+    if address in (None, -1, ''):
+        return status_check, get_check(
+            ["ERROR: Cannot find the firewall's address!"])
+    async with probe_semaphore:
+        results = await probe_targets([address], **probe_kwargs)
+    errors, details = get_probe_errors(address, results)
+    return status_check, get_check(errors, address=address, probes=details)
+
+
+async def sweep_network(browser, org_id, network_id, probe_semaphore=None,
+                        probe_kwargs=None):
+    """Check one network and return its report record.
+
+    Its three pages are fetched concurrently (bounded by the browser's
+    max_concurrency) and each is fetched once.
+
+    Returns:
+        (dict): org_id, network_id, network_name, checks ({check name:
+            {passed, errors, details}}; connectivity is None if not
+            probed), passed (every check that ran passed) and elapsed.
+
+    """
+    started_at = time.time()
+    enabled_check, nat_check, (status_check, connectivity_check) = \
+        await asyncio.gather(
+            check_enabled(browser, org_id, network_id),
+            check_nat_rules(browser, org_id, network_id),
+            check_status_and_connectivity(
+                browser, org_id, network_id, probe_semaphore,
+                probe_kwargs or {}))
+    checks = {'client_vpn_enabled': enabled_check,
+              'firewall_status': status_check,
+              'nat_rules': nat_check,
+              'connectivity': connectivity_check}
+    return {
+        'org_id': org_id,
+        'network_id': network_id,
+        'network_name': browser.orgs_dict[org_id]['node_groups'][
+            network_id]['n'],
+        'checks': checks,
+        'passed': all(check['passed'] for check in checks.values()
+                      if check is not None),
+        'elapsed': round(time.time() - started_at, 4),
+    }
+
+
+async def sweep(browser, org_ids=None, max_networks=32, probe=True,
+                max_probes=None, **probe_kwargs):
+    """Check client VPN health of every wired network in some orgs.
+
+    max_networks workers pull networks from a generator, so at most that
+    many are checked at once however many there are. Requests are further
+    bounded by browser.max_concurrency; probes need no requests, so they
+    overlap with other networks' page fetches.
+
+    Args:
+        browser (AsyncDashboardBrowser): Logged in browser.
+        org_ids (list): Orgs to sweep. Default is every org.
+        max_networks (int): Most networks checked at once.
+        probe (bool): Whether to run the connectivity check.
+        max_probes (int): Most networks probed at once. max_networks if
+            None.
+        **probe_kwargs: Passed to probe_targets (i.e. timeout, count).
+    Returns:
+        (dict): Report with networks (records of sweep_network, in the
+            order they finished), summary (counts of networks, passed,
+            client VPN enabled and failures of each check) and elapsed.
+
+    """
+    started_at = time.time()
+    if not org_ids:
+        org_ids = list(browser.orgs_dict)
+    # Networks must be known before they can be swept.
+    await asyncio.gather(*[browser.set_org_id(org_id) for org_id in org_ids])
+    networks = get_sweep_networks(browser.orgs_dict, org_ids)
+    probe_semaphore = asyncio.Semaphore(max_probes or max_networks) \
+        if probe else None
+    records = []
+
+    async def worker():
+        """Check networks until there are none left."""
+        # next() never yields to the loop, so workers can share the generator.
+        for org_id, network_id in networks:
+            records.append(await sweep_network(
+                browser, org_id, network_id, probe_semaphore, probe_kwargs))
+
+    await asyncio.gather(*[worker() for _ in range(max_networks)])
+    return {'networks': records, 'summary': get_summary(records),
+            'elapsed': round(time.time() - started_at, 4)}
+
+
+def get_summary(records):
+    """Return counts over sweep_network records for the report."""
+    failures = {name: 0 for name in CHECK_NAMES}
+    for record in records:
+        for name, check in record['checks'].items():
+            if check is not None and not check['passed']:
+                failures[name] += 1
+    return {
+        'networks': len(records),
+        'passed': sum(record['passed'] for record in records),
+        'client_vpn_enabled': sum(
+            bool(record['checks']['client_vpn_enabled']['details'].get(
+                'enabled')) for record in records),
+        'failures': failures,
+    }
+
+
+def main():
+    """Log in with command line credentials and write a sweep report."""
+    args = docopt.docopt(__doc__)
+    concurrency = int(args['--concurrency'])
+    # Sweeps yield to interactive requests sharing the same shards.
+    transport = DashboardTransport(
+        pool_maxsize=concurrency, priority=BACKGROUND,
+        scheduler=RequestScheduler(rate=float(args['--rate'])))
+    browser = AsyncDashboardBrowser(
+        max_concurrency=concurrency,
+        browser=DashboardBrowser(transport=transport))
+    login_from_args(browser, args)
+    loop = asyncio.get_event_loop()
+    try:
+        report = loop.run_until_complete(sweep(
+            browser, args['--org-id'], int(args['--networks']),
+            not args['--no-probe'], timeout=float(args['--timeout'])))
+    finally:
+        loop.run_until_complete(browser.logout())
+    output = open(args['--output'], 'w') if args['--output'] else sys.stdout
+    try:
+        json.dump(report, output, indent=2)
+        output.write('\n')
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print('Sweep finished:', report['summary'], file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -19,11 +19,11 @@ r"""MERLINK
 Usage:
   merlink.py
   merlink.py (--username <username>)
-               [--password <password>]
+               [--password <password>] [--cache] [--session]
   merlink.py (--username <username>)
                [(--org-id <org_id> | --org-name <org_name>)
                  (--network-id <network_id> | --network-name <network_name>)]
-               [--password <password>]
+               [--password <password>] [--cache] [--session]
   merlink.py (-h | --help)
   merlink.py (-v | --version)
 
@@ -39,6 +39,12 @@ Options:
   -n, --network-id      Your network's ID. You can get this from the API.
       --org-name        Your organization's name. Will fail if not unique.
       --network-name    Your network's name. Will fail if not unique.
+  -c, --cache           Reuse dashboard pages fetched by earlier runs of the
+                        same account while they are fresh (stored encrypted
+                        in ~/.merlink/cache.sqlite, removed at logout).
+  -s, --session         Remember the login so later runs skip login, TFA and
+                        org setup while it is valid. It is stored encrypted
+                        with your password in ~/.merlink/session.bin.
 
 Notes on Usages[0-2]:
   - Usage[0]        Launches the GUI. GUI > CLI featureset.
@@ -64,9 +70,15 @@ import getpass
 import docopt
 
 from merlink.browsers.client_vpn import ClientVpnBrowser
+from merlink.browsers.response_cache import ResponseCache
+from merlink.browsers.session_store import SessionStore
+from merlink.browsers.transport import DashboardTransport
 from merlink.vpn.vpn_connection import VpnConnection
 from merlink import __version__
 
+# Longer lists are searched by name in the TUI instead of printed in full.
+MAX_LISTED_CHOICES = 20
+
 
 class MainCli:
     """MerLink CLI : Less featured alternative to the GUI.
@@ -76,6 +88,7 @@ class MainCli:
         browser (DashboardBrowser): Browser to hold state.
         username (string): Username to login with.
         password (string): Password to login with.
+        session_store (SessionStore): Saved login to resume, if --session.
 
     """
 
@@ -84,7 +97,13 @@ class MainCli:
         super(MainCli, self).__init__()
 
         self.args = docopt.docopt(__doc__)
-        self.browser = ClientVpnBrowser()
+        transport = None
+        if self.args['--cache']:
+            transport = DashboardTransport(cache=ResponseCache())
+        self.browser = ClientVpnBrowser(transport)
+        self.session_store = None
+        if self.args['--session']:
+            self.session_store = SessionStore()
 
         # Determine which routine to do based on arguments
         if self.args['--version']:
@@ -103,24 +122,40 @@ class MainCli:
 
     def attempt_login(self):
         """Login to dashboard using username/password."""
-        auth_result = self.browser.login(self.username, self.password)
+        if self.session_store and self.session_store.restore(
+                self.browser, self.username, self.password):
+            print("Resumed saved session.")
+            return
+        self.check_auth_result(
+            self.browser.login(self.username, self.password))
+
+        # If not auth failure, then success!
+        print("Authentication success!")
+        if self.session_store:
+            self.session_store.save(self.browser, self.username,
+                                    self.password)
+
+    def check_auth_result(self, auth_result):
+        """Exit unless a login result is (or can be made) a success."""
         if auth_result == 'auth_error':
             print('ERROR: Invalid username or password. \nNow exiting...\n')
             sys.exit()
         elif auth_result == 'sms_auth':
-            tfa_code = input("TFA code required for " + self.username + ": ")
-            tfa_success = self.browser.tfa_submit_info(tfa_code.strip())
-            if not tfa_success:
-                print("ERROR: Invalid TFA code. Exiting...")
-                sys.exit()
+            self.submit_tfa_code()
         elif auth_result == 'ConnectionError':
             print("""ERROR: No internet connection!\n\nAccess to the internet
                    is required for MerLink to work. Please check your network
                    settings and try again. Now exiting...""")
             sys.exit()
 
-        # If not auth failure, then success!
-        print("Authentication success!")
+    def submit_tfa_code(self):
+        """Ask for the TFA code and submit it, exiting if it is wrong."""
+        tfa_code = input("TFA code required for " + self.username + ": ")
+        tfa_success = self.browser.tfa_submit_info(tfa_code.strip())
+        if not tfa_success:
+            print("ERROR: Invalid TFA code. Exiting...")
+            sys.exit()
+        self.browser.org_data_setup()
 
     def init_ui(self):
         """Start the program, having a browser and all relevant vars."""
@@ -155,28 +190,64 @@ class MainCli:
             Will trigger only iff --username and --password are specified.
         """
         org_list = self.browser.get_org_names()
-        org_name = self.get_user_input_from_list(org_list, "organization")
+        org_name = self.get_user_input_from_list(
+            org_list, "organization", self.browser.search_org_names)
         self.browser.set_org_name(org_name)
 
         network_list = self.browser.get_network_names(['wired'])
-        network_name = self.get_user_input_from_list(network_list, "network")
-        self.browser.set_network_name(network_name)
+        network_name = self.get_user_input_from_list(
+            network_list, "network",
+            lambda query: self.browser.search_network_names(query, ['wired']))
+        self.browser.set_network_name(network_name, 'wired')
 
     @staticmethod
-    def get_user_input_from_list(list_name, list_type):
-        """Show the user a numbered list and return the index they enter."""
+    def get_user_input_from_list(list_name, list_type, search=None):
+        """Show the user a numbered list and return the item they choose.
+
+        If the list is longer than MAX_LISTED_CHOICES and search is given,
+        the user enters part of a name (typos are ok) and chooses from the
+        best matches instead of scrolling through every name.
+
+        Args:
+            list_name (list): Names to choose from.
+            list_type (string): What the names are (i.e. 'network').
+            search (function): Returns the names that best match a query.
+        """
         # Create a heading and underline it.
         print('\n' + list_type.upper() + 'S\n' + (len(list_type) + 1) * '=')
+        choices = list_name
+        if search and len(list_name) > MAX_LISTED_CHOICES:
+            print(len(list_name), list_type + "s found.")
+            choices = MainCli.search_user_input(list_type, search)
         # Get user org index choice and update the browser
-        for index, item_name in enumerate(list_name):
+        for index, item_name in enumerate(choices):
             print(str(index) + '.', item_name)
         choice = int(input("\nEnter the " + list_type + " number: "))
-        while choice not in range(len(list_name)):
+        while choice not in range(len(choices)):
             choice = int(
                 input("Not a valid number! Please enter a number "
-                      "between 0 and " + str(len(list_name)) + ": "))
+                      "between 0 and " + str(len(choices)) + ": "))
 
-        return list_name[choice]
+        return choices[choice]
+
+    @staticmethod
+    def search_user_input(list_type, search):
+        """Ask for part of a name until search matches some names.
+
+        Args:
+            list_type (string): What the names are (i.e. 'network').
+            search (function): Returns the names that best match a query.
+        Returns:
+            (list): The names matching the user's query.
+
+        """
+        choices = []
+        while not choices:
+            query = input("\nEnter part of the " + list_type + " name: ")
+            choices = search(query)
+            if not choices:
+                print("No " + list_type + " names match", query)
+        return choices
 
     def attempt_connection(self, vpn_data):
         """Create a VPN object and connect with it."""
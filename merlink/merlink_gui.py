@@ -13,7 +13,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Controlling class for the GUI. Does NOT call Qt classes (see /qt)."""
+import os
+
 from merlink.browsers.client_vpn import ClientVpnBrowser
+from merlink.browsers.response_cache import ResponseCache
+from merlink.browsers.transport import DashboardTransport
 from merlink.qt import main_window
 from merlink.qt.pane_login_fullscreen import TfaDialogUi
 from merlink.qt.menu_bars import MenuBarsUi
@@ -69,7 +73,13 @@ class MainWindow:
     def __init__(self):
         """Initialize GUI objects, decorate main window object, and show it."""
         self.app = main_window.MainWindowUi()
-        self.browser = ClientVpnBrowser()
+        # Like the CLI's --cache, the on-disk cache is opt-in: set
+        # MERLINK_CACHE=1 to serve restarts from it while pages are fresh.
+        transport = None
+        if os.environ.get('MERLINK_CACHE') == '1':
+            transport = DashboardTransport(
+                cache=ResponseCache(stale_while_revalidate=True))
+        self.browser = ClientVpnBrowser(transport)
 
         # Tie the menu bars, tray_icon, and main window UI to this object.
         self.app.menu_widget = MenuBarsUi(self.app.menuBar())
@@ -88,6 +98,8 @@ class MainWindow:
         """
         self.app.org_dropdown.currentIndexChanged.connect(
             self.change_organization)
+        self.app.network_filter_textfield.textChanged.connect(
+            self.refresh_network_dropdown)
         self.app.main_window_set_admin_layout()
         self.app.guest_user_chkbox.stateChanged.connect(
             lambda state: self.app.disable_email_pass(not state))
@@ -164,16 +176,14 @@ class MainWindow:
         This will have been triggered by a network dropdown change. Get
         network info for this network and let user know.
         """
-        # Off by 1 due to Select option
-        current_network_index = self.app.network_dropdown.currentIndex() - 1
-        if current_network_index == -1:
+        # The dropdown may be filtered, so go by name instead of index.
+        # Index 0 is the Select option.
+        if self.app.network_dropdown.currentIndex() <= 0:
             self.app.status.showMessage("Status: Select a Network")
             self.app.connect_btn.setEnabled(False)
             self.app.vpn_name_textfield.setEnabled(False)
         else:
-            network_list = self.app.browser.get_network_names(['wired'])
-            print('main window network list', network_list)
-            current_network = network_list[current_network_index]
+            current_network = self.app.network_dropdown.currentText()
             self.app.status.showMessage("Status: Fetching network data for " +
                                     current_network + "...")
 
@@ -199,16 +209,30 @@ class MainWindow:
                 self.app.vpn_name_textfield.setText(vpn_name)
                 self.app.vpn_name_textfield.setEnabled(True)
 
-    def refresh_network_dropdown(self):
+    def refresh_network_dropdown(self, filter_text=None):
         """Remove old values of the network dropdown and add new ones.
 
         Remove previous contents of Networks QComboBox and
-        add new ones according to chosen organization
+        add new ones according to chosen organization. If the user has
+        entered filter text, only matching networks are added, best first.
+
+        Args:
+            filter_text (string): Text networks must match. If None, the
+                current text of the network filter field (i.e. when the
+                org changes, the filter the user typed still applies).
+
         """
+        if filter_text is None:
+            filter_text = self.app.network_filter_textfield.text()
         self.app.network_dropdown.clear()
         self.app.network_dropdown.addItem('-- Select a Network --')
 
-        current_org_network_list = self.app.browser.get_network_names(['wired'])
+        if filter_text.strip():
+            current_org_network_list = self.app.browser.search_network_names(
+                filter_text, ['wired'], limit=None)
+        else:
+            current_org_network_list = \
+                self.app.browser.get_network_names(['wired'])
         print('current_org_network_list', current_org_network_list)
         self.app.network_dropdown.addItems(current_org_network_list)
 
@@ -76,6 +76,7 @@ class MainWindowUi(QMainWindow):
         self.guest_user_chkbox = QCheckBox("Use guest account instead")
         self.password_textfield.setEchoMode(QLineEdit.Password)
         self.org_dropdown = QComboBox()
+        self.network_filter_textfield = QLineEdit()
         self.create_vpn_btn = QPushButton("Create VPN Interface")
 
         self.create_vpn_tabs = QTabWidget()
@@ -140,6 +141,9 @@ class MainWindowUi(QMainWindow):
         org_dropdown.addItem('-- Select an Organization --')
         network_dropdown = QComboBox()
         network_dropdown.setEnabled(False)
+        # Orgs can have thousands of networks, so let the user narrow them
+        self.network_filter_textfield.setPlaceholderText(
+            "Filter networks by name")
 
         # Allow the user to change the VPN name
         vpn_name_layout = QHBoxLayout()
@@ -175,6 +179,7 @@ class MainWindowUi(QMainWindow):
             self.vpn_opts_layout,
             [
                 org_dropdown,
+                self.network_filter_textfield,
                 network_dropdown,
                 vpn_name_layout,
                 # Add layouts for specialized params
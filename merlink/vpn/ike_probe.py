@@ -0,0 +1,479 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Asynchronous reachability probes of the ports a client VPN uses.
+
+Client VPN is IPsec: IKE on UDP 500, and UDP 4500 once NAT is detected.
+Pinging the firewall tests neither, blocks in a child process and can't
+run for many firewalls at once. probe_targets sends IKE-shaped UDP
+datagrams (and optionally ICMP echoes) to any number of targets from one
+event loop and reports per target and port how many were answered and
+how long the answers took:
+
+    results = run_probes(['198.51.100.7', 'fw.example.com'])
+    for result in results:
+        print(result.address, result.port, result.loss, result.rtt_p95)
+
+UDP 500 gets an IKEv1 Main Mode SA proposal, which MX client VPN (IKEv1
+only) answers, and UDP 4500 an IKEv2 IKE_SA_INIT, which IKEv2 responders
+answer, so a firewall speaking either version answers on one of them.
+Any datagram back counts as an answer. An ICMP port unreachable in reply
+is counted in refused: the host is up, but nothing listens on the port.
+"""
+import asyncio
+import math
+import os
+import socket
+import struct
+import time
+
+IKE_PORT = 500
+NAT_T_PORT = 4500
+ICMP = 'icmp'
+# Non-ESP marker that precedes IKE messages on the NAT-T port.
+NON_ESP_MARKER = b'\x00' * 4
+# IKEv2 header values (RFC 7296)
+IKE_VERSION = 0x20
+IKE_SA_INIT = 34
+INITIATOR_FLAG = 0x08
+PAYLOAD_SA = 33
+PAYLOAD_KE = 34
+PAYLOAD_NONCE = 40
+# (transform type, transform id, key length) offered in the SA payload:
+# AES-CBC-128, PRF-HMAC-SHA1, HMAC-SHA1-96, DH group 14
+TRANSFORMS = ((1, 12, 128), (2, 2, None), (3, 2, None), (4, 14, None))
+DH_GROUP = 14
+DH_PUBLIC_BYTES = 256
+NONCE_BYTES = 32
+# IKEv1 (ISAKMP) header values (RFC 2408, RFC 2409)
+ISAKMP_VERSION = 0x10
+IDENTITY_PROTECTION = 2  # Main Mode
+ISAKMP_PAYLOAD_SA = 1
+ISAKMP_PAYLOAD_TRANSFORM = 3
+IPSEC_DOI = 1
+SIT_IDENTITY_ONLY = 1
+PROTO_ISAKMP = 1
+KEY_IKE = 1
+# Basic attributes (type, value) of each transform offered, as MX client
+# VPN expects: 3DES or AES-128, SHA1, pre-shared key, DH group 2, 8 hours
+MAIN_MODE_TRANSFORMS = (
+    ((1, 5), (2, 2), (3, 1), (4, 2), (11, 1), (12, 28800)),
+    ((1, 7), (14, 128), (2, 2), (3, 1), (4, 2), (11, 1), (12, 28800)))
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP_TOKEN_BYTES = 8
+
+
+class ProbeResult:
+    """Answers to the probes of one target and port.
+
+    Attributes:
+        address (string): Address (or DNS name) that was probed.
+        port (int|string): UDP port probed, or ICMP.
+        sent (int): Probes sent.
+        rtts (list): Seconds until each answered probe was answered.
+        refused (int): Probes answered with an ICMP port unreachable.
+        error (string): Why the target could not be probed, if it could not
+            (i.e. its name does not resolve).
+
+    """
+    __slots__ = ('address', 'port', 'sent', 'rtts', 'refused', 'error')
+
+    def __init__(self, address, port):
+        """Start with nothing sent."""
+        self.address = address
+        self.port = port
+        self.sent = 0
+        self.rtts = []
+        self.refused = 0
+        self.error = None
+
+    def __repr__(self):
+        """Return a one line summary."""
+        return '<ProbeResult {} {} sent={} received={} loss={:.0%}>'.format(
+            self.address, self.port, self.sent, self.received, self.loss)
+
+    @property
+    def received(self):
+        """Return how many probes were answered."""
+        return len(self.rtts)
+
+    @property
+    def loss(self):
+        """Return the share of probes not answered (1.0 if none sent)."""
+        if not self.sent:
+            return 1.0
+        return 1 - self.received / self.sent
+
+    @property
+    def rtt_min(self):
+        """Return the fastest answer in seconds (None if none)."""
+        return min(self.rtts) if self.rtts else None
+
+    @property
+    def rtt_avg(self):
+        """Return the mean answer time in seconds (None if none)."""
+        return sum(self.rtts) / len(self.rtts) if self.rtts else None
+
+    @property
+    def rtt_p95(self):
+        """Return the 95th percentile answer time (nearest rank)."""
+        if not self.rtts:
+            return None
+        rtts = sorted(self.rtts)
+        return rtts[math.ceil(0.95 * len(rtts)) - 1]
+
+    def to_dict(self):
+        """Return the result and its statistics as a dict."""
+        return {'address': self.address, 'port': self.port,
+                'sent': self.sent, 'received': self.received,
+                'refused': self.refused, 'loss': self.loss,
+                'rtt_min': self.rtt_min, 'rtt_avg': self.rtt_avg,
+                'rtt_p95': self.rtt_p95, 'error': self.error}
+
+
+def get_ike_sa_init(spi):
+    """Return an IKEv2 IKE_SA_INIT request with initiator SPI spi.
+
+    It offers one proposal and carries a random KE and nonce, so it looks
+    like the first message of a real negotiation.
+    """
+    transforms = b''
+    for index, (transform_type, transform_id, key_length) in \
+            enumerate(TRANSFORMS):
+        attribute = b'' if key_length is None else \
+            struct.pack('!HH', 0x800e, key_length)  # TV key length
+        is_last = index == len(TRANSFORMS) - 1
+        transforms += struct.pack(
+            '!BBHBBH', 0 if is_last else 3, 0, 8 + len(attribute),
+            transform_type, 0, transform_id) + attribute
+    proposal = struct.pack('!BBHBBBB', 0, 0, 8 + len(transforms), 1, 1, 0,
+                           len(TRANSFORMS)) + transforms
+    sa_payload = struct.pack('!BBH', PAYLOAD_KE, 0, 4 + len(proposal)) + \
+        proposal
+    ke_payload = struct.pack('!BBHHH', PAYLOAD_NONCE, 0,
+                             8 + DH_PUBLIC_BYTES, DH_GROUP, 0) + \
+        os.urandom(DH_PUBLIC_BYTES)
+    nonce_payload = struct.pack('!BBH', 0, 0, 4 + NONCE_BYTES) + \
+        os.urandom(NONCE_BYTES)
+    payloads = sa_payload + ke_payload + nonce_payload
+    header = struct.pack('!8s8sBBBBII', spi, b'\x00' * 8, PAYLOAD_SA,
+                         IKE_VERSION, IKE_SA_INIT, INITIATOR_FLAG, 0,
+                         28 + len(payloads))
+    return header + payloads
+
+
+def get_main_mode(cookie):
+    """Return an IKEv1 Main Mode SA proposal with initiator cookie cookie.
+
+    Responders answer it with their own SA payload, or a notification if
+    none of the transforms is acceptable.
+    """
+    transforms = b''
+    for index, attributes in enumerate(MAIN_MODE_TRANSFORMS):
+        attribute_bytes = b''.join(
+            struct.pack('!HH', 0x8000 | attribute_type, value)  # TV format
+            for attribute_type, value in attributes)
+        is_last = index == len(MAIN_MODE_TRANSFORMS) - 1
+        transforms += struct.pack(
+            '!BBHBBH', 0 if is_last else ISAKMP_PAYLOAD_TRANSFORM, 0,
+            8 + len(attribute_bytes), index + 1, KEY_IKE, 0) + \
+            attribute_bytes
+    proposal = struct.pack('!BBHBBBB', 0, 0, 8 + len(transforms), 1,
+                           PROTO_ISAKMP, 0, len(MAIN_MODE_TRANSFORMS)) + \
+        transforms
+    sa_payload = struct.pack('!BBHII', 0, 0, 12 + len(proposal), IPSEC_DOI,
+                             SIT_IDENTITY_ONLY) + proposal
+    header = struct.pack('!8s8sBBBBII', cookie, b'\x00' * 8,
+                         ISAKMP_PAYLOAD_SA, ISAKMP_VERSION,
+                         IDENTITY_PROTECTION, 0, 0, 28 + len(sa_payload))
+    return header + sa_payload
+
+
+def get_probe(key, port, sequence):
+    """Return the probe numbered sequence to a port, identified by key.
+
+    UDP 500 probes are IKEv1 Main Mode proposals. Other UDP ports get
+    IKEv2 IKE_SA_INIT requests, and UDP 4500 probes start with the non-ESP
+    marker as NAT-T requires.
+    """
+    if port == ICMP:
+        return get_icmp_echo(key, sequence)
+    if port == IKE_PORT:
+        return get_main_mode(key)
+    if port == NAT_T_PORT:
+        return NON_ESP_MARKER + get_ike_sa_init(key)
+    return get_ike_sa_init(key)
+
+
+def get_icmp_echo(token, sequence):
+    """Return an ICMP echo request whose payload is token."""
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, 0, sequence)
+    checksum = get_checksum(header + token)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, 0,
+                       sequence) + token
+
+
+def get_checksum(data):
+    """Return the internet checksum (RFC 1071) of data."""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack('!' + str(len(data) // 2) + 'H', data))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+class ProbeProtocol(asyncio.DatagramProtocol):
+    """Matches answers on one socket to the probes that were sent.
+
+    Attributes:
+        get_key (function): Returns the key of the probe an answer is for
+            (None if it isn't one).
+        waiters (dict): {probe key: future set to the time it was answered}.
+
+    """
+
+    def __init__(self, get_key):
+        """Start with no probes sent."""
+        self.get_key = get_key
+        self.waiters = {}
+
+    def datagram_received(self, data, addr):
+        """Resolve the waiter of the probe this answers."""
+        received_at = time.perf_counter()
+        waiter = self.waiters.get(self.get_key(data))
+        if waiter is not None and not waiter.done():
+            waiter.set_result(received_at)
+
+    def error_received(self, exc):
+        """Fail every waiting probe with an ICMP error (i.e. refused)."""
+        for waiter in self.waiters.values():
+            if not waiter.done():
+                waiter.set_exception(exc)
+
+
+def get_ike_key(data):
+    """Return the initiator SPI (IKEv1: cookie) of an IKE answer.
+
+    The answer may start with the non-ESP marker.
+    """
+    if data[:4] == NON_ESP_MARKER:
+        data = data[4:]
+    return data[:8] if len(data) >= 28 else None
+
+
+def get_icmp_key(data):
+    """Return the token of an ICMP echo reply.
+
+    Raw sockets pass the IP header along; ICMP datagram sockets don't.
+    """
+    if data and data[0] >> 4 == 4:
+        data = data[(data[0] & 0x0f) * 4:]
+    if len(data) < 8 + ICMP_TOKEN_BYTES or data[0] != ICMP_ECHO_REPLY:
+        return None
+    return data[8:8 + ICMP_TOKEN_BYTES]
+
+
+def get_icmp_socket():
+    """Return a non-blocking ICMP socket.
+
+    An unprivileged ICMP datagram socket is used where the OS allows one
+    (Linux's net.ipv4.ping_group_range, macOS), otherwise a raw socket.
+    Raises:
+        PermissionError: If neither may be opened.
+
+    """
+    for socket_type in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            icmp_socket = socket.socket(socket.AF_INET, socket_type,
+                                        socket.IPPROTO_ICMP)
+        except OSError:
+            continue
+        icmp_socket.setblocking(False)
+        return icmp_socket
+    raise PermissionError('ICMP sockets are not permitted')
+
+
+class IcmpEndpoint:
+    """Datagram transport over a connected ICMP socket.
+
+    asyncio's datagram endpoints only take UDP sockets, so this reads the
+    socket with loop.add_reader and hands datagrams to a ProbeProtocol.
+    """
+
+    def __init__(self, loop, icmp_socket, protocol):
+        """Start reading the socket."""
+        self.loop = loop
+        self.socket = icmp_socket
+        self.protocol = protocol
+        loop.add_reader(icmp_socket.fileno(), self.read_ready)
+
+    def read_ready(self):
+        """Pass an available datagram (or error) to the protocol."""
+        try:
+            data = self.socket.recv(65535)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as error:
+            self.protocol.error_received(error)
+            return
+        self.protocol.datagram_received(data, None)
+
+    def sendto(self, data):
+        """Send to the address the socket is connected to."""
+        self.socket.send(data)
+
+    def close(self):
+        """Stop reading and close the socket."""
+        self.loop.remove_reader(self.socket.fileno())
+        self.socket.close()
+
+
+async def open_icmp_endpoint(loop, address):
+    """Return (IcmpEndpoint, ProbeProtocol) for echoes to an address.
+
+    Raises:
+        OSError: If the address does not resolve or ICMP is not permitted.
+
+    """
+    infos = await loop.getaddrinfo(address, None, family=socket.AF_INET)
+    icmp_socket = get_icmp_socket()
+    try:
+        icmp_socket.connect((infos[0][4][0], 0))
+        protocol = ProbeProtocol(get_icmp_key)
+        return IcmpEndpoint(loop, icmp_socket, protocol), protocol
+    except (OSError, NotImplementedError):  # No add_reader (i.e. Proactor)
+        icmp_socket.close()
+        raise
+
+
+async def probe_target(address, port=IKE_PORT, count=3, timeout=1.0,
+                       interval=0.05):
+    """Probe one target and port.
+
+    Probes are sent interval seconds apart without waiting for answers, and
+    each waits at most timeout seconds from when it was sent for its own
+    answer, so this takes about
+    (count - 1) * interval + timeout if nothing answers.
+
+    Args:
+        address (string): IP address or DNS name.
+        port (int|string): UDP port (see get_probe for what each gets) or
+            ICMP for echo requests.
+        count (int): Probes to send.
+        timeout (float): Seconds each probe waits for its answer.
+        interval (float): Seconds between probes.
+    Returns:
+        (ProbeResult): The answers.
+
+    """
+    loop = asyncio.get_event_loop()
+    result = ProbeResult(address, port)
+    try:
+        transport, protocol = await open_probe_endpoint(loop, address, port)
+    except (OSError, NotImplementedError) as error:  # i.e. gaierror
+        result.error = type(error).__name__ + ': ' + str(error)
+        return result
+    try:
+        await send_probes(transport, protocol, result, count, timeout,
+                          interval)
+    finally:
+        transport.close()
+    return result
+
+
+async def open_probe_endpoint(loop, address, port):
+    """Return (transport, ProbeProtocol) for probes to an address and port.
+
+    Raises:
+        OSError: If the address does not resolve or the socket can't open.
+
+    """
+    if port == ICMP:
+        return await open_icmp_endpoint(loop, address)
+    return await loop.create_datagram_endpoint(
+        lambda: ProbeProtocol(get_ike_key), remote_addr=(address, port))
+
+
+async def send_probes(transport, protocol, result, count, timeout,
+                      interval):
+    """Send count probes and record their answers in result."""
+    loop = asyncio.get_event_loop()
+    waits = []
+    for sequence in range(count):
+        if sequence:
+            await asyncio.sleep(interval)
+        key = os.urandom(8)
+        waiter = loop.create_future()
+        protocol.waiters[key] = waiter
+        transport.sendto(get_probe(key, result.port, sequence))
+        result.sent += 1
+        waits.append(asyncio.ensure_future(wait_for_answer(
+            waiter, time.perf_counter(), timeout, result)))
+    await asyncio.gather(*waits)
+
+
+async def wait_for_answer(waiter, sent_at, timeout, result):
+    """Record in result how a probe sent at sent_at was answered."""
+    try:
+        answered_at = await asyncio.wait_for(waiter, timeout)
+    except asyncio.TimeoutError:
+        return
+    except ConnectionRefusedError:
+        result.refused += 1
+        return
+    except OSError:  # Other ICMP errors (i.e. host unreachable)
+        return
+    result.rtts.append(answered_at - sent_at)
+
+
+async def probe_targets(addresses, ports=(IKE_PORT, NAT_T_PORT),
+                        icmp=False, count=3, timeout=1.0, interval=0.05,
+                        max_in_flight=256):
+    """Probe every port of many targets at once.
+
+    Args:
+        addresses (iterable): IP addresses or DNS names.
+        ports (iterable): UDP ports to probe on each.
+        icmp (bool): Also send ICMP echo requests to each.
+        max_in_flight (int): Most targets/ports probed at once (each takes
+            a socket).
+        See probe_target for the rest.
+    Returns:
+        (list): ProbeResults in the order of addresses, then ports (with
+            ICMP last).
+
+    """
+    ports = list(ports) + ([ICMP] if icmp else [])
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def probe_bounded(address, port):
+        """Probe one target/port once there is room."""
+        async with semaphore:
+            return await probe_target(address, port, count, timeout,
+                                      interval)
+
+    return await asyncio.gather(*[probe_bounded(address, port)
+                                  for address in addresses
+                                  for port in ports])
+
+
+def run_probes(addresses, **kwargs):
+    """Blocking probe_targets in a new event loop (i.e. from a thread)."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(probe_targets(addresses, **kwargs))
+    finally:
+        loop.close()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark columnar client tables against looping over row dicts.
+
+Run from the project root:
+    PYTHONPATH=. python test/benchmarks/bench_columnar.py
+"""
+import random
+import time
+
+from merlink.browsers.columnar import (
+    CLIENT_COLUMNS, ColumnTable, clients_per_network)
+
+NUM_NETWORKS = 100
+
+
+def make_clients(num_clients, seed):
+    """Return client_list_json-like rows of one network."""
+    rand = random.Random(seed)
+    return [{'mac': '00:18:0a:%02x:%04x' % (seed, index),
+             'ip': '10.%d.%d.%d' % (seed, index // 256 % 256, index % 256),
+             'description': rand.choice(('laptop', 'phone', None)),
+             'vlan': rand.choice((1, 10, 20, 30)),
+             'os': rand.choice(('Windows 10', 'macOS', 'Android', 'iOS')),
+             'manufacturer': rand.choice(('Apple', 'Dell', 'Samsung')),
+             'sent': rand.random() * 1000, 'recv': rand.random() * 1000}
+            for index in range(num_clients)]
+
+
+def timed(function):
+    """Return (result, seconds) of calling function."""
+    started_at = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started_at
+
+
+def ingest(table, networks):
+    """Load every network's rows into a table."""
+    for network_id, rows in networks:
+        table.extend(rows, network_id=network_id)
+
+
+def count_vlan_os(networks):
+    """Count (vlan, os) over row dicts the way callers did before."""
+    counts = {}
+    for _, rows in networks:
+        for row in rows:
+            key = (row.get('vlan'), row.get('os'))
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def main():
+    """Print ingest and aggregation times for several fleet sizes."""
+    print('{:>9} {:>10} {:>12} {:>12} {:>12}'.format(
+        'clients', 'ingest s', 'by net ms', 'by vlan/os ms', 'dict loop ms'))
+    for clients_per_net in (1000, 10000, 20000):
+        networks = [('N_%d' % number, make_clients(clients_per_net, number))
+                    for number in range(NUM_NETWORKS)]
+        table = ColumnTable(CLIENT_COLUMNS)
+        _, ingest_seconds = timed(lambda: ingest(table, networks))
+        _, by_network = timed(lambda: clients_per_network(table))
+        _, by_vlan_os = timed(lambda: table.count_by('vlan', 'os'))
+        _, loop_seconds = timed(lambda: count_vlan_os(networks))
+        print('{:>9} {:>10.2f} {:>12.1f} {:>12.1f} {:>12.1f}'.format(
+            len(table), ingest_seconds, by_network * 1000,
+            by_vlan_os * 1000, loop_seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
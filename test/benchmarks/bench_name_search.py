@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark ranked network name search against scoring every name.
+
+Run from the project root:
+    PYTHONPATH=. python test/benchmarks/bench_name_search.py
+"""
+import random
+import timeit
+
+from merlink.browsers.name_search import (
+    MIN_FUZZY_SCORE, NameSearchIndex, get_match_score, get_trigrams)
+
+CITIES = ('Austin', 'Berlin', 'Chicago', 'Denver', 'Lisbon', 'Osaka',
+          'Toronto', 'Zurich')
+KINDS = ('Store', 'Warehouse', 'Office', 'Clinic', 'Branch')
+QUERIES = ('clinic 4321', 'clnic 4321 osaka', 'warehouse', 'zur', '98',
+           'office 77 - lisbon')
+
+
+def make_names(num_networks):
+    """Return (id, name, network_type) of num_networks networks."""
+    rand = random.Random(num_networks)
+    names = []
+    for number in range(num_networks):
+        name = '{} {} - {}'.format(rand.choice(KINDS), number,
+                                   rand.choice(CITIES))
+        names.append(('N_' + str(number), name,
+                      rand.choice(('wired', 'switch', 'wireless'))))
+    return names
+
+
+def scan(names, query, network_type, limit=10):
+    """Return the same ranked names as a search by scoring every name."""
+    query = query.lower()
+    query_trigrams = get_trigrams(query)
+    results = []
+    for _, name, kind in names:
+        if kind != network_type:
+            continue
+        lower_name = name.lower()
+        score = get_match_score(
+            query, lower_name, len(query_trigrams & get_trigrams(lower_name)),
+            len(query_trigrams))
+        if score >= MIN_FUZZY_SCORE:
+            results.append((-score, lower_name, name))
+    return [name for _, _, name in sorted(results)[:limit]]
+
+
+def main():
+    """Print build and per-query times for several org sizes."""
+    print('{:>9} {:>10} {:>20} {:>10} {:>10}'.format(
+        'networks', 'build ms', 'query', 'search ms', 'scan ms'))
+    for num_networks in (1000, 10000, 50000):
+        names = make_names(num_networks)
+        build = min(timeit.repeat(lambda: NameSearchIndex(names),
+                                  number=1, repeat=3))
+        index = NameSearchIndex(names)
+        for query in QUERIES:
+            search = min(timeit.repeat(
+                lambda: index.search(query, ['wired']), number=1, repeat=5))
+            full_scan = min(timeit.repeat(
+                lambda: scan(names, query, 'wired'), number=1, repeat=3))
+            print('{:>9} {:>10.1f} {:>20} {:>10.2f} {:>10.2f}'.format(
+                num_networks, build * 1000, query, search * 1000,
+                full_scan * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark page hunters on synthetic megabyte-sized dashboard pages.
+
+Run from the project root:
+    PYTHONPATH=. python test/benchmarks/bench_page_hunters.py
+"""
+import re
+import timeit
+
+from merlink.browsers.pages import page_hunters
+
+
+def make_mkiconf_page(num_rows, num_vars=200):
+    """Return a page of about num_rows * 150 bytes with Mkiconf vars.
+
+    Like dashboard pages, the vars are in a script near the top with the
+    authenticity_token among the first of them.
+    """
+    mkiconf_vars = ['Mkiconf.action_name = "new_wired_status";',
+                    'Mkiconf.authenticity_token = "cW2Lk8G+9ZW5z1kDhJ0=";']
+    mkiconf_vars += ['Mkiconf.var_{0} = {{"id": {0}, "on": false}};'.format(
+        index) for index in range(num_vars)]
+    row = ('<tr><td class="name">Row {0}</td><td><input id="row_{0}" '
+           'value="value {0}" type="text"></td></tr>\n')
+    return ('<html><head><script>\n  ' + '\n  '.join(mkiconf_vars) +
+            '\n</script></head><body><table>' +
+            ''.join(row.format(index) for index in range(num_rows)) +
+            '</table></body></html>')
+
+
+def get_mkiconf_findall(pagetext):
+    """Return the Mkiconf vars the way page_hunters used to find them."""
+    mkiconf_vars = {}
+    mki_lines = re.findall(' Mkiconf[!-:<-~]* =[ -:<-~]*;', pagetext)
+    for line in mki_lines:
+        mki_string = re.findall(r'[0-9a-zA-Z_\[\]"]+\s=\s[ -:<-~]*', line)[0]
+        mki_key, mki_value = mki_string.split(' = ', 1)
+        mkiconf_vars[mki_key] = mki_value.strip(';').strip('"')
+    return mkiconf_vars
+
+
+def make_wired_status_page(num_rows):
+    """Return a page of about num_rows * 150 bytes with a JSON blob at the end.
+
+    The keys client_vpn.py looks up are in the last script of the page.
+    """
+    return make_mkiconf_page(num_rows) + (
+        '<script>var status = {"request_ip": "1.2.3.4", "node": '
+        '{"status#": 0, "public_ip": "5.6.7.8", "dynamic_dns_enabled": '
+        'false, "dynamic_dns_name": "mx.dynamic-m.com"}};</script>')
+
+
+def get_json_values_sliced(pagetext, keys):
+    """Look keys up the way get_pagetext_json_value used to (find/slice)."""
+    values = []
+    for key in keys:
+        value_start = pagetext.find(key) + len(key) + 3
+        value_end = pagetext[value_start:].find('"') + value_start
+        values.append(pagetext[value_start:value_end])
+    return values
+
+
+def bench_json_lookups():
+    """Print sliced vs indexed times of the 4 client VPN lookups."""
+    keys = ('request_ip', '{"public_ip', 'status#', 'dynamic_dns_enabled')
+    print('{:>8} {:>11} {:>10} {:>14}'.format(
+        'page KB', 'sliced ms', 'index ms', 'lookups us'))
+    for num_rows in (1000, 10000, 50000):
+        pagetext = make_wired_status_page(num_rows)
+        sliced = min(timeit.repeat(
+            lambda: get_json_values_sliced(pagetext, keys),
+            number=1, repeat=5))
+        indexed = min(timeit.repeat(
+            lambda: page_hunters.PageJsonIndex(pagetext), number=1, repeat=5))
+        index = page_hunters.PageJsonIndex(pagetext)
+        lookups = min(timeit.repeat(
+            lambda: [index.get(key) for key in keys], number=1, repeat=5))
+        print('{:>8} {:>11.2f} {:>10.2f} {:>14.1f}'.format(
+            len(pagetext) // 1024, sliced * 1000, indexed * 1000,
+            lookups * 1000000))
+
+
+def bench_mkiconf():
+    """Print findall vs scanner vs early-stop times for several sizes."""
+    print('{:>8} {:>12} {:>11} {:>13}'.format(
+        'page KB', 'findall ms', 'scanner ms', 'one var ms'))
+    for num_rows in (1000, 10000, 50000):
+        pagetext = make_mkiconf_page(num_rows)
+        findall = min(timeit.repeat(
+            lambda: get_mkiconf_findall(pagetext), number=1, repeat=5))
+        scanner = min(timeit.repeat(
+            lambda: page_hunters.get_pagetext_mkiconf(pagetext),
+            number=1, repeat=5))
+        one_var = min(timeit.repeat(
+            lambda: page_hunters.get_pagetext_mkiconf_value(
+                pagetext, 'authenticity_token'), number=1, repeat=5))
+        print('{:>8} {:>12.2f} {:>11.2f} {:>13.3f}'.format(
+            len(pagetext) // 1024, findall * 1000, scanner * 1000,
+            one_var * 1000))
+
+
+def main():
+    """Run every benchmark."""
+    bench_mkiconf()
+    print()
+    bench_json_lookups()
+
+
+if __name__ == '__main__':
+    main()
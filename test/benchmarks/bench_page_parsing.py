@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark page parsing strategies on synthetic dashboard pages.
+
+Run from the project root:
+    PYTHONPATH=. python test/benchmarks/bench_page_parsing.py
+"""
+import timeit
+
+import bs4
+
+from merlink.browsers.pages import page_utils
+
+CLIENT_VPN_IDS = ('wired_config_client_vpn_subnet',
+                  'wired_config_client_vpn_dns_mode',
+                  'wired_config_client_vpn_secret')
+
+
+def make_configure_page(num_rows, target_position=0.5):
+    """Return a configure page of about num_rows * 200 bytes.
+
+    The client VPN form is placed target_position of the way into the page
+    (dashboard puts forms after the side nav and before large scripts).
+    """
+    row = ('<tr><td class="name">Row {0}</td><td><input id="row_{0}" '
+           'name="rows[{0}]" value="value {0}" type="text"></td>'
+           '<td><a href="/manage/configure/row/{0}">edit</a></td></tr>\n')
+    rows = [row.format(index) for index in range(num_rows)]
+    form = ('<input id="wired_config_client_vpn_subnet" '
+            'value="10.0.0.0/24">'
+            '<select id="wired_config_client_vpn_dns_mode">'
+            '<option value="google_dns" selected="selected">Use Google '
+            'Public DNS</option><option value="custom">Specify nameservers'
+            '...</option></select>'
+            '<input id="wired_config_client_vpn_secret" type="password" '
+            'value="my-client-vpn-psk">\n')
+    split_at = int(num_rows * target_position)
+    html = ('<html><head><title>Client VPN</title></head><body><table>' +
+            ''.join(rows[:split_at]) + '</table>' + form + '<table>' +
+            ''.join(rows[split_at:]) + '</table></body></html>')
+    return html.encode('utf-8')
+
+
+def benchmark(body, repeat=5):
+    """Return the best (full, targeted) parse times of a body in seconds."""
+    full = min(timeit.repeat(
+        lambda: bs4.BeautifulSoup(body, 'lxml'), number=1, repeat=repeat))
+    targeted = min(timeit.repeat(
+        lambda: page_utils.get_partial_page(body, CLIENT_VPN_IDS),
+        number=1, repeat=repeat))
+    return full, targeted
+
+
+def main():
+    """Print full vs targeted parse times for several page sizes."""
+    print('{:>10} {:>8} {:>10} {:>12} {:>8}'.format(
+        'page KB', 'target', 'full ms', 'targeted ms', 'speedup'))
+    for num_rows in (1000, 5000, 10000):
+        for target_position in (0.1, 0.5, 1.0):
+            body = make_configure_page(num_rows, target_position)
+            full, targeted = benchmark(body)
+            print('{:>10} {:>8} {:>10.1f} {:>12.1f} {:>7.1f}x'.format(
+                len(body) // 1024, target_position, full * 1000,
+                targeted * 1000, full / targeted))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Local HTTP server that tests point browsers and transports at."""
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+class QuietHandler(BaseHTTPRequestHandler):
+    """Keep-alive request handler that does not log requests."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        """Keep test output quiet."""
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    """Serve each keep-alive connection in its own thread."""
+    daemon_threads = True
+
+
+class LocalServer:
+    """Serve handler on a random port of 127.0.0.1 from a daemon thread.
+
+    Start one in setUp and close it in tearDown:
+        self.server = LocalServer(JsonHandler)
+        url = 'http://' + self.server.host + '/'
+    """
+
+    def __init__(self, handler):
+        self.server = ThreadingServer(('127.0.0.1', 0), handler)
+        self.port = self.server.server_port
+        self.host = '127.0.0.1:' + str(self.port)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def close(self):
+        """Stop serving and close the listening socket."""
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test the asyncio dashboard browser against a local HTTP server."""
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+from merlink.browsers.async_dashboard import AsyncDashboardBrowser, \
+    ScraperContext, login_from_args
+from test.method_tests.local_server import LocalServer, QuietHandler
+
+CLIENT_VPN_HTML = b'''<html><body>
+<input id="wired_config_client_vpn_subnet" value="10.0.0.0/24">
+<select id="wired_config_client_vpn_dns_mode">
+<option value="google_dns" selected="selected">Use Google Public DNS</option>
+</select></body></html>'''
+
+
+class SlowHandler(QuietHandler):
+    """Answer after a short delay, tracking how many requests overlap."""
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def do_GET(self):
+        """Send client vpn HTML or a JSON echo of the path."""
+        with SlowHandler.lock:
+            SlowHandler.in_flight += 1
+            SlowHandler.max_in_flight = max(SlowHandler.max_in_flight,
+                                            SlowHandler.in_flight)
+        time.sleep(0.05)
+        if 'client_vpn_settings' in self.path:
+            body, content_type = CLIENT_VPN_HTML, 'text/html'
+        elif self.path.endswith('/configure/general'):
+            body, content_type = self.get_side_nav_html(), 'text/html'
+        else:
+            body = json.dumps({'path': self.path}).encode()
+            content_type = 'application/json'
+        with SlowHandler.lock:
+            SlowHandler.in_flight -= 1
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def get_side_nav_html(self):
+        """Return a page whose side nav links to this network's pages."""
+        network_url = 'http://' + self.headers['Host'] + \
+            self.path[:-len('/configure/general')]
+        side_nav = {'tab_menu': {'tabs': [{
+            'name': 'Security appliance', 'menus': {'Configure': {'items': [
+                {'name': 'Client VPN',
+                 'url': network_url + '/configure/client_vpn_settings'}]}}}]}}
+        return ('<script>window.initializeSideNavigation(' +
+                json.dumps(side_nav) + ')</script>').encode()
+
+
+class TestAsyncDashboardBrowser(unittest.TestCase):
+    """Test concurrent fetches with explicit org/network context."""
+
+    def setUp(self):
+        """Start a local server and point the browser's URLs at it."""
+        self.server = LocalServer(SlowHandler)
+        base = 'http://' + self.server.host
+        self.browser = AsyncDashboardBrowser(max_concurrency=4)
+        self.browser.browser.get_context_route_url = \
+            lambda route, org_id, network_id=None: \
+            base + '/' + str(org_id) + '/n/' + str(network_id) + \
+            '/manage' + route
+        SlowHandler.max_in_flight = 0
+        self.loop = asyncio.new_event_loop()
+
+    def test_scrape_json_bounded_concurrency(self):
+        """Many routes are fetched at once but never more than the limit."""
+        network_ids = ['N_' + str(i) for i in range(12)]
+        jobs = [self.browser.scrape_json('/configure/settings', 1, net_id)
+                for net_id in network_ids]
+        results = self.gather(*jobs)
+        self.assertEqual(results[3],
+                         {'path': '/1/n/N_3/manage/configure/settings'})
+        self.assertGreater(SlowHandler.max_in_flight, 1)
+        self.assertLessEqual(SlowHandler.max_in_flight, 4)
+
+    def test_page_scraper(self):
+        """Page scrapers become coroutines that take org/network ids."""
+        dns_modes = self.gather(
+            self.browser.mx_get_client_vpn_dns_mode(1, 'N_1'),
+            self.browser.mx_get_client_vpn_dns_mode(1, 'N_2'))
+        self.assertEqual(dns_modes, ['Use Google Public DNS'] * 2)
+
+    def test_no_table_exporters(self):
+        """Org-wide table exports are not wrapped as per-network scrapers."""
+        self.assertFalse(hasattr(self.browser, 'get_client_table'))
+        self.assertFalse(hasattr(ScraperContext, 'get_switchport_table'))
+
+    def gather(self, *coroutines):
+        """Run coroutines concurrently in the test's loop."""
+        async def gather_all():
+            """Gather inside the running loop."""
+            return await asyncio.gather(*coroutines)
+        return self.loop.run_until_complete(gather_all())
+
+    def tearDown(self):
+        """Stop the loop, pool and server."""
+        self.loop.close()
+        self.browser.executor.shutdown()
+        self.server.close()
+
+
+class FakeLoginBrowser:
+    """Accepts one password, without TFA."""
+
+    def __init__(self):
+        """Record the logins."""
+        self.logins = []
+
+    async def login(self, username, password):
+        """Succeed if the password is right."""
+        self.logins.append((username, password))
+        return 'auth_success' if password == 'pw' else 'auth_error'
+
+
+class TestLoginFromArgs(unittest.TestCase):
+    """Test logging command line tools in."""
+
+    def setUp(self):
+        """Make the loop login_from_args uses."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def test_login_from_args(self):
+        """A failed login exits; a successful one returns."""
+        browser = FakeLoginBrowser()
+        login_from_args(browser, {'--username': 'a@b.c', '--password': 'pw'})
+        with self.assertRaises(SystemExit):
+            login_from_args(browser, {'--username': 'a@b.c',
+                                      '--password': 'wrong'})
+        self.assertEqual(browser.logins, [('a@b.c', 'pw'),
+                                          ('a@b.c', 'wrong')])
+
+    def tearDown(self):
+        """Close the loop."""
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
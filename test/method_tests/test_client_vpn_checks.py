@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test the concurrent client vpn checks against a local HTTP server."""
+import threading
+import time
+import unittest
+
+from merlink.browsers.client_vpn import ClientVpnBrowser, get_probe_errors
+from merlink.vpn.ike_probe import ProbeResult
+from test.method_tests.local_server import LocalServer, QuietHandler
+
+STATUS_PAGE = b'''<script>Mkiconf.status = {"request_ip":"1.2.3.4",
+"uplinks":[{"public_ip":"5.6.7.8","status#":0}],
+"dynamic_dns_enabled":false,"dynamic_dns_name":"fw.example.com"};</script>'''
+FIREWALL_PAGE = b'''<script>Mkiconf.rules = {"port_forwarding_settings":
+[{"ip":"10.0.0.1","proto":"udp","public_port":"4500"}]};</script>'''
+
+
+class PageHandler(QuietHandler):
+    """Serve the status and firewall pages, counting requests per path."""
+    lock = threading.Lock()
+    requests = {}
+    delays = {}
+    pages = {}
+
+    def do_GET(self):
+        """Send a page after its delay, or a 404."""
+        route = self.path[self.path.index('/manage') + len('/manage'):]
+        with PageHandler.lock:
+            PageHandler.requests[route] = \
+                PageHandler.requests.get(route, 0) + 1
+        time.sleep(PageHandler.delays.get(route, 0))
+        body = PageHandler.pages.get(route)
+        self.send_response(200 if body else 404)
+        body = body or b'Not found'
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestClientVpnChecks(unittest.TestCase):
+    """Test run_client_vpn_checks."""
+
+    def setUp(self):
+        """Start a local server and point the browser's URLs at it."""
+        self.server = LocalServer(PageHandler)
+        base = 'http://' + self.server.host
+        PageHandler.requests = {}
+        PageHandler.delays = {'/nodes/new_wired_status': 0.05,
+                              '/configure/firewall': 0.3}
+        PageHandler.pages = {'/nodes/new_wired_status': STATUS_PAGE,
+                             '/configure/firewall': FIREWALL_PAGE}
+        self.browser = ClientVpnBrowser()
+        self.browser.get_context_route_url = \
+            lambda route, org_id, network_id=None: \
+            base + '/' + str(org_id) + '/n/' + str(network_id) + \
+            '/manage' + route
+        self.probed = []
+
+    def probe(self, address):
+        """Record when an address was probed and say it answered."""
+        self.probed.append((address, time.perf_counter()))
+        return [], {}
+
+    def test_structured_results(self):
+        """Each check reports its errors and what it found."""
+        results = self.browser.run_client_vpn_checks(1, 'N_1', self.probe)
+        self.assertEqual([result.name for result in results],
+                         ['firewall_status', 'nat_rules', 'connectivity'])
+        status, nat, connectivity = results
+        self.assertTrue(status.passed)
+        self.assertEqual(status.details['firewall_ip'], '5.6.7.8')
+        self.assertEqual(nat.errors, ["ERROR: You are port forwarding "
+                                      "IPSEC udp ports 500 and 4500!"])
+        self.assertTrue(connectivity.passed)
+        self.assertEqual(connectivity.details['address'], '5.6.7.8')
+
+    def test_pages_fetched_once_and_probe_overlaps(self):
+        """The probe starts before the slow firewall page has arrived."""
+        started_at = time.perf_counter()
+        results = self.browser.run_client_vpn_checks(1, 'N_1', self.probe)
+        self.assertEqual(PageHandler.requests,
+                         {'/nodes/new_wired_status': 1,
+                          '/configure/firewall': 1})
+        self.assertEqual(self.probed[0][0], '5.6.7.8')
+        self.assertLess(self.probed[0][1] - started_at, 0.25)
+        # The pages are fetched together rather than one after another.
+        self.assertLess(max(result.seconds for result in results), 0.34)
+
+    def test_failed_page(self):
+        """A page that can't be opened fails the checks that need it."""
+        del PageHandler.pages['/nodes/new_wired_status']
+        status, nat, connectivity = self.browser.run_client_vpn_checks(
+            1, 'N_1', self.probe)
+        self.assertIn('Could not open', status.errors[0])
+        self.assertFalse(connectivity.passed)
+        self.assertEqual(len(nat.errors), 1)
+        self.assertEqual(self.probed, [])
+
+    def tearDown(self):
+        """Stop the server."""
+        self.server.close()
+
+
+class TestProbeErrors(unittest.TestCase):
+    """Test get_probe_errors."""
+
+    def get_errors(self, received=0, refused=0):
+        """Return the errors of udp 500 and 4500 probes of 3 each."""
+        results = [ProbeResult('5.6.7.8', port) for port in (500, 4500)]
+        for result in results:
+            result.sent = 3
+        results[0].rtts = [0.01] * received
+        results[1].refused = refused
+        errors, details = get_probe_errors('5.6.7.8', results)
+        self.assertEqual(sorted(details), [500, 4500])
+        return errors
+
+    def test_probe_errors(self):
+        """An answer passes; refused and silent ports are told apart."""
+        self.assertEqual(self.get_errors(received=1, refused=3), [])
+        self.assertEqual(self.get_errors(refused=3), [
+            "ERROR: Firewall refuses IPSEC udp port 4500!"])
+        self.assertEqual(self.get_errors(), [
+            "ERROR: Firewall does not answer IKE on IPSEC udp ports 500 "
+            "or 4500!"])
+
+
+if __name__ == '__main__':
+    unittest.main()
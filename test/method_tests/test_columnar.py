@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test columnar tables and their aggregations."""
+import json
+import re
+import unittest
+
+from merlink.browsers.columnar import (
+    BOOL, FLOAT, INT, PORT_COLUMNS, STRING, ColumnTable, ports_per_vlan)
+from merlink.browsers.dashboard import DashboardBrowser
+from test.method_tests.local_server import LocalServer, QuietHandler
+
+SCHEMA = (('network_id', STRING, 'network_id'),
+          ('model', STRING, 'model'),
+          ('vlan', INT, 'vlan'),
+          ('usage', FLOAT, 'usage'),
+          ('enabled', BOOL, 'enabled'))
+ROWS = [
+    {'model': 'MR42', 'vlan': 1, 'usage': 1.5, 'enabled': True},
+    {'model': 'MS220', 'vlan': '10', 'usage': 2, 'enabled': 'false'},
+    {'model': 'MR42', 'vlan': None, 'enabled': None, 'extra': 'ignored'},
+    {'model': 7, 'vlan': 'trunk', 'usage': 'n/a', 'enabled': 'maybe'},
+]
+PORTS = [{'serial': 'Q2XX-0001', 'num': str(port), 'enabled': True,
+          'type': 'access', 'vlan': 10 if port % 2 else 20}
+         for port in range(1, 9)]
+
+
+class TestColumnTable(unittest.TestCase):
+    """Test typed columns, missing values and counts."""
+
+    def setUp(self):
+        """Load ROWS for two networks."""
+        self.table = ColumnTable(SCHEMA)
+        self.assertEqual(self.table.extend(ROWS[:2], network_id='N_1'), 2)
+        self.assertEqual(self.table.extend_stream(
+            iter(ROWS[2:]), batch_rows=1, network_id='N_2'), 2)
+
+    def test_rows(self):
+        """Values are converted to column types; bad ones are missing."""
+        self.assertEqual(len(self.table), 4)
+        self.assertEqual(self.table.get_row(1), {
+            'network_id': 'N_1', 'model': 'MS220', 'vlan': 10,
+            'usage': 2.0, 'enabled': False})
+        self.assertEqual(self.table.get_row(3), {
+            'network_id': 'N_2', 'model': '7', 'vlan': None,
+            'usage': None, 'enabled': None})
+        self.assertEqual(self.table['model'].values, ['MR42', 'MS220', '7'])
+        self.assertEqual(list(self.table['model'].codes), [0, 1, 0, 2])
+
+    def test_count_by(self):
+        """Counts are by decoded value; missing values count as None."""
+        self.assertEqual(self.table.count_by('network_id'),
+                         {'N_1': 2, 'N_2': 2})
+        self.assertEqual(self.table.count_by('vlan'),
+                         {1: 1, 10: 1, None: 2})
+        self.assertEqual(self.table.count_by('usage'),
+                         {1.5: 1, 2.0: 1, None: 2})
+        self.assertEqual(self.table.count_by('network_id', 'model'), {
+            ('N_1', 'MR42'): 1, ('N_1', 'MS220'): 1,
+            ('N_2', 'MR42'): 1, ('N_2', '7'): 1})
+        self.assertEqual(ColumnTable(SCHEMA).count_by('model'), {})
+
+    def test_unhashable_values(self):
+        """Lists in a string column are stored as their str()."""
+        table = ColumnTable((('vlans', STRING, 'vlans'),))
+        table.extend([{'vlans': [1, 2]}, {'vlans': '1,2'}])
+        self.assertEqual(table.count_by('vlans'), {'[1, 2]': 1, '1,2': 1})
+
+
+NODE_GROUPS = {
+    'N_1': {'n': 'Net', 't': 'Net', 'network_type': 'switch'},
+    'N_2': {'n': 'Net 2', 't': 'Net-2', 'network_type': 'switch'},
+    'N_3': {'n': 'Net 3', 't': 'Net-3', 'network_type': 'wired'}}
+
+
+PORTS_PATH_PATTERN = re.compile(
+    r'^/([^/]+)/n/([^/]+)/manage/nodes/ports_json$')
+
+
+class PortsHandler(QuietHandler):
+    """Serve PORTS as ports_json at each network's own URL."""
+
+    def do_GET(self):
+        """Send the ports, or a 404 if the network's name is wrong."""
+        match = PORTS_PATH_PATTERN.match(self.path)
+        if not match or NODE_GROUPS.get(match.group(2), {}).get('t') != \
+                match.group(1):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps(PORTS).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestTableScrapers(unittest.TestCase):
+    """Test exporting a route from several networks."""
+
+    def setUp(self):
+        """Start a local server and point a browser at it."""
+        self.server = LocalServer(PortsHandler)
+        base = 'http://' + self.server.host
+        self.browser = DashboardBrowser()
+        self.browser.mechsoup.open_fake_page(
+            '', url=base + '/Net/n/N_1/manage/configure/general')
+        self.browser.orgs_dict = {'1': {'name': 'Org',
+                                        'node_groups': NODE_GROUPS}}
+        # As get_context_route_url, with the local server as the shard.
+        self.browser.get_context_route_url = \
+            lambda route, org_id, network_id=None: \
+            base + '/' + NODE_GROUPS[network_id]['t'] + '/n/' + \
+            network_id + '/manage' + route
+        self.browser.active_org_id = '1'
+        self.browser.active_network_id = 'N_1'
+
+    def test_switchport_table(self):
+        """Every switch network's ports end up in one table."""
+        table = self.browser.get_switchport_table()
+        self.assertEqual(table.schema, PORT_COLUMNS)
+        self.assertEqual(table.count_by('network_id'), {'N_1': 8, 'N_2': 8})
+        self.assertEqual(ports_per_vlan(table), {10: 8, 20: 8})
+
+    def tearDown(self):
+        """Stop the server."""
+        self.server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
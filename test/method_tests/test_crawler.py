@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test the org-wide JSON route crawler."""
+import asyncio
+import io
+import json
+import unittest
+
+from merlink.browsers.crawler import crawl, get_route_jobs
+from merlink.browsers.pages.json_url_routes import routes
+
+ORGS_DICT = {
+    '1': {
+        'node_groups': {
+            'N_mx': {'n': 'HQ - appliance', 'network_type': 'wired',
+                     'is_config_template': False},
+            'N_ms': {'n': 'HQ - switch', 'network_type': 'switch',
+                     'is_config_template': False},
+            'N_tpl': {'n': 'Template', 'network_type': 'wired',
+                      'is_config_template': True},
+        }
+    }
+}
+
+
+class FakeBrowser:
+    """Answers scrape_json with the route, failing for one route."""
+    max_concurrency = 3
+    orgs_dict = ORGS_DICT
+
+    async def set_org_id(self, org_id):
+        """Org is already loaded."""
+        return self.orgs_dict[org_id]
+
+    @staticmethod
+    async def scrape_json(route, org_id, network_id=None):
+        """Echo the request back or raise for the l3 topology route."""
+        if route == '/l3_topology/show':
+            raise LookupError
+        return {'route': route, 'org_id': org_id, 'network_id': network_id}
+
+
+class TestCrawler(unittest.TestCase):
+    """Test job generation and JSONL streaming."""
+
+    def test_route_jobs(self):
+        """Only applicable groups are crawled; templates are skipped."""
+        jobs = list(get_route_jobs(ORGS_DICT, ['1']))
+        network_ids = set(job[1] for job in jobs)
+        self.assertEqual(network_ids, {None, 'N_mx', 'N_ms'})
+        mx_keys = [job[2] for job in jobs if job[1] == 'N_mx']
+        self.assertIn('mx.dhcp_subnet', mx_keys)
+        self.assertNotIn('ms.switchports', mx_keys)
+        org_routes = [job[3] for job in jobs if job[1] is None]
+        self.assertEqual(org_routes, [routes['org']['administered_orgs']])
+
+    def test_route_job_filters(self):
+        """Network type, name and group filters narrow the jobs."""
+        jobs = list(get_route_jobs(ORGS_DICT, ['1'], network_name='switch',
+                                   groups=['ms']))
+        self.assertEqual(len(jobs), len(routes['ms']))
+        self.assertTrue(all(job[1] == 'N_ms' for job in jobs))
+        jobs = list(get_route_jobs(ORGS_DICT, ['1'], network_types=['wired'],
+                                   groups=['ms']))
+        self.assertEqual(jobs, [])
+
+    def test_crawl_streams_jsonl(self):
+        """Every job becomes one JSON line with its status attached."""
+        output = io.StringIO()
+        loop = asyncio.new_event_loop()
+        status_counts = loop.run_until_complete(
+            crawl(FakeBrowser(), output=output, groups=['netwide', 'mx']))
+        loop.close()
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        expected_jobs = len(routes['netwide']) * 2 + len(routes['mx'])
+        self.assertEqual(len(lines), expected_jobs)
+        self.assertEqual(status_counts, {'ok': expected_jobs - 2,
+                                         'LookupError': 2})
+        record = next(line for line in lines
+                      if line['route_key'] == 'mx.dhcp_subnet')
+        self.assertEqual(record['network_id'], 'N_mx')
+        self.assertEqual(record['data']['route'], '/nodes/dhcp_subnet_json')
+        self.assertIn('elapsed', record)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test the IKE/NAT-T probes against a local UDP responder."""
+import asyncio
+import socket
+import struct
+import threading
+import time
+import unittest
+
+from merlink.vpn.ike_probe import ICMP, IKE_PORT, NAT_T_PORT, \
+    NON_ESP_MARKER, ProbeResult, get_checksum, get_icmp_key, \
+    get_ike_key, get_ike_sa_init, get_main_mode, get_probe, probe_target, \
+    probe_targets
+
+
+class UdpResponder:
+    """Answer IKE_SA_INIT probes like a responder, from a thread.
+
+    Attributes:
+        sock (socket): Bound UDP socket.
+        port (int): Port it is bound to.
+        delay (float): Seconds to wait before answering.
+        drop_every (int): Answer only probes whose number isn't a multiple
+            of this (0 to answer every probe).
+        received (list): Probes received, as they were received.
+
+    """
+
+    def __init__(self, delay=0.0, drop_every=0):
+        """Bind to a free local port and start answering."""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(0.1)
+        self.port = self.sock.getsockname()[1]
+        self.delay = delay
+        self.drop_every = drop_every
+        self.received = []
+        self.is_running = True
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def serve(self):
+        """Answer with an IKE header that echoes the initiator SPI."""
+        while self.is_running:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            self.received.append(data)
+            if self.drop_every and \
+                    len(self.received) % self.drop_every == 0:
+                continue
+            marker = data[:4] if data[:4] == NON_ESP_MARKER else b''
+            spi = data[len(marker):len(marker) + 8]
+            time.sleep(self.delay)
+            self.sock.sendto(marker + struct.pack(
+                '!8s8sBBBBII', spi, b'r' * 8, 0, 0x20, 34, 0x20, 0, 28),
+                addr)
+
+    def close(self):
+        """Stop answering and close the socket."""
+        self.is_running = False
+        self.thread.join()
+        self.sock.close()
+
+
+class TestIkeProbe(unittest.TestCase):
+    """Test probe_target and probe_targets."""
+
+    def setUp(self):
+        """Make an event loop for the test."""
+        self.loop = asyncio.new_event_loop()
+        self.responders = []
+
+    def start_responder(self, **kwargs):
+        """Start a responder that is closed at the end of the test."""
+        responder = UdpResponder(**kwargs)
+        self.responders.append(responder)
+        return responder
+
+    def test_ike_sa_init(self):
+        """Probes have a valid IKEv2 header and their own SPI."""
+        probe = get_ike_sa_init(b'\x01' * 8)
+        spi_i, spi_r, next_payload, version, exchange, flags, message_id, \
+            length = struct.unpack('!8s8sBBBBII', probe[:28])
+        self.assertEqual((spi_i, spi_r), (b'\x01' * 8, b'\x00' * 8))
+        self.assertEqual((next_payload, version, exchange, flags),
+                         (33, 0x20, 34, 0x08))
+        self.assertEqual((message_id, length), (0, len(probe)))
+
+    def test_main_mode(self):
+        """Port 500 probes are IKEv1 Main Mode SA proposals."""
+        probe = get_probe(b'\x03' * 8, IKE_PORT, 0)
+        self.assertEqual(probe, get_main_mode(b'\x03' * 8))
+        cookie_i, cookie_r, next_payload, version, exchange, flags, \
+            message_id, length = struct.unpack('!8s8sBBBBII', probe[:28])
+        self.assertEqual((cookie_i, cookie_r), (b'\x03' * 8, b'\x00' * 8))
+        self.assertEqual((next_payload, version, exchange, flags),
+                         (1, 0x10, 2, 0))
+        self.assertEqual((message_id, length), (0, len(probe)))
+        # SA payload (DOI IPsec) -> one ISAKMP proposal -> its transforms
+        _, _, sa_length, doi, situation = struct.unpack(
+            '!BBHII', probe[28:40])
+        self.assertEqual((28 + sa_length, doi, situation),
+                         (len(probe), 1, 1))
+        _, _, proposal_length, _, protocol, spi_size, transform_count = \
+            struct.unpack('!BBHBBBB', probe[40:48])
+        self.assertEqual((40 + proposal_length, protocol, spi_size),
+                         (len(probe), 1, 0))
+        offset, transforms = 48, 0
+        while offset < len(probe):
+            next_transform, _, transform_length = struct.unpack(
+                '!BBH', probe[offset:offset + 4])
+            offset += transform_length
+            transforms += 1
+            self.assertEqual(next_transform, 0 if offset == len(probe)
+                             else 3)
+        self.assertEqual((offset, transforms),
+                         (len(probe), transform_count))
+        # NAT-T probes stay IKEv2.
+        self.assertEqual(get_probe(b'\x03' * 8, NAT_T_PORT, 0)[21], 0x20)
+
+    def test_answered_probes(self):
+        """Every answered probe has an RTT and loss is 0."""
+        responder = self.start_responder(delay=0.02)
+        result = self.loop.run_until_complete(probe_target(
+            '127.0.0.1', responder.port, count=4, timeout=1.0,
+            interval=0.01))
+        self.assertEqual((result.sent, result.received, result.loss),
+                         (4, 4, 0))
+        self.assertGreaterEqual(result.rtt_min, 0.02)
+        self.assertLess(result.rtt_p95, 0.5)
+        self.assertLessEqual(result.rtt_min, result.rtt_avg)
+        self.assertLessEqual(result.rtt_avg, result.rtt_p95)
+        self.assertEqual(len(set(probe[:8] for probe in
+                                 responder.received)), 4)
+
+    def test_loss_and_timeout(self):
+        """Unanswered probes count as loss once their timeout is up."""
+        responder = self.start_responder(drop_every=2)
+        started_at = time.perf_counter()
+        result = self.loop.run_until_complete(probe_target(
+            '127.0.0.1', responder.port, count=4, timeout=0.2,
+            interval=0.01))
+        self.assertLess(time.perf_counter() - started_at, 0.5)
+        self.assertEqual((result.sent, result.received), (4, 2))
+        self.assertEqual(result.loss, 0.5)
+
+    def test_refused(self):
+        """A closed port answers with ICMP port unreachable."""
+        closed = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        closed.bind(('127.0.0.1', 0))
+        port = closed.getsockname()[1]
+        closed.close()
+        result = self.loop.run_until_complete(probe_target(
+            '127.0.0.1', port, count=2, timeout=0.3))
+        self.assertEqual(result.received, 0)
+        self.assertEqual(result.refused, 2)
+
+    def test_many_targets(self):
+        """Targets are probed concurrently, results in their order."""
+        responders = [self.start_responder(delay=0.1) for _ in range(3)]
+        started_at = time.perf_counter()
+        results = self.loop.run_until_complete(probe_targets(
+            ['127.0.0.1', 'localhost'],
+            ports=[responder.port for responder in responders],
+            count=2, timeout=1.0))
+        self.assertLess(time.perf_counter() - started_at, 0.6)
+        self.assertEqual([(result.address, result.port)
+                          for result in results],
+                         [(address, responder.port)
+                          for address in ('127.0.0.1', 'localhost')
+                          for responder in responders])
+        self.assertTrue(all(result.loss == 0 for result in results))
+
+    def test_probe_keys(self):
+        """Answers are matched to probes by SPI, after any NAT-T marker."""
+        key = b'\x02' * 8
+        self.assertEqual(get_ike_key(get_probe(key, IKE_PORT, 0)), key)
+        nat_t_probe = get_probe(key, NAT_T_PORT, 0)
+        self.assertEqual(nat_t_probe[:4], NON_ESP_MARKER)
+        self.assertEqual(get_ike_key(nat_t_probe), key)
+        echo = get_probe(key, ICMP, 3)
+        self.assertEqual(get_checksum(echo), 0)
+        reply = b'\x00' + echo[1:]
+        self.assertEqual(get_icmp_key(reply), key)
+        self.assertIsNone(get_icmp_key(echo))  # Our own request
+
+    def test_unresolvable(self):
+        """A name that does not resolve is reported, not raised."""
+        result = self.loop.run_until_complete(probe_target(
+            'nonexistent.invalid', 500, count=1, timeout=0.1))
+        self.assertEqual(result.sent, 0)
+        self.assertEqual(result.loss, 1.0)
+        self.assertTrue(result.error)
+
+    def test_statistics(self):
+        """p95 is the nearest-rank percentile."""
+        result = ProbeResult('127.0.0.1', 500)
+        result.sent = 20
+        result.rtts = [i / 1000 for i in range(1, 20)]
+        self.assertEqual(result.rtt_p95, 0.019)
+        self.assertEqual(result.rtt_min, 0.001)
+        self.assertAlmostEqual(result.loss, 0.05)
+
+    def tearDown(self):
+        """Close responders and the loop."""
+        for responder in self.responders:
+            responder.close()
+        self.loop.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
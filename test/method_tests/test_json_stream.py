@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test streaming JSON decoding."""
+import json
+import tracemalloc
+import unittest
+
+from merlink.browsers.dashboard import DashboardBrowser
+from merlink.browsers.json_stream import iter_json_items
+from test.method_tests.local_server import LocalServer, QuietHandler
+
+ORGS = {
+    '1': {'name': 'Acmé "East"', 'node_groups': {
+        'N_1': {'n': 'Austin', 'tags': [1, 2.5, None, True, False]}}},
+    '2': {'name': 'West', 'node_groups': {}},
+    '3': 12345,
+}
+
+
+def split(text, size):
+    """Return the UTF-8 bytes of text in chunks of size bytes."""
+    body = text.encode('utf-8')
+    return [body[index:index + size] for index in range(0, len(body), size)]
+
+
+class TestIterJsonItems(unittest.TestCase):
+    """Test that streamed items equal json.loads for any chunking."""
+
+    def test_chunk_sizes(self):
+        """Chunks may split keys, numbers, escapes and UTF-8 chars."""
+        text = json.dumps(ORGS, ensure_ascii=False, indent=1)
+        for size in (1, 2, 3, 5, 64, 4096):
+            self.assertEqual(dict(iter_json_items(split(text, size))), ORGS)
+            self.assertEqual(
+                dict(iter_json_items(split(text, size),
+                                     ('1', 'node_groups'))),
+                ORGS['1']['node_groups'])
+            self.assertEqual(
+                list(iter_json_items(split(text, size),
+                                     ('1', 'node_groups', 'N_1', 'tags'))),
+                list(enumerate(ORGS['1']['node_groups']['N_1']['tags'])))
+
+    def test_empty_and_errors(self):
+        """Empty containers yield nothing; bad paths/documents raise."""
+        self.assertEqual(list(iter_json_items(['{ }'])), [])
+        self.assertEqual(list(iter_json_items(['[', ']'])), [])
+        with self.assertRaises(KeyError):
+            list(iter_json_items([json.dumps(ORGS)], ('4',)))
+        with self.assertRaises(ValueError):
+            list(iter_json_items(['{"1": [1, 2}']))
+        with self.assertRaises(ValueError):
+            list(iter_json_items([json.dumps(ORGS)], ('3',)))
+
+    def test_memory(self):
+        """Peak memory is a fraction of decoding the whole document."""
+        rows = [{'mac': '00:18:0a:%06x' % index, 'model': 'MR42',
+                 'serial': 'Q2XX-%08d' % index, 'ports': list(range(8))}
+                for index in range(20000)]
+        text = json.dumps(rows)
+        chunks = split(text, 64 * 1024)
+        del rows
+        tracemalloc.start()
+        json.loads(b''.join(chunks))
+        full_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        tracemalloc.start()
+        num_rows = sum(1 for _ in iter_json_items(chunks))
+        stream_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assertEqual(num_rows, 20000)
+        self.assertLess(stream_peak * 10, full_peak)
+
+
+class JsonHandler(QuietHandler):
+    """Serve ORGS in small chunked-encoding pieces."""
+
+    def do_GET(self):
+        """Send the body in 7-byte chunks."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in split(json.dumps(ORGS), 7):
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class TestBrowserIterJson(unittest.TestCase):
+    """Test streaming a route through the browser's transport."""
+
+    def setUp(self):
+        """Start a local server and point a browser at it."""
+        self.server = LocalServer(JsonHandler)
+        self.browser = DashboardBrowser()
+        self.browser.mechsoup.open_fake_page('', url='http://' + (
+            self.server.host + '/Org/n/abc/manage/configure/general'))
+
+    def test_iter_json(self):
+        """Items are streamed from the response."""
+        self.assertEqual(
+            dict(self.browser.iter_json('/organization/administered_orgs')),
+            ORGS)
+        self.assertEqual(
+            dict(self.browser.iter_json('/organization/administered_orgs',
+                                        ('1', 'node_groups'))),
+            ORGS['1']['node_groups'])
+
+    def tearDown(self):
+        """Stop the server."""
+        self.server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
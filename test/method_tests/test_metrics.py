@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test per-route request metrics."""
+import json
+import unittest
+
+from merlink.browsers.metrics import Histogram, RequestMetrics
+from merlink.browsers.response_cache import ResponseCache
+from merlink.browsers.transport import DashboardTransport
+from test.method_tests.local_server import LocalServer, QuietHandler
+
+BODY = b'{"ok": true}'
+
+
+class RedirectHandler(QuietHandler):
+    """Redirect /old routes to /new and serve a JSON body otherwise."""
+
+    def do_GET(self):
+        """Send a redirect or the body."""
+        if '/old' in self.path:
+            self.send_response(302)
+            self.send_header('Location', self.path.replace('/old', '/new'))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+
+class TestMetrics(unittest.TestCase):
+    """Test recording, querying and exporting metrics."""
+
+    def setUp(self):
+        """Start a local server."""
+        self.server = LocalServer(RedirectHandler)
+        self.host = self.server.host
+        self.base_url = 'http://' + self.host + '/Net/n/abc/manage'
+
+    def test_histogram_quantiles(self):
+        """Quantiles are interpolated within buckets."""
+        histogram = Histogram((1.0, 2.0))
+        for value in (0.5, 1.5, 1.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [1, 2, 1])
+        self.assertEqual(histogram.get_quantile(0.5), 1.5)
+        self.assertEqual(histogram.get_quantile(1.0), 3.0)
+        self.assertEqual(histogram.get_cumulative_counts()[-1],
+                         (float('inf'), 4))
+
+    def test_transport_metrics(self):
+        """Latency, bytes, redirects and cache results are per route."""
+        cache = ResponseCache(':memory:', iterations=1)
+        cache.set_account('admin@example.com', 'pw')
+        transport = DashboardTransport(cache=cache)
+        for _ in range(2):
+            transport.get(self.base_url + '/usage/list?t=1')
+        transport.get(self.base_url + '/old')
+        transport.metrics.observe_parse(self.base_url + '/usage/list', 0.2)
+
+        stats = transport.metrics.get_route_stats(self.host, '/usage/list')
+        self.assertEqual(stats['latency']['count'], 2)
+        self.assertEqual(stats['bytes'], 2 * len(BODY))
+        self.assertEqual(stats['cache']['miss'], 1)
+        self.assertEqual(stats['cache']['hit'], 1)
+        self.assertEqual(stats['parse']['count'], 1)
+        old_stats = transport.metrics.get_route_stats(self.host, '/old')
+        self.assertEqual(old_stats['redirects'], 1)
+
+        snapshot = json.loads(json.dumps(transport.metrics.get_snapshot()))
+        self.assertEqual(len(snapshot['routes']), 2)
+        prometheus = transport.metrics.to_prometheus()
+        labels = '{host="' + self.host + '",route="/usage/list"'
+        self.assertIn('merlink_request_seconds_count' + labels + '} 2',
+                      prometheus)
+        self.assertIn('merlink_request_seconds_bucket' + labels +
+                      ',le="+Inf"} 2', prometheus)
+        self.assertIn('merlink_cache_requests_total' + labels +
+                      ',result="hit"} 1', prometheus)
+
+    def test_shared_metrics(self):
+        """Transports can share one RequestMetrics."""
+        metrics = RequestMetrics()
+        for _ in range(2):
+            DashboardTransport(metrics=metrics).get(self.base_url + '/a')
+        self.assertEqual(
+            metrics.get_slowest_routes()[0][:2], (self.host, '/a'))
+        self.assertEqual(
+            metrics.get_route_stats(self.host, '/a')['cache']['uncached'], 2)
+
+    def tearDown(self):
+        """Stop the server."""
+        self.server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
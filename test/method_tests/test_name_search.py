@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test ranked name search."""
+import time
+import unittest
+
+from merlink.browsers.name_search import NameSearchIndex
+from merlink.browsers.org_index import OrgIndex
+
+
+class TestNameSearchIndex(unittest.TestCase):
+    """Test ranking, kind filters and typo tolerance."""
+
+    def setUp(self):
+        """Index a few names."""
+        self.index = NameSearchIndex([
+            ('N_1', 'Branch Office', 'wired'),
+            ('N_2', 'Branch', 'wired'),
+            ('N_3', 'Main Branch', 'wired'),
+            ('N_4', 'Outbranching', 'switch'),
+            ('N_5', 'Lobby', 'wireless'),
+        ])
+
+    def get_ids(self, *args, **kwargs):
+        """Return the ids of a search's results."""
+        return [result.item_id for result in
+                self.index.search(*args, **kwargs)]
+
+    def test_ranking(self):
+        """Exact > prefix > word prefix > substring."""
+        self.assertEqual(self.get_ids('branch'),
+                         ['N_2', 'N_1', 'N_3', 'N_4'])
+        self.assertEqual(self.get_ids('BRANCH', limit=2), ['N_2', 'N_1'])
+        self.assertEqual(self.get_ids('office'), ['N_1'])
+        self.assertEqual(self.get_ids('b'),
+                         ['N_2', 'N_1', 'N_3', 'N_5', 'N_4'])
+        self.assertEqual(self.get_ids('  '), [])
+
+    def test_kinds(self):
+        """Only names of the given kinds are returned."""
+        self.assertEqual(self.get_ids('branch', 'switch'), ['N_4'])
+        self.assertEqual(self.get_ids('b', ['wireless', 'switch']),
+                         ['N_5', 'N_4'])
+
+    def test_typos(self):
+        """Names with most of a query's trigrams match, below substrings."""
+        self.assertEqual(self.get_ids('brnch offce'), ['N_1'])
+        self.assertEqual(self.get_ids('lobbby'), ['N_5'])
+        self.assertEqual(self.get_ids('zzzz'), [])
+        results = self.index.search('main brnch')
+        self.assertEqual(results[0].item_id, 'N_3')
+        self.assertLess(results[0].score, 1)
+
+    def test_many_names(self):
+        """Searching 10k+ networks takes milliseconds."""
+        index = NameSearchIndex(
+            ('N_' + str(number), 'Store {} - {}'.format(number, city), 'wired')
+            for number in range(20000)
+            for city in ('Austin',))
+        start = time.perf_counter()
+        results = index.search('store 1234')
+        self.assertEqual(results[0].name, 'Store 1234 - Austin')
+        index.search('stroe 1234')
+        index.search('12')
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+
+class TestIndexSearch(unittest.TestCase):
+    """Test search through OrgIndex/NetworkIndex."""
+
+    def test_networks(self):
+        """Templates are left out of searches; find takes close matches."""
+        index = OrgIndex({1: {'name': 'Organization', 'node_groups': {
+            'N_1': {'n': 'Austin - appliance', 'network_type': 'wired'},
+            'N_2': {'n': 'Austin Template', 'network_type': 'wired',
+                    'is_config_template': True}}}})
+        networks = index.get_network_index(1)
+        self.assertEqual([result.name for result in
+                          networks.search_networks('austin')], ['Austin'])
+        self.assertEqual(networks.find_network_id('Austin - appliance'),
+                         'N_1')
+        self.assertEqual(networks.find_network_id('austn templ'), 'N_2')
+        self.assertEqual(index.find_org_id('organisation'), 1)
+        # Looser matches are listed by searches but not chosen by find.
+        self.assertEqual(len(networks.search_networks(
+            'austn tempel', include_templates=True)), 1)
+        self.assertIsNone(networks.find_network_id('austn tempel'))
+
+
+if __name__ == '__main__':
+    unittest.main()
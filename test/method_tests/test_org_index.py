@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test the org/network name indexes."""
+import unittest
+
+from merlink.browsers.dashboard import DashboardBrowser
+from merlink.browsers.org_index import OrgIndex
+
+
+def make_network(name, network_type, is_template=False):
+    """Return a node_groups entry like administered_orgs has."""
+    return {'n': name, 't': name.replace(' ', '-'),
+            'network_type': network_type, 'is_config_template': is_template}
+
+
+def make_orgs_dict():
+    """Return an orgs_dict with two orgs."""
+    return {
+        1: {'id': 1, 'name': 'Zeta Org', 'eid': 'z', 'shard_id': 1,
+            'node_groups': {
+                'N_1': make_network('Branch - appliance', 'wired'),
+                'N_2': make_network('Branch', 'switch'),
+                'N_3': make_network('Austin', 'wired'),
+                'N_4': make_network('Template', 'wired', is_template=True),
+                'N_5': make_network('Lobby', 'wireless'),
+            }},
+        2: {'id': 2, 'name': 'Alpha Org', 'eid': 'a', 'shard_id': 2,
+            'node_groups': {}},
+    }
+
+
+class TestOrgIndex(unittest.TestCase):
+    """Test lookups, ordering and invalidation."""
+
+    def setUp(self):
+        """Index a fresh orgs_dict."""
+        self.orgs_dict = make_orgs_dict()
+        self.index = OrgIndex(self.orgs_dict)
+
+    def test_org_lookups(self):
+        """Org names are sorted and found exactly, by prefix or by part."""
+        self.assertEqual(self.index.get_org_names(),
+                         ['Alpha Org', 'Zeta Org'])
+        self.assertEqual(self.index.find_org_id('zeta org'), 1)
+        self.assertEqual(self.index.find_org_id('Alph'), 2)
+        self.assertEqual(self.index.find_org_id('eta'), 1)
+        self.assertIsNone(self.index.find_org_id('Beta'))
+
+    def test_network_lookups(self):
+        """Names are bucketed by type and templates are left out."""
+        networks = self.index.get_network_index(1)
+        self.assertEqual(networks.get_network_names(['wired']),
+                         ['Austin', 'Branch'])
+        self.assertEqual(networks.get_network_names(),
+                         ['Austin', 'Branch', 'Branch', 'Lobby'])
+        self.assertEqual(networks.template_ids, {'N_4'})
+        self.assertEqual(networks.find_network_id('branch', 'switch'), 'N_2')
+        self.assertEqual(networks.find_network_id('Bra', ['wired']), 'N_1')
+        self.assertEqual(networks.find_network_id('obby'), 'N_5')
+        self.assertIsNone(networks.find_network_id('Lobby', ['wired']))
+
+    def test_incremental_invalidation(self):
+        """Only the org whose node_groups were replaced is reindexed."""
+        org_1_networks = self.index.get_network_index(1)
+        org_2_networks = self.index.get_network_index(2)
+        self.orgs_dict[2] = dict(self.orgs_dict[2], node_groups={
+            'N_9': make_network('Remote', 'wired')})
+        self.assertIs(self.index.get_network_index(1), org_1_networks)
+        self.assertIsNot(self.index.get_network_index(2), org_2_networks)
+        self.assertEqual(
+            self.index.get_network_index(2).get_network_names(), ['Remote'])
+
+    def test_browser_rebuilds_on_new_orgs_dict(self):
+        """The browser's index follows orgs_dict being replaced."""
+        browser = DashboardBrowser()
+        browser.orgs_dict = self.orgs_dict
+        browser.active_org_id = 1
+        self.assertEqual(browser.get_network_names(['wired']),
+                         ['Austin', 'Branch'])
+        browser.orgs_dict = {3: {'id': 3, 'name': 'New', 'node_groups': {}}}
+        self.assertEqual(browser.get_org_names(), ['New'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test per-org loading of node_groups."""
+import unittest
+
+from merlink.browsers.org_index import OrgIndex
+from merlink.browsers.org_loader import OrgLoader
+
+
+def get_administered_orgs(from_org):
+    """Return administered_orgs as requested from one org's pages."""
+    networks = {
+        '1': {'N_1': {'n': 'Austin', 'network_type': 'wired'}},
+        '2': {},  # An org without networks
+        '3': {'N_3': {'n': 'Berlin', 'network_type': 'wired'}},
+    }
+    return {org_id: {'id': org_id, 'name': 'Org ' + org_id,
+                     'node_groups': dict(networks[org_id])
+                     if org_id == from_org else {}}
+            for org_id in networks}
+
+
+class TestOrgLoader(unittest.TestCase):
+    """Test that each org is fetched once and others are kept."""
+
+    def setUp(self):
+        """Set up orgs_dict like org_data_setup does from org 1."""
+        self.loader = OrgLoader()
+        self.orgs_dict = {}
+        self.assertEqual(self.loader.merge(
+            self.orgs_dict, get_administered_orgs('1')), ['1'])
+
+    def test_load_once(self):
+        """Orgs are loaded once, even ones without networks."""
+        self.assertFalse(self.loader.needs_load(self.orgs_dict, '1'))
+        for org_id in ('2', '3'):
+            self.assertTrue(self.loader.needs_load(self.orgs_dict, org_id))
+            self.loader.merge(self.orgs_dict, get_administered_orgs(org_id),
+                              org_id)
+            self.assertFalse(self.loader.needs_load(self.orgs_dict, org_id))
+        # Loading org 3 did not wipe the networks of org 1.
+        self.assertEqual(list(self.orgs_dict['1']['node_groups']), ['N_1'])
+        self.assertEqual(list(self.orgs_dict['3']['node_groups']), ['N_3'])
+        with self.assertRaises(KeyError):
+            self.loader.merge(self.orgs_dict, get_administered_orgs('1'),
+                              '4')
+
+    def test_freshness(self):
+        """Orgs are fetched again when forgotten or older than max_age."""
+        self.loader.forget('1')
+        self.assertTrue(self.loader.needs_load(self.orgs_dict, '1'))
+        self.loader.merge(self.orgs_dict, get_administered_orgs('1'), '1')
+        self.assertFalse(self.loader.needs_load(self.orgs_dict, '1'))
+        self.loader.max_age = 60
+        self.loader.loaded_at['1'] -= 61
+        self.assertTrue(self.loader.needs_load(self.orgs_dict, '1'))
+        # Orgs with networks from elsewhere (i.e. a saved session) count.
+        self.assertFalse(OrgLoader().needs_load(self.orgs_dict, '1'))
+
+    def test_only_loaded_org_is_reindexed(self):
+        """Merging keeps orgs_dict and other orgs' network indexes."""
+        index = OrgIndex(self.orgs_dict)
+        org_1_networks = index.get_network_index('1')
+        self.loader.merge(self.orgs_dict, get_administered_orgs('3'), '3')
+        self.assertTrue(index.is_current(self.orgs_dict))
+        self.assertIs(index.get_network_index('1'), org_1_networks)
+        self.assertEqual(index.get_network_index('3').get_network_names(),
+                         ['Berlin'])
+
+
+if __name__ == '__main__':
+    unittest.main()
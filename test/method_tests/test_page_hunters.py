@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test the functions that hunt for text in dashboard pages."""
+import json
+import unittest
+
+from merlink.browsers.dashboard import DashboardBrowser
+from merlink.browsers.pages import page_hunters
+
+MKICONF_PAGE = '''<html><head><script>
+  Mkiconf.action_name = "new_wired_status";
+  Mkiconf.authenticity_token = "cW2Lk8G+9ZW5z1kDhJ0=";
+  Mkiconf.log_errors = false;
+  Mkiconf.node_id = 1234;
+  Mkiconf.features = {"vpn": true, "note": "a; b"};
+  Mkiconf.started_at = new Date();
+  if (Mkiconf.log_errors == true) { report(); }
+</script></head><body></body></html>'''
+
+WIRED_STATUS_PAGE = '''<script>
+  var status = {"request_ip": "1.2.3.4", "node": {"status#": 0,
+    "public_ip": "5.6.7.8", "dynamic_dns_enabled": false}};
+  var uplinks = [{"public_ip": "9.9.9.9"}];
+  var cb = {"dynamic_dns_name": getName()};
+</script>'''
+
+NETWORK_URL = 'https://n1.meraki.com/Combined/n/abc/manage'
+SIDE_NAV = {'tab_menu': {'tabs': [
+    {'name': 'Security appliance', 'menus': {
+        'Monitor': {'items': [
+            {'name': 'Appliance status',
+             'url': '/Combined/n/abc/manage/nodes/new_wired_status'}]},
+        'Configure': {'items': [
+            None,
+            {'name': 'Client VPN',
+             'url': '/Combined/n/abc/manage/configure/client_vpn_settings'},
+            {'name': 'Addressing & VLANs',
+             'url': '/Combined/n/abc/manage/configure/router_settings'}]}}},
+    {'name': 'Switch', 'menus': {
+        'Monitor': {'items': []},
+        'Configure': {'items': [
+            {'name': 'Switch settings',
+             'url': '/Combined/n/abc/manage/configure/switch_settings/'}]}}},
+    {'name': 'Cameras', 'menus': {
+        'Monitor': {'items': [
+            {'name': 'Cameras', 'url': '/Combined/n/abc/manage/video'}]}}},
+]}}
+SIDE_NAV_PAGE = ('<html><body><script>\nwindow.initializeSideNavigation(\n'
+                 '  document.getElementById("side_nav"),\n  ' +
+                 json.dumps(SIDE_NAV) + '\n);\n</script></body></html>')
+
+
+class TestMkiconf(unittest.TestCase):
+    """Test the Mkiconf scanner."""
+
+    def test_values_are_decoded(self):
+        """JSON values are decoded and JavaScript values are kept as text."""
+        self.assertEqual(page_hunters.get_pagetext_mkiconf(MKICONF_PAGE), {
+            'action_name': 'new_wired_status',
+            'authenticity_token': 'cW2Lk8G+9ZW5z1kDhJ0=',
+            'log_errors': False,
+            'node_id': 1234,
+            'features': {'vpn': True, 'note': 'a; b'},
+            'started_at': 'new Date()',
+        })
+
+    def test_scan_is_lazy(self):
+        """Vars are yielded in page order, one at a time."""
+        mkiconf_vars = page_hunters.iter_pagetext_mkiconf(MKICONF_PAGE)
+        self.assertEqual(next(mkiconf_vars),
+                         ('action_name', 'new_wired_status'))
+        self.assertEqual(next(mkiconf_vars)[0], 'authenticity_token')
+
+    def test_get_value(self):
+        """One var can be looked up and missing vars raise LookupError."""
+        self.assertEqual(page_hunters.get_pagetext_mkiconf_value(
+            MKICONF_PAGE, 'authenticity_token'), 'cW2Lk8G+9ZW5z1kDhJ0=')
+        with self.assertRaises(LookupError):
+            page_hunters.get_pagetext_mkiconf_value(MKICONF_PAGE, 'missing')
+
+
+class TestPageJsonIndex(unittest.TestCase):
+    """Test looking up keys of the JSON blobs in a page."""
+
+    def test_lookups(self):
+        """Keys map to decoded values of their first occurrence."""
+        index = page_hunters.PageJsonIndex(WIRED_STATUS_PAGE)
+        self.assertEqual(index.get('request_ip'), '1.2.3.4')
+        self.assertEqual(index.get('public_ip'), '5.6.7.8')
+        self.assertEqual(index.get('{"public_ip'), '9.9.9.9')
+        self.assertEqual(index.get('status#'), 0)
+        self.assertIs(index.get('dynamic_dns_enabled'), False)
+        self.assertEqual(index.get('dynamic_dns_name'), 'getName()')
+        self.assertEqual(index.get('missing'), -1)
+        self.assertIn('node', index)
+
+    def test_matches_one_off_lookup(self):
+        """The index agrees with get_pagetext_json_value."""
+        index = page_hunters.PageJsonIndex(WIRED_STATUS_PAGE)
+        for key in ('request_ip', 'public_ip', '{"public_ip', 'status#',
+                    'dynamic_dns_name', 'missing'):
+            self.assertEqual(index.get(key), page_hunters.
+                             get_pagetext_json_value(WIRED_STATUS_PAGE, key))
+
+
+class TestSideNavigation(unittest.TestCase):
+    """Test parsing and caching the side navigation."""
+
+    def test_links(self):
+        """Links are grouped by category and null items are skipped."""
+        links = page_hunters.get_pagetext_links(SIDE_NAV_PAGE)
+        self.assertEqual(sorted(links), ['Cameras', 'Security appliance',
+                                         'Switch'])
+        self.assertEqual(
+            links['Security appliance']['Client VPN'],
+            '/Combined/n/abc/manage/configure/client_vpn_settings')
+
+    def test_route_index(self):
+        """Routes resolve to URLs by category with one lookup."""
+        side_nav = page_hunters.SideNavigation(SIDE_NAV_PAGE)
+        self.assertEqual(
+            side_nav.get_url('/configure/switch_settings', 'Switch'),
+            '/Combined/n/abc/manage/configure/switch_settings/')
+        self.assertIsNone(
+            side_nav.get_url('/configure/switch_settings', 'Cameras'))
+        self.assertEqual(side_nav.get_categories('/configure/router_settings'),
+                         ['Security appliance'])
+        with self.assertRaises(LookupError):
+            page_hunters.SideNavigation('<html></html>')
+
+    def test_browser_caches_side_nav(self):
+        """The side nav is parsed once per network."""
+        browser = DashboardBrowser()
+        browser.pagetexts.add(NETWORK_URL + '/configure/general',
+                              SIDE_NAV_PAGE.encode())
+        browser.mechsoup.open_fake_page(
+            '', url=NETWORK_URL + '/configure/general')
+        self.assertEqual(browser.combined_network_redirect(
+            '/configure/client_vpn_settings', 'Security appliance'),
+            '/Combined/n/abc/manage/configure/client_vpn_settings')
+        # Another page of the same network uses the cached side nav.
+        browser.mechsoup.open_fake_page('', url=NETWORK_URL + '/usage/list')
+        self.assertEqual(browser.combined_network_redirect(
+            '/configure/switch_settings', 'Switch'),
+            '/Combined/n/abc/manage/configure/switch_settings/')
+        self.assertEqual(list(browser.side_navs),
+                         [('n1.meraki.com', 'n/abc')])
+
+
+if __name__ == '__main__':
+    unittest.main()
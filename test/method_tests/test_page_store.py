@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test the bounded page store."""
+import unittest
+
+from merlink.browsers.page_store import PageStore, PAGE_OVERHEAD_BYTES
+
+
+def make_page(var_value):
+    """Return an HTML page with one input and lots of padding."""
+    return ('<html><body><input id="var" value="' + var_value + '">' +
+            '<p>padding</p>' * 500 + '</body></html>').encode()
+
+
+class TestPageStore(unittest.TestCase):
+    """Test LRU eviction, compression and lazy soups."""
+
+    def test_lazy_soup(self):
+        """Soups are rebuilt from the stored body on access."""
+        store = PageStore()
+        store.add('https://n1.meraki.com/a', make_page('a'))
+        store.add('https://n1.meraki.com/b', make_page('b'))
+        self.assertIsNone(store.soup)
+        soup = store.get_soup('https://n1.meraki.com/a')
+        self.assertEqual(soup.find('input', {'id': 'var'})['value'], 'a')
+        self.assertIs(soup, store.get_soup('https://n1.meraki.com/a'))
+        self.assertEqual(store.get_body('https://n1.meraki.com/b'),
+                         make_page('b'))
+
+    def test_text(self):
+        """Bodies are decoded once with their charset and memoized."""
+        store = PageStore()
+        store.add('https://n1.meraki.com/a', 'caf\xe9'.encode('latin-1'),
+                  'latin-1')
+        text = store.get_text('https://n1.meraki.com/a')
+        self.assertEqual(text, 'caf\xe9')
+        self.assertIs(text, store.get_text('https://n1.meraki.com/a'))
+        store.add('https://n1.meraki.com/a', b'new')
+        self.assertEqual(store.get_text('https://n1.meraki.com/a'), 'new')
+
+    def test_json_index(self):
+        """A page's JSON index is built once and dropped with the page."""
+        store = PageStore()
+        store.add('https://n1.meraki.com/a', b'<script>x = {"ip": "1.2.3.4"}'
+                                             b';</script>')
+        index = store.get_json_index('https://n1.meraki.com/a')
+        self.assertEqual(index.get('ip'), '1.2.3.4')
+        self.assertIs(index, store.get_json_index('https://n1.meraki.com/a'))
+        store.remove('https://n1.meraki.com/a')
+        self.assertIsNone(store.json_index)
+
+    def test_compression(self):
+        """Compressed pages take less room than the raw body."""
+        store = PageStore()
+        store.add('url', make_page('a'))
+        self.assertLess(store.get_footprint(), len(make_page('a')))
+        raw_store = PageStore(compress=False)
+        raw_store.add('url', make_page('a'))
+        self.assertEqual(raw_store.get_footprint(),
+                         len(make_page('a')) + PAGE_OVERHEAD_BYTES)
+
+    def test_lru_eviction(self):
+        """The least recently used page is evicted when over budget."""
+        page_cost = len(make_page('0')) + PAGE_OVERHEAD_BYTES
+        store = PageStore(max_bytes=page_cost * 3, compress=False)
+        for i in range(3):
+            store.add('url' + str(i), make_page(str(i)))
+        store.get_body('url0')  # url1 is now the least recently used
+        store.add('url3', make_page('3'))
+        self.assertEqual(sorted(store.keys()), ['url0', 'url2', 'url3'])
+        self.assertLessEqual(store.get_footprint(), store.max_bytes)
+        for i in range(4, 100):
+            store.add('url' + str(i), make_page('x'))
+        self.assertEqual(len(store), 3)
+        self.assertLessEqual(store.get_footprint(), store.max_bytes)
+
+    def test_canonical_lookup(self):
+        """Renamed networks and dashboard URL junk find the same page."""
+        store = PageStore()
+        store.add('https://n1.meraki.com/Old-Name/n/abc/manage/usage/list',
+                  make_page('a'))
+        self.assertIn('https://N1.meraki.com/New-Name/n/abc/manage/usage/'
+                      'list/?only_path=false&protocol=https#', store)
+        self.assertNotIn('https://n1.meraki.com/Net/n/xyz/manage/usage/list',
+                         store)
+        self.assertEqual(store.keys(), [
+            'https://n1.meraki.com/Old-Name/n/abc/manage/usage/list'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test targeted (partial) page parsing."""
+import json
+import unittest
+
+import bs4
+
+from merlink.browsers.dashboard import DashboardBrowser
+from merlink.browsers.pages import page_utils
+from merlink.browsers.pages.page_hunters import SideNavigation
+from test.method_tests.local_server import LocalServer, QuietHandler
+
+PADDING = '<tr><td><input id="row" value="x"></td></tr>' * 2000
+PAGE = ('<html><body><table>' + PADDING + '</table>'
+        '<input id="wired_config_client_vpn_subnet" value="10.0.0.0/24">'
+        '<select id="wired_config_client_vpn_dns_mode">'
+        '<option value="google_dns" selected="selected">Use Google Public '
+        'DNS</option><option value="custom">Specify nameservers...</option>'
+        '</select><textarea id="wired_config_client_vpn_dns">\n10.0.0.2\n'
+        '10.0.0.3</textarea><table>' + PADDING + '</table></body></html>'
+        ).encode()
+
+
+class PageHandler(QuietHandler):
+    """Serve PAGE for every path."""
+
+    def do_GET(self):
+        """Send the page."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+
+class TestPartialPage(unittest.TestCase):
+    """Test that partial soups give the same answers as full ones."""
+
+    def test_same_values_as_full_parse(self):
+        """Every page_utils extractor works on a partial soup."""
+        full_soup = bs4.BeautifulSoup(PAGE, 'lxml')
+        partial_soup = page_utils.get_partial_page(
+            PAGE, ['wired_config_client_vpn_subnet',
+                   'wired_config_client_vpn_dns_mode',
+                   'wired_config_client_vpn_dns'])
+        for extractor, var_id in (
+                (page_utils.get_input_var_value,
+                 'wired_config_client_vpn_subnet'),
+                (page_utils.get_dropdown_value,
+                 'wired_config_client_vpn_dns_mode'),
+                (page_utils.get_all_dropdown_values,
+                 'wired_config_client_vpn_dns_mode'),
+                (page_utils.get_textarea_list,
+                 'wired_config_client_vpn_dns')):
+            self.assertEqual(extractor(partial_soup, var_id),
+                             extractor(full_soup, var_id))
+        self.assertIsNone(partial_soup.find('input', {'id': 'row'}))
+
+    def test_missing_element(self):
+        """Elements that aren't on the page are still a LookupError."""
+        partial_soup = page_utils.get_partial_page(PAGE, ['not_there'])
+        with self.assertRaises(LookupError):
+            page_utils.get_input_var_value(partial_soup, 'not_there')
+
+
+class TestTargetedScraper(unittest.TestCase):
+    """Test that parse=False routes are only parsed when needed."""
+
+    def setUp(self):
+        """Start a local server and point a browser at it."""
+        self.server = LocalServer(PageHandler)
+        self.browser = DashboardBrowser()
+        host = self.server.host
+        network_url = 'http://' + host + '/Net/n/abc/manage'
+        self.browser.mechsoup.open_fake_page(
+            '', url=network_url + '/configure/general')
+        side_nav = {'tab_menu': {'tabs': [{
+            'name': 'Security appliance', 'menus': {'Configure': {'items': [
+                {'name': 'Client VPN',
+                 'url': network_url + '/configure/client_vpn_settings'}]}}}]}}
+        self.browser.side_navs[(host, 'n/abc')] = SideNavigation(
+            'window.initializeSideNavigation(' + json.dumps(side_nav) + ')')
+
+    def test_scraper(self):
+        """mx scrapers read partial soups and get_page still works."""
+        self.assertEqual(self.browser.mx_get_client_vpn_dns_mode(),
+                         'Use Google Public DNS')
+        self.assertTrue(self.browser.unparsed_url.endswith(
+            '/configure/client_vpn_settings'))
+        page = self.browser.get_page()
+        self.assertIsNone(self.browser.unparsed_url)
+        self.assertEqual(len(page.find_all('input', {'id': 'row'})), 4000)
+
+    def test_route_snapshot(self):
+        """Every client VPN field costs one fetch and one parse in total."""
+        settings = self.browser.mx_get_client_vpn_settings()
+        self.assertEqual(settings.subnet, '10.0.0.0/24')
+        self.assertEqual(settings.nameservers, ['10.0.0.2', '10.0.0.3'])
+        self.assertIsNone(settings.secret)  # Not on this page
+        self.assertEqual(self.browser.mx_get_client_vpn_subnet(),
+                         '10.0.0.0/24')
+        self.assertEqual(self.browser.mx_get_client_vpn_dns_mode(),
+                         'Use Google Public DNS')
+        self.assertIs(self.browser.mx_get_client_vpn_settings(), settings)
+        stats = self.browser.transport.metrics.get_route_stats(
+            self.server.host,
+            '/configure/client_vpn_settings')
+        self.assertEqual(stats['latency']['count'], 1)
+        self.assertEqual(stats['parse']['count'], 1)
+
+    def tearDown(self):
+        """Stop the server."""
+        self.server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
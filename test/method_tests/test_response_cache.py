@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test the on-disk response cache through the dashboard transport."""
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from merlink.browsers.response_cache import ResponseCache, get_cache_key
+from merlink.browsers.transport import DashboardTransport
+from test.method_tests.local_server import LocalServer, QuietHandler
+
+
+class EtagHandler(QuietHandler):
+    """Serve a JSON body with an ETag and honor If-None-Match."""
+    full_responses = 0
+
+    def do_GET(self):
+        """Send 304 if the client has the current ETag, else the body."""
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        EtagHandler.full_responses += 1
+        body = b'{"wdc": {"client_vpn_enabled": true}}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', '"v1"')
+        self.send_header('Set-Cookie', 'dash_auth=secret')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test hits, TTL expiry, revalidation and persistence."""
+
+    def setUp(self):
+        """Start a local server and create a cache in a temp dir."""
+        self.server = LocalServer(EtagHandler)
+        self.url = 'http://' + self.server.host + \
+            '/Net/n/abc123/manage/nodes/new_wired_status'
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.cache_dir, 'cache.sqlite')
+        EtagHandler.full_responses = 0
+
+    def test_cache_key(self):
+        """Keys are (host, eid, route); non-routes are not cached."""
+        self.assertEqual(
+            get_cache_key('https://n1.meraki.com/Net/n/abc/manage/usage'),
+            ('n1.meraki.com', 'n/abc', '/usage'))
+        self.assertIsNone(
+            get_cache_key('https://account.meraki.com/login/logout'))
+
+    def test_hit_and_persistence(self):
+        """A second transport with the same file is served from disk."""
+        cache = ResponseCache(self.cache_path, iterations=1)
+        cache.set_account('admin@example.com', 'pw')
+        transport = DashboardTransport(cache=cache)
+        self.assertTrue(transport.get(self.url).json()['wdc'])
+        cache.close()
+
+        cache = ResponseCache(self.cache_path, iterations=1)
+        cache.set_account('admin@example.com', 'pw')
+        transport = DashboardTransport(cache=cache)
+        response = transport.get(self.url)
+        self.assertEqual(response.headers['X-Merlink-Cache'], 'hit')
+        self.assertNotIn('Set-Cookie', response.headers)
+        self.assertTrue(response.json()['wdc']['client_vpn_enabled'])
+        self.assertEqual(EtagHandler.full_responses, 1)
+        self.assertEqual(cache.stats['hits'], 1)
+        cache.close()
+
+    def test_revalidation(self):
+        """Expired entries are revalidated with If-None-Match."""
+        cache = ResponseCache(self.cache_path, iterations=1,
+                              route_ttls={'/nodes/new_wired_status': 0})
+        cache.set_account('admin@example.com', 'pw')
+        transport = DashboardTransport(cache=cache)
+        transport.get(self.url)
+        response = transport.get(self.url)
+        self.assertEqual(response.headers['X-Merlink-Cache'], 'revalidated')
+        self.assertEqual(EtagHandler.full_responses, 1)
+        self.assertEqual(cache.stats['misses'], 1)
+        self.assertEqual(cache.get_hit_ratio(), 0.5)
+        cache.close()
+
+    def test_stale_while_revalidate(self):
+        """Expired entries are served at once in stale mode."""
+        cache = ResponseCache(self.cache_path, iterations=1,
+                              route_ttls={'/nodes/new_wired_status': 0},
+                              stale_while_revalidate=True)
+        cache.set_account('admin@example.com', 'pw')
+        transport = DashboardTransport(cache=cache)
+        transport.get(self.url)
+        response = transport.get(self.url)
+        self.assertEqual(response.headers['X-Merlink-Cache'], 'stale')
+        self.assertEqual(cache.stats['stale'], 1)
+        # The entry is revalidated in the background.
+        for _ in range(50):
+            if cache.stats['revalidated']:
+                break
+            time.sleep(0.05)
+        self.assertEqual(cache.stats['revalidated'], 1)
+        cache.close()
+
+    def test_account_scope(self):
+        """Entries are only served to the account that stored them."""
+        cache = ResponseCache(self.cache_path, iterations=1)
+        transport = DashboardTransport(cache=cache)
+        transport.get(self.url)
+        self.assertEqual(cache.stats['stores'], 0)  # No one logged in
+        cache.set_account('admin@example.com', 'pw')
+        transport.get(self.url)
+        cache.set_account('other@example.com', 'pw')
+        response = transport.get(self.url)
+        self.assertNotIn('X-Merlink-Cache', response.headers)
+        cache.set_account('admin@example.com', 'pw')
+        response = transport.get(self.url)
+        self.assertEqual(response.headers['X-Merlink-Cache'], 'hit')
+        # Bodies are stored encrypted.
+        with sqlite3.connect(self.cache_path) as connection:
+            bodies = [row[0] for row in connection.execute(
+                'SELECT body FROM account_responses')]
+        self.assertEqual(len(bodies), 2)
+        self.assertFalse(any(b'client_vpn_enabled' in body
+                             for body in bodies))
+        cache.forget_account()
+        response = transport.get(self.url)
+        self.assertNotIn('X-Merlink-Cache', response.headers)
+        cache.set_account('admin@example.com', 'pw')
+        self.assertIsNone(cache.get(self.url))
+        cache.close()
+
+    def test_uncached_routes(self):
+        """Only listed routes are cached, never pages with tokens."""
+        cache = ResponseCache(':memory:', iterations=1,
+                              route_ttls={'/users/': 60}, default_ttl=60)
+        cache.set_account('admin@example.com', 'pw')
+        base = 'https://n1.meraki.com/Net/n/abc/manage'
+        self.assertIsNone(cache.get_key(base + '/users/edit'))
+        self.assertIsNone(cache.get_key(base + '/configure/settings'))
+        self.assertIsNotNone(cache.get_key(base + '/configure/firewall'))
+        cache.default_ttl = None
+        self.assertIsNone(cache.get_key(base + '/configure/firewall'))
+        self.assertIsNotNone(cache.get_key(base + '/usage/list'))
+        cache.close()
+
+    def tearDown(self):
+        """Stop the server and remove the cache."""
+        self.server.close()
+        shutil.rmtree(self.cache_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
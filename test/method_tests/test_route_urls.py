@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test canonical route keys."""
+import unittest
+
+from merlink.browsers.route_urls import get_route_key, is_route_url
+
+
+class TestRouteUrls(unittest.TestCase):
+    """Test that equivalent dashboard URLs share a key."""
+
+    def test_network_and_org_keys(self):
+        """eids are taken from /n/ and /o/ paths; the name slug is not."""
+        self.assertEqual(
+            get_route_key('https://n1.meraki.com/Net/n/abc/manage/usage'),
+            ('n1.meraki.com', 'n/abc', '/usage'))
+        self.assertEqual(
+            get_route_key('https://n1.meraki.com/o/xyz/manage/'
+                          'organization/overview'),
+            ('n1.meraki.com', 'o/xyz', '/organization/overview'))
+
+    def test_junk_is_stripped(self):
+        """Case, trailing slashes, fragments and junk params are ignored."""
+        self.assertEqual(
+            get_route_key('https://N1.meraki.com/Net/n/abc/manage/usage/'
+                          '?protocol=https&b=2&a=1&only_path=false#'),
+            ('n1.meraki.com', 'n/abc', '/usage?a=1&b=2'))
+
+    def test_non_routes(self):
+        """Non-route URLs are keyed by their whole path."""
+        url = 'https://account.meraki.com/login/dashboard_login'
+        self.assertFalse(is_route_url(url))
+        self.assertEqual(get_route_key(url),
+                         ('account.meraki.com', '', '/login/dashboard_login'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test rate limiting, priorities, retries and circuit breaking."""
+import threading
+import time
+import unittest
+
+import requests
+
+from merlink.browsers.scheduler import BACKGROUND, INTERACTIVE, \
+    CircuitOpenError, RequestScheduler
+
+HOST = 'n1.meraki.com'
+
+
+def make_response(status_code, headers=None):
+    """Return a bare requests.Response with a status and headers."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    # pylint: disable=protected-access
+    response._content = b''
+    response._content_consumed = True
+    return response
+
+
+class ResponseQueue:
+    """send_request stand-in that returns/raises queued results in order."""
+
+    def __init__(self, *results):
+        """Queue the results. The last one is repeated once exhausted."""
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        """Return (or raise) the next result."""
+        self.calls += 1
+        result = self.results.pop(0) if len(self.results) > 1 \
+            else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return make_response(result[0], result[1])
+
+
+class TestRequestScheduler(unittest.TestCase):
+    """Test the scheduler with stand-in requests (no network)."""
+
+    def test_rate_limit(self):
+        """Requests past the burst are spaced out by the rate."""
+        scheduler = RequestScheduler(rate=20, burst=2)
+        start = time.monotonic()
+        for _ in range(6):
+            scheduler.send(HOST, 'GET', ResponseQueue((200, None)))
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+        self.assertEqual(scheduler.stats['requests'], 6)
+
+    def test_retry_after(self):
+        """429s are retried after Retry-After and slow the host down."""
+        scheduler = RequestScheduler(rate=20, burst=5)
+        send_request = ResponseQueue((429, {'Retry-After': '0'}),
+                                     (200, None))
+        response = scheduler.send(HOST, 'GET', send_request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(send_request.calls, 2)
+        self.assertEqual(scheduler.stats['throttled'], 1)
+        self.assertLess(scheduler.hosts[HOST].bucket.rate, 20)
+
+    def test_long_retry_after(self):
+        """A Retry-After past max_delay is returned and blocks briefly."""
+        scheduler = RequestScheduler(rate=20, burst=5, max_delay=0.1)
+        response = scheduler.send(HOST, 'GET', ResponseQueue(
+            (429, {'Retry-After': '3600'})))
+        self.assertEqual(response.status_code, 429)
+        start = time.monotonic()
+        response = scheduler.send(HOST, 'GET', ResponseQueue((200, None)))
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_no_retry_of_failed_posts(self):
+        """5xx responses are only retried for idempotent methods."""
+        scheduler = RequestScheduler(backoff_base=0.001)
+        send_request = ResponseQueue((503, None), (200, None))
+        response = scheduler.send(HOST, 'POST', send_request)
+        self.assertEqual(response.status_code, 503)
+        response = scheduler.send(HOST, 'GET', send_request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(scheduler.stats['retries'], 0)
+
+    def test_no_retry_of_failed_post_connections(self):
+        """A POST that fails to connect/times out is not sent again."""
+        scheduler = RequestScheduler(backoff_base=0.001)
+        send_request = ResponseQueue(requests.exceptions.ConnectionError())
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            scheduler.send(HOST, 'POST', send_request)
+        self.assertEqual(send_request.calls, 1)
+        self.assertEqual(scheduler.stats['retries'], 0)
+
+    def test_circuit_breaker(self):
+        """A host that keeps failing is not sent to until reset_timeout."""
+        scheduler = RequestScheduler(max_retries=1, backoff_base=0.001,
+                                     failure_threshold=2, reset_timeout=0.1)
+        send_request = ResponseQueue(requests.exceptions.ConnectionError())
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            scheduler.send(HOST, 'GET', send_request)
+        with self.assertRaises(CircuitOpenError):
+            scheduler.send(HOST, 'GET', send_request)
+        self.assertEqual(send_request.calls, 2)
+        self.assertEqual(scheduler.stats['rejected'], 1)
+        time.sleep(0.1)
+        response = scheduler.send(HOST, 'GET', ResponseQueue((200, None)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(scheduler.hosts[HOST].breaker.state, 'closed')
+
+    def test_priority(self):
+        """Interactive requests get the next token before background ones."""
+        scheduler = RequestScheduler(rate=10, burst=1)
+        scheduler.send(HOST, 'GET', ResponseQueue((200, None)))
+        order = []
+
+        def send(name, priority):
+            """Send one request and record when it got through."""
+            scheduler.send(HOST, 'GET', ResponseQueue((200, None)), priority)
+            order.append(name)
+
+        threads = [threading.Thread(target=send, args=args) for args in
+                   (('background', BACKGROUND),
+                    ('interactive', INTERACTIVE))]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ['interactive', 'background'])
+
+
+if __name__ == '__main__':
+    unittest.main()
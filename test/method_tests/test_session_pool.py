@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test routing and limits of the session pool."""
+import asyncio
+import time
+import unittest
+
+from merlink.browsers.async_dashboard import AsyncDashboardBrowser
+from merlink.browsers.session_pool import SessionPool
+
+JOB_SECONDS = 0.05
+
+
+def make_session(org_ids):
+    """Return an AsyncDashboardBrowser whose account sees some orgs."""
+    session = AsyncDashboardBrowser(max_concurrency=4)
+    session.browser.orgs_dict = {
+        org_id: {'name': 'Org ' + org_id, 'node_groups': {}}
+        for org_id in org_ids}
+    return session
+
+
+class TestSessionPool(unittest.TestCase):
+    """Test that jobs go to sessions that can run them, within limits."""
+
+    def setUp(self):
+        """Make a pool of two accounts that share org 2."""
+        self.alice = make_session(['1', '2'])
+        self.bob = make_session(['2', '3'])
+        self.pool = SessionPool()
+        self.pool.add(self.alice, 'alice', max_jobs=2)
+        self.pool.add(self.bob, 'bob', max_jobs=2)
+        self.max_in_flight = {'alice': 0, 'bob': 0}
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        """Stop the loop and the sessions' thread pools."""
+        self.loop.close()
+        for session in (self.alice, self.bob):
+            session.executor.shutdown(wait=False)
+
+    async def job(self, session, org_id, name):
+        """Block a thread for JOB_SECONDS; return who ran it."""
+        for entry in self.pool.sessions:
+            self.max_in_flight[entry.name] = max(
+                self.max_in_flight[entry.name], entry.in_flight)
+        await session.run_blocking(time.sleep, JOB_SECONDS)
+        if name == 'fail':
+            raise ValueError(name)
+        return session, org_id
+
+    def run_jobs(self, work, **kwargs):
+        """Run pool.map and return (results, seconds)."""
+        started_at = time.perf_counter()
+        results = self.loop.run_until_complete(
+            self.pool.map(self.job, work, **kwargs))
+        return results, time.perf_counter() - started_at
+
+    def test_routing(self):
+        """Orgs only one account sees go to it; shared ones are spread."""
+        results, _ = self.run_jobs(
+            [('1', ''), ('3', ''), ('2', ''), ('2', '')])
+        self.assertIs(results[0][0], self.alice)
+        self.assertIs(results[1][0], self.bob)
+        self.assertEqual({results[2][0], results[3][0]},
+                         {self.alice, self.bob})
+        self.assertEqual(self.pool.get_org_ids(), ['1', '2', '3'])
+        with self.assertRaises(LookupError):
+            self.pool.get_sessions('4')
+
+    def test_limits_and_throughput(self):
+        """Two accounts with 2 slots each run 8 shared jobs in 2 rounds."""
+        results, seconds = self.run_jobs([('2', '')] * 8)
+        self.assertEqual(len(results), 8)
+        self.assertEqual(self.max_in_flight, {'alice': 2, 'bob': 2})
+        self.assertLess(seconds, JOB_SECONDS * 3.5)
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['alice']['completed'], 4)
+        self.assertEqual(stats['bob']['completed'], 4)
+        self.assertEqual(stats['bob']['in_flight'], 0)
+
+    def test_failures(self):
+        """A failed job frees its slot and is counted."""
+        results, _ = self.run_jobs([('1', 'fail'), ('1', '')],
+                                   return_exceptions=True)
+        self.assertIsInstance(results[0], ValueError)
+        self.assertEqual(self.pool.get_stats()['alice']['failed'], 1)
+        self.assertEqual(self.pool.get_stats()['alice']['completed'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
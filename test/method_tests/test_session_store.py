@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test saving and restoring encrypted browser sessions."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from merlink.browsers.dashboard import DashboardBrowser
+from merlink.browsers.session_store import SessionStore, decrypt, encrypt
+from test.method_tests.local_server import LocalServer, QuietHandler
+
+
+class SessionHandler(QuietHandler):
+    """Serve a page to valid sessions and redirect the rest to login."""
+    valid_cookie = 'dash_auth=valid'
+
+    def do_GET(self):
+        """Check the dash_auth cookie."""
+        if SessionHandler.valid_cookie in self.headers.get('Cookie', ''):
+            body = b'<html><body>Overview</body></html>'
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+        else:
+            body = b''
+            self.send_response(302)
+            self.send_header('Location', '/login/dashboard_login')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestSessionStore(unittest.TestCase):
+    """Test encryption, expiry and restoring into a new browser."""
+
+    def setUp(self):
+        """Start a local server and log a browser in to it."""
+        self.server = LocalServer(SessionHandler)
+        SessionHandler.valid_cookie = 'dash_auth=valid'
+        host = self.server.host
+        self.url = 'http://' + host + '/Net/n/abc/manage/organization/'
+        self.session_dir = tempfile.mkdtemp()
+        self.store = SessionStore(
+            os.path.join(self.session_dir, 'session.bin'), iterations=1000)
+
+        self.browser = DashboardBrowser()
+        self.browser.transport.cookies.set('dash_auth', 'valid',
+                                           domain='127.0.0.1', path='/')
+        self.browser.mechsoup.open(self.url)
+        self.browser.orgs_dict = {'1': {'name': 'Org', 'node_groups': {}}}
+        self.browser.active_org_id = '1'
+        self.browser.active_network_id = 'abc'
+
+    def test_encryption(self):
+        """Blobs only decrypt with the same credentials, untampered."""
+        blob = encrypt(b'dash_auth=valid', 'user@acme.corp', 'pw', 1000)
+        self.assertNotIn(b'dash_auth', blob)
+        self.assertEqual(decrypt(blob, 'user@acme.corp', 'pw'),
+                         b'dash_auth=valid')
+        with self.assertRaises(ValueError):
+            decrypt(blob, 'user@acme.corp', 'wrong')
+        with self.assertRaises(ValueError):
+            decrypt(blob[:-1] + bytes([blob[-1] ^ 1]), 'user@acme.corp', 'pw')
+
+    def test_restore(self):
+        """A valid saved session logs a new browser in."""
+        self.store.save(self.browser, 'user@acme.corp', 'pw')
+        self.assertIsNone(self.store.load('user@acme.corp', 'wrong'))
+
+        browser = DashboardBrowser()
+        self.assertTrue(self.store.restore(browser, 'user@acme.corp', 'pw'))
+        self.assertEqual(browser.get_url(), self.url)
+        self.assertEqual(browser.orgs_dict, self.browser.orgs_dict)
+        self.assertEqual(browser.active_network_id, 'abc')
+        self.assertEqual(browser.transport.cookies['dash_auth'], 'valid')
+
+    def test_expired_session(self):
+        """A session dashboard no longer accepts is not restored."""
+        self.store.save(self.browser, 'user@acme.corp', 'pw')
+        SessionHandler.valid_cookie = 'dash_auth=new'
+        browser = DashboardBrowser()
+        self.assertFalse(self.store.restore(browser, 'user@acme.corp', 'pw'))
+        self.assertEqual(len(browser.transport.cookies), 0)
+        self.store.max_age = -1
+        self.assertIsNone(self.store.load('user@acme.corp', 'pw'))
+
+    def tearDown(self):
+        """Stop the server and remove the session file."""
+        self.server.close()
+        shutil.rmtree(self.session_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
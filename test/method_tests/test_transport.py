@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test the pooled dashboard transport against a local HTTP server."""
+import unittest
+
+from merlink.browsers.transport import DashboardTransport
+from test.method_tests.local_server import LocalServer, QuietHandler
+
+
+class JsonHandler(QuietHandler):
+    """Answer every GET with a small keep-alive JSON body."""
+
+    def do_GET(self):
+        """Send a fixed JSON blob."""
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestDashboardTransport(unittest.TestCase):
+    """Test connection reuse and per-host adapters."""
+
+    def setUp(self):
+        """Start a local server on a random port."""
+        self.server = LocalServer(JsonHandler)
+        self.url = 'http://' + self.server.host + '/'
+
+    def test_connection_reuse(self):
+        """Several requests to one host should share one connection."""
+        transport = DashboardTransport()
+        for _ in range(5):
+            self.assertEqual(transport.get(self.url).json(), {'ok': True})
+        stats = transport.get_reuse_stats()
+        host_stats = stats[self.server.host]
+        self.assertEqual(host_stats['requests'], 5)
+        self.assertEqual(host_stats['connections'], 1)
+        self.assertEqual(host_stats['reused'], 4)
+        transport.close()
+
+    def test_one_adapter_per_host(self):
+        """Each host gets its own adapter; the same host reuses it."""
+        transport = DashboardTransport(pool_maxsize=20)
+        adapter = transport.get_adapter('https://n1.meraki.com/a')
+        self.assertIs(adapter,
+                      transport.get_adapter('https://n1.meraki.com/b'))
+        self.assertIsNot(adapter,
+                         transport.get_adapter('https://account.meraki.com/'))
+        self.assertEqual(adapter._pool_maxsize, 20)
+
+    def tearDown(self):
+        """Stop the local server."""
+        self.server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+# Copyright 2018 Ross Jacobs All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Test the fleet-wide client VPN sweep."""
+import asyncio
+import json
+import socket
+import threading
+import unittest
+
+from merlink.browsers.vpn_sweep import get_sweep_networks, sweep
+
+ORGS_DICT = {
+    '1': {'node_groups': {
+        'N_ok': {'n': 'HQ - appliance', 'network_type': 'wired',
+                 'is_config_template': False},
+        'N_nat': {'n': 'Branch - appliance', 'network_type': 'wired',
+                  'is_config_template': False},
+        'N_ms': {'n': 'HQ - switch', 'network_type': 'switch',
+                 'is_config_template': False},
+        'N_tpl': {'n': 'Template', 'network_type': 'wired',
+                  'is_config_template': True},
+    }},
+    '2': {'node_groups': {
+        'N_none': {'n': 'Lab - appliance', 'network_type': 'wired',
+                   'is_config_template': False},
+        'N_down': {'n': 'Store - appliance', 'network_type': 'wired',
+                   'is_config_template': False},
+    }},
+}
+STATUS_PAGE = '{"request_ip":"9.9.9.9","uplinks":[{"public_ip":' \
+    '"127.0.0.1","status#":%s}],"dynamic_dns_enabled":false}'
+PAGES = {
+    '/nodes/new_wired_status': {
+        'N_ok': STATUS_PAGE % 0, 'N_nat': STATUS_PAGE % 0,
+        'N_none': '{"request_ip":"9.9.9.9"}', 'N_down': STATUS_PAGE % 2},
+    '/configure/firewall': {
+        'N_nat': '{"one_to_one_nat_settings":[{"allowed_inbound":[{'
+                 '"proto":"udp","dst_port":["500","4500"]}]}]}'},
+}
+
+
+class FakeBrowser:
+    """Serves canned pages, failing the settings of one network."""
+    max_concurrency = 4
+    orgs_dict = ORGS_DICT
+
+    def __init__(self):
+        """Count requests in flight."""
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+
+    async def set_org_id(self, org_id):
+        """Org is already loaded."""
+        return self.orgs_dict[org_id]
+
+    async def fetch(self, route, network_id):
+        """Track overlap and record the request."""
+        self.requests.append((route, network_id))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+
+    async def scrape_json(self, route, org_id, network_id=None):
+        """Return client vpn settings; raise for N_none."""
+        await self.fetch(route, network_id)
+        if network_id == 'N_none':
+            raise LookupError('no settings')
+        return {'wdc': {'client_vpn_enabled': network_id != 'N_down'}}
+
+    async def get_pagetext(self, route, org_id, network_id=None):
+        """Return a canned page (empty if there is none)."""
+        await self.fetch(route, network_id)
+        return PAGES.get(route, {}).get(network_id, '')
+
+
+class TestVpnSweep(unittest.TestCase):
+    """Test network selection, checks and the report."""
+
+    def setUp(self):
+        """Answer every probe on a local UDP port."""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(0.1)
+        self.is_running = True
+        self.thread = threading.Thread(target=self.answer)
+        self.thread.daemon = True
+        self.thread.start()
+        self.loop = asyncio.new_event_loop()
+
+    def answer(self):
+        """Echo each probe back (it starts with the SPI to match)."""
+        while self.is_running:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            self.sock.sendto(data, addr)
+
+    def test_sweep_networks(self):
+        """Only wired networks that are not templates are swept."""
+        self.assertEqual(sorted(get_sweep_networks(ORGS_DICT, ['1', '2'])),
+                         [('1', 'N_nat'), ('1', 'N_ok'), ('2', 'N_down'),
+                          ('2', 'N_none')])
+        # Networks may leave out keys that don't apply to them.
+        orgs_dict = {'3': {'node_groups': {
+            'N_new': {'n': 'New - appliance', 'network_type': 'wired'},
+            'N_bare': {'n': 'Bare'}}}}
+        self.assertEqual(list(get_sweep_networks(orgs_dict, ['3'])),
+                         [('3', 'N_new')])
+
+    def test_sweep(self):
+        """Every network gets each check once, in a JSON report."""
+        browser = FakeBrowser()
+        report = self.loop.run_until_complete(sweep(
+            browser, max_networks=2,
+            ports=[self.sock.getsockname()[1]], count=2, timeout=0.3))
+        json.dumps(report)
+        records = {record['network_id']: record
+                   for record in report['networks']}
+        self.assertEqual(sorted(records),
+                         ['N_down', 'N_nat', 'N_none', 'N_ok'])
+        self.assertTrue(records['N_ok']['passed'])
+        self.assertEqual(records['N_ok']['network_name'], 'HQ - appliance')
+        connectivity = records['N_ok']['checks']['connectivity']
+        self.assertEqual(connectivity['details']['address'], '127.0.0.1')
+        self.assertFalse(records['N_nat']['checks']['nat_rules']['passed'])
+        self.assertFalse(
+            records['N_down']['checks']['firewall_status']['passed'])
+        self.assertFalse(records['N_down']['checks']['client_vpn_enabled'][
+            'details']['enabled'])
+        self.assertIn('LookupError', records['N_none']['checks'][
+            'client_vpn_enabled']['errors'][0])
+        self.assertEqual(report['summary'], {
+            'networks': 4, 'passed': 1, 'client_vpn_enabled': 2,
+            'failures': {'client_vpn_enabled': 1, 'firewall_status': 2,
+                         'nat_rules': 1, 'connectivity': 1}})
+        # 3 pages per network, each fetched once, some at the same time.
+        self.assertEqual(len(browser.requests), 12)
+        self.assertEqual(len(set(browser.requests)), 12)
+        self.assertGreater(browser.max_in_flight, 3)
+
+    def test_no_probe(self):
+        """Without probes, connectivity is left out of the report."""
+        report = self.loop.run_until_complete(sweep(
+            FakeBrowser(), ['2'], probe=False))
+        self.assertEqual(report['summary']['networks'], 2)
+        self.assertTrue(all(record['checks']['connectivity'] is None
+                            for record in report['networks']))
+
+    def test_settings_without_wdc(self):
+        """Settings missing the client vpn keys fail only that check."""
+        browser = FakeBrowser()
+
+        async def scrape_json(route, org_id, network_id=None):
+            """Return settings without the wdc section."""
+            await browser.fetch(route, network_id)
+            return {}
+        browser.scrape_json = scrape_json
+        report = self.loop.run_until_complete(sweep(
+            browser, ['2'], probe=False))
+        self.assertEqual(report['summary']['networks'], 2)
+        for record in report['networks']:
+            check = record['checks']['client_vpn_enabled']
+            self.assertIn('KeyError', check['errors'][0])
+            self.assertIsNotNone(record['checks']['firewall_status'])
+
+    def tearDown(self):
+        """Stop answering probes."""
+        self.is_running = False
+        self.thread.join()
+        self.sock.close()
+        self.loop.close()
+
+
+if __name__ == '__main__':
+    unittest.main()